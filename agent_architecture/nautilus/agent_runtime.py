@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+AGENT RUNTIME
+=============
+One asyncio event loop schedules every agent activity (on-chain listener,
+trading, auto battles) as concurrent tasks instead of one blocking
+`while True: ...; time.sleep(n)` loop per AGENT_MODE.
+
+Each AgentTask wraps a synchronous `step()` returning the delay before its
+next run (None = its interval). Steps run on a shared worker pool of
+AGENT_RUNTIME_WORKERS threads; when tasks compete for a worker the higher
+priority goes first. Between runs a task sleeps on a wake event, so
+`wake(name)` (thread-safe, e.g. from a market data callback) runs it
+immediately. A failing step is logged and retried with exponential backoff;
+`cancel(name)` stops one task, SIGINT/SIGTERM stop them all after the
+steps in flight finish.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AgentTask:
+    def __init__(
+        self,
+        name: str,
+        step: Callable[[], Optional[float]],
+        interval: float,
+        priority: int = 0,
+        initial_delay: float = 0.0,
+        max_backoff: float = 300.0
+    ) -> None:
+        self.name = name
+        self.step = step
+        self.interval = interval
+        self.priority = priority
+        self.initial_delay = initial_delay
+        self.max_backoff = max_backoff
+        self.runs = 0
+        self.failures = 0
+        self.last_run: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._handle: Optional[asyncio.Task] = None
+
+
+class _PriorityGate:
+    """Counting semaphore handing free slots to the highest-priority waiter first."""
+
+    def __init__(self, slots: int) -> None:
+        self._free = slots
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority: int) -> None:
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._order), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # slot was handed over as we got cancelled
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._free += 1
+
+
+class AgentRuntime:
+    def __init__(self, workers: Optional[int] = None) -> None:
+        self.workers = workers or int(os.getenv("AGENT_RUNTIME_WORKERS", "4"))
+        self.tasks: Dict[str, AgentTask] = {}
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="agent")
+        self._gate: Optional[_PriorityGate] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def add(self, task: AgentTask) -> AgentTask:
+        if task.name in self.tasks:
+            raise ValueError(f"task {task.name!r} already registered")
+        self.tasks[task.name] = task
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._spawn, task)
+        return task
+
+    # --- control (callable from any thread) ---
+
+    def wake(self, name: str) -> None:
+        """Run task `name` now instead of at the end of its delay."""
+        task = self.tasks.get(name)
+        if task is not None and task._wake is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(task._wake.set)
+
+    def cancel(self, name: str) -> None:
+        task = self.tasks.get(name)
+        if task is not None and task._handle is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(task._handle.cancel)
+
+    def stop(self) -> None:
+        for name in list(self.tasks):
+            self.cancel(name)
+
+    # --- scheduling ---
+
+    def _spawn(self, task: AgentTask) -> None:
+        task._wake = asyncio.Event()
+        task._handle = asyncio.get_running_loop().create_task(self._loop_task(task), name=task.name)
+
+    async def _sleep(self, task: AgentTask, delay: float) -> None:
+        if delay > 0:
+            try:
+                await asyncio.wait_for(task._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        task._wake.clear()
+
+    async def _loop_task(self, task: AgentTask) -> None:
+        loop = asyncio.get_running_loop()
+        await self._sleep(task, task.initial_delay)
+        while True:
+            await self._gate.acquire(task.priority)
+            started = time.monotonic()
+            step = loop.run_in_executor(self._pool, task.step)
+            try:
+                delay = await asyncio.shield(step)
+                task.failures = 0
+            except asyncio.CancelledError:
+                # A thread cannot be interrupted: let the step finish before freeing its slot
+                await asyncio.wait([step])
+                raise
+            except Exception as exc:
+                task.failures += 1
+                delay = min(task.interval * 2 ** task.failures, task.max_backoff)
+                logger.exception("Task %s failed (%s) - retry in %.0fs", task.name, exc, delay)
+            finally:
+                self._gate.release()
+                task.runs += 1
+                task.last_run = time.time()
+                task.last_duration = time.monotonic() - started
+            await self._sleep(task, task.interval if delay is None else delay)
+
+    async def run_async(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._gate = _PriorityGate(self.workers)
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # not the main thread: rely on cancel()/stop()
+        for task in self.tasks.values():
+            self._spawn(task)
+        try:
+            while True:
+                handles = [t._handle for t in self.tasks.values() if t._handle is not None]
+                await asyncio.gather(*handles, return_exceptions=True)
+                if all(t._handle is None or t._handle.done() for t in self.tasks.values()):
+                    break  # tasks added during the wait are gathered on the next pass
+        finally:
+            self._loop = None
+
+    def run(self) -> None:
+        """Block until every task is cancelled (SIGINT / SIGTERM / stop())."""
+        try:
+            asyncio.run(self.run_async())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def status(self) -> Dict[str, Dict[str, object]]:
+        return {
+            name: {
+                "priority": task.priority,
+                "interval": task.interval,
+                "runs": task.runs,
+                "failures": task.failures,
+                "last_run": task.last_run,
+                "last_duration": task.last_duration,
+            }
+            for name, task in self.tasks.items()
+        }
@@ -16,12 +16,13 @@ import random
 import requests
 import json
 import subprocess
+import threading
 from datetime import datetime
 from pathlib import Path
 
 # Import Gemini AI (optionnel)
 try:
-    from gemini_trader import GeminiTrader
+    from gemini_trader import get_gemini_trader
     GEMINI_AVAILABLE = True
 except ImportError:
     GEMINI_AVAILABLE = False
@@ -29,9 +30,8 @@ except ImportError:
 
 # Import du module Nautilus Enclave
 try:
-    from nautilus_enclave import EnclaveSimulator
+    from nautilus_enclave import get_enclave
     NAUTILUS_MODE = "NAUTILUS TEE SIMULATOR"
-    EnclaveState = EnclaveSimulator
 except ImportError:
     # Fallback si nautilus_enclave.py n'est pas disponible
     NAUTILUS_MODE = "SIMULATION SIMPLE"
@@ -40,6 +40,14 @@ except ImportError:
             self.pcrs = {"PCR0": "simulated", "PCR1": "simulated", "PCR2": "simulated"}
         def sign_message(self, msg):
             return hashlib.sha256(json.dumps(msg).encode()).hexdigest()
+    get_enclave = EnclaveState
+
+from agent_runtime import AgentRuntime, AgentTask
+from candle_store import TIMEFRAME_SECONDS, CandleAggregator
+from indicators import Candle, StrategyIndicators
+from market_data import MarketDataService
+from trading_trace import get_tracer
+from trading_triggers import SignalTrigger
 
 # --- CONFIGURATION ---
 USE_GEMINI = os.getenv("USE_GEMINI", "false").lower() == "true"
@@ -90,6 +98,18 @@ TRADING_CONFIG = {
     }
 }
 
+# État des indicateurs streaming (reprise à chaud après redémarrage)
+INDICATOR_STATE_FILE = os.getenv("INDICATOR_STATE_FILE", ".indicator_state.json")
+
+# Cadence des tâches du runtime (secondes)
+TRADING_INTERVAL = int(os.getenv("AGENT_TRADING_INTERVAL", "35"))  # cache 30s + marge
+BATTLE_INTERVAL = int(os.getenv("AGENT_BATTLE_INTERVAL", "45"))
+
+# Déclenchement du trading: "timer" (toutes les TRADING_INTERVAL s) ou "event"
+# (seuils sur les indicateurs streaming, décision forcée après TRADING_MAX_IDLE s)
+TRADING_TRIGGERS = os.getenv("TRADING_TRIGGERS", "timer").lower()
+TRADING_MAX_IDLE = int(os.getenv("TRADING_MAX_IDLE", "1800"))
+
 # --- CONFIGURATION API ---
 # Les APIs utilisées sont gratuites et ne nécessitent pas de clé
 API_CONFIG = {
@@ -144,16 +164,49 @@ def call_nimbus_action(action: str, params: dict) -> dict:
 
 # --- CONFIGURATION WALRUS ---
 WALRUS_PUBLISHER_URL = WALRUS_CONFIG["publisher_url"]
+# Uploads en arrière-plan, plusieurs mémoires par blob (voir walrus_queue.py)
+WALRUS_ASYNC = os.getenv("WALRUS_ASYNC", "true").lower() == "true"
 
 class WalrusMemory:
     """Gestionnaire de mémoire immuable sur Walrus"""
     
-    @staticmethod
-    def save(data: dict) -> str:
+    _queue = None
+    _cache = None
+    
+    @classmethod
+    def get_queue(cls):
+        """File d'upload en arrière-plan (créée au premier save)"""
+        if cls._queue is None:
+            from walrus_queue import WalrusUploadQueue
+            cls._queue = WalrusUploadQueue(WALRUS_PUBLISHER_URL, on_stored=cls.get_cache().put)
+        return cls._queue
+    
+    @classmethod
+    def save(cls, data: dict) -> str:
         """
         Sauvegarde un raisonnement/décision sur Walrus
-        Retourne: blob_id utilisable on-chain
+        Retourne: "pending_<hash>" tout de suite (WALRUS_ASYNC=true, défaut),
+        résolu plus tard en blob_id via resolve(); sinon blob_id (upload bloquant)
         """
+        if WALRUS_ASYNC:
+            try:
+                placeholder = cls.get_queue().enqueue(data)
+                print(f"   [QUEUE] Mémoire en file Walrus: {placeholder[:24]}...")
+                return placeholder
+            except OSError as e:
+                print(f"   [WARN] File Walrus indisponible ({e}) - upload direct")
+        return cls.save_sync(data)
+    
+    @classmethod
+    def resolve(cls, blob_ref: str) -> str:
+        """blob_id final d'un placeholder "pending_<hash>" (inchangé si pas encore uploadé)"""
+        if blob_ref.startswith("pending_") and cls._queue is not None:
+            return cls._queue.resolve(blob_ref) or blob_ref
+        return blob_ref
+    
+    @staticmethod
+    def save_sync(data: dict) -> str:
+        """Upload bloquant d'une mémoire (un blob par mémoire)"""
         payload = json.dumps(data, sort_keys=True)
         
         try:
@@ -165,19 +218,10 @@ class WalrusMemory:
             )
             
             if response.status_code == 200:
-                result = response.json()
-                
-                # Format réponse Walrus:
-                # {"newlyCreated": {"blobObject": {"blobId": "..."}}}
-                # OU {"alreadyCertified": {"blobId": "..."}}
-                
-                if "newlyCreated" in result:
-                    blob_id = result["newlyCreated"]["blobObject"]["blobId"]
-                    print(f"   [OK] Nouveau blob Walrus: {blob_id}")
-                    return blob_id
-                elif "alreadyCertified" in result:
-                    blob_id = result["alreadyCertified"]["blobId"]
-                    print(f"   [CACHED] Blob déjà existant: {blob_id}")
+                from walrus_queue import parse_store_response
+                blob_id = parse_store_response(response.json())
+                if blob_id:
+                    print(f"   [OK] Blob Walrus: {blob_id}")
                     return blob_id
             
             print(f"   [ERROR] Erreur Walrus: {response.status_code} - {response.text}")
@@ -192,11 +236,42 @@ class WalrusMemory:
         print(f"   [SIM] Mode simulation - blob: sim_{simulated_id[:16]}")
         return f"sim_{simulated_id[:16]}"
     
-    @staticmethod
-    def retrieve(blob_id: str) -> dict:
-        """Récupère une mémoire depuis Walrus"""
-        # TODO: implémenter GET depuis aggregator Walrus
-        return {"error": "retrieve not implemented yet"}
+    @classmethod
+    def get_cache(cls):
+        """Cache local (mémoire + disque) des blobs lus depuis l'aggregator"""
+        if cls._cache is None:
+            from walrus_cache import WalrusBlobCache
+            cls._cache = WalrusBlobCache(WALRUS_CONFIG["aggregator_url"])
+        return cls._cache
+    
+    @classmethod
+    def retrieve(cls, blob_ref: str) -> dict:
+        """
+        Récupère une mémoire depuis Walrus (cache local d'abord)
+        blob_ref: blob_id, ou placeholder "pending_<hash>" retourné par save()
+        """
+        item_hash = blob_ref[len("pending_"):] if blob_ref.startswith("pending_") else None
+        blob_id = cls.resolve(blob_ref)
+        if blob_id.startswith("pending_"):
+            # Pas encore uploadée: lecture directe dans la file locale
+            local = cls._queue.spooled(blob_id) if cls._queue is not None else None
+            return local if local is not None else {"error": f"memory {blob_ref} not uploaded yet"}
+        if blob_id.startswith("sim_"):
+            return {"error": f"simulated blob {blob_id} was never stored"}
+        
+        from memory_codec import decode_blob, expand, pack_item
+        try:
+            data = decode_blob(cls.get_cache().get_bytes(blob_id))
+        except (requests.exceptions.RequestException, ValueError) as e:
+            return {"error": f"Walrus retrieve failed: {e}"}
+        
+        # Blob groupé par la file d'upload: extraire la mémoire demandée
+        if isinstance(data, dict) and str(data.get("format", "")).startswith("chimera-memory-pack"):
+            if item_hash:
+                item = pack_item(data, item_hash)
+                return item if item is not None else {"error": f"memory {item_hash} not in pack {blob_id}"}
+            return expand(data, data.get("shared", {}))
+        return data
 
 # --- CLASSE AGENT PRINCIPALE ---
 class ChimeraAgent:
@@ -207,7 +282,8 @@ class ChimeraAgent:
         
         # 1. Initialiser Nautilus (TEE + Attestation)
         print("[TEE] Chargement Nautilus TEE...")
-        self.enclave = EnclaveState()
+        # Enclave partagée avec le listener / orchestrateur (même clé de signature)
+        self.enclave = get_enclave()
         print(f"   [OK] Mode: {NAUTILUS_MODE}")
         print(f"   [PCR0] PCR0: {self.enclave.pcrs['PCR0'][:32]}...")
         
@@ -226,7 +302,7 @@ class ChimeraAgent:
                 gemini_key = os.getenv("GEMINI_API_KEY")
                 if gemini_key:
                     try:
-                        self.gemini_trader = GeminiTrader(gemini_key)
+                        self.gemini_trader = get_gemini_trader()
                         print(f"   [OK] Gemini activé pour combats NFT")
                     except Exception as e:
                         print(f"   [WARN] Erreur Gemini: {str(e)[:50]} - mode manuel")
@@ -241,12 +317,10 @@ class ChimeraAgent:
         print("\n[WALRUS] Configuration Walrus...")
         print(f"   [NET] Publisher: {WALRUS_PUBLISHER_URL}")
         
-        # 5. Cache pour l'API de prix (éviter rate limiting)
-        self.price_cache = {
-            "data": None,
-            "timestamp": 0,
-            "ttl": 30  # Cache de 30 secondes pour scalping
-        }
+        # 5. Prix SUI et bougies: démarrés par run_modes seulement si le mode
+        #    trading est lancé (aucun accès réseau dans le constructeur)
+        self.candles = None
+        self.market_data = None
         
         # 5. Risk management tracking
         self.daily_pnl = 0
@@ -254,160 +328,133 @@ class ChimeraAgent:
         self.open_positions = 0
         self.last_reset_day = datetime.now().day
         self.last_price = None  # Pour calculer le momentum court terme
+        self.iteration = 0
+        self.battle_count = 0
+        self.tracer = get_tracer()  # spans par phase du cycle de trading
+        
+        # Indicateurs streaming (état restauré après redémarrage)
+        self.indicators = StrategyIndicators(TRADING_CONFIG)
+        self._indicators_lock = threading.Lock()  # trading et déclencheurs tournent en parallèle
+        self.signal_trigger = SignalTrigger(TRADING_CONFIG) if TRADING_TRIGGERS == "event" else None
+        if Path(INDICATOR_STATE_FILE).exists():
+            try:
+                self.indicators.restore(json.loads(Path(INDICATOR_STATE_FILE).read_text()))
+            except (ValueError, KeyError) as e:
+                print(f"   [WARN] État indicateurs illisible, préchauffage complet: {e}")
         
         print("\n" + "="*60)
         print("[OK] AGENT PRÊT")
         print("="*60 + "\n")
     
-    def calculate_ema(self, prices, period):
-        """Calculate EMA from price list"""
-        if len(prices) < period:
-            return prices[-1] if prices else 0
-        multiplier = 2 / (period + 1)
-        ema = sum(prices[:period]) / period
-        for price in prices[period:]:
-            ema = (price - ema) * multiplier + ema
-        return ema
-    
-    def calculate_rsi(self, prices, period=14):
-        """Calculate RSI from price list"""
-        if len(prices) < period + 1:
-            return 50
-        deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-        gains = [d if d > 0 else 0 for d in deltas[-period:]]
-        losses = [-d if d < 0 else 0 for d in deltas[-period:]]
-        avg_gain = sum(gains) / period
-        avg_loss = sum(losses) / period
-        if avg_loss == 0:
-            return 100
-        rs = avg_gain / avg_loss
-        return 100 - (100 / (1 + rs))
+    def start_market_data(self):
+        """
+        Prix SUI rafraîchis en arrière-plan (stale-while-revalidate), agrégés
+        en bougies 5m/15m dans l'historique OHLCV sur disque
+        """
+        if self.market_data is not None:
+            return
+        self.candles = CandleAggregator(TRADING_CONFIG["timeframes"].values())
+        self.market_data = MarketDataService()
+        self.market_data.subscribe(lambda q: self.candles.on_tick(
+            q["price"], timestamp=q["fetched_at"], volume_24h=q["volume_24h"]
+        ))
+        self.market_data.start()
     
-    def calculate_atr(self, highs, lows, closes, period=14):
-        """Calculate ATR from OHLC data"""
-        if len(highs) < period:
-            return (highs[-1] - lows[-1]) if highs and lows else 0
-        trs = []
-        for i in range(1, len(highs)):
-            hl = highs[i] - lows[i]
-            hc = abs(highs[i] - closes[i-1])
-            lc = abs(lows[i] - closes[i-1])
-            trs.append(max(hl, hc, lc))
-        return sum(trs[-period:]) / period
+    def update_indicators(self):
+        with self._indicators_lock:
+            self._update_indicators()
     
-    def analyze_market(self):
-        """Analyse du marché SUI avec indicateurs techniques multi-timeframe"""
-        current_time = time.time()
-        
-        # Vérifier le cache
-        if self.price_cache["data"] and (current_time - self.price_cache["timestamp"]) < self.price_cache["ttl"]:
-            return self.price_cache["data"]
-        
-        # Liste d'APIs à essayer dans l'ordre
-        apis = [
-            {
-                "name": "binance",
-                "url": "https://api.binance.com/api/v3/ticker/24hr",
-                "params": {"symbol": "SUIUSDT"},
-                "parser": lambda r: {
-                    "price": float(r["lastPrice"]),
-                    "change_24h": float(r["priceChangePercent"]),
-                    "volume_24h": float(r["quoteVolume"])
-                }
-            },
-            {
-                "name": "coinbase",
-                "url": "https://api.coinbase.com/v2/prices/SUI-USD/spot",
-                "params": {},
-                "parser": lambda r: {
-                    "price": float(r["data"]["amount"]),
-                    "change_24h": 0,  # Coinbase ne donne pas le changement dans cet endpoint
-                    "volume_24h": 0
-                }
-            },
-            {
-                "name": "coingecko",
-                "url": "https://api.coingecko.com/api/v3/simple/price",
-                "params": {
-                    "ids": "sui",
-                    "vs_currencies": "usd",
-                    "include_24hr_change": "true",
-                    "include_24hr_vol": "true"
-                },
-                "parser": lambda r: {
-                    "price": r["sui"]["usd"],
-                    "change_24h": r["sui"].get("usd_24h_change", 0),
-                    "volume_24h": r["sui"].get("usd_24h_vol", 0)
-                }
-            }
-        ]
-        
-        # Essayer chaque API jusqu'à ce qu'une fonctionne
-        for api in apis:
+    def _update_indicators(self):
+        """
+        Alimente les indicateurs streaming depuis l'historique OHLCV sur disque.
+        Les bougies Binance 5m/15m clôturées y remplacent d'abord les bougies
+        construites à partir des ticks (volume réel); sans Binance, les bougies
+        issues des ticks suffisent.
+        """
+        for timeframe, last_open in self.indicators.last_close_time.items():
+            store = self.candles.stores[timeframe]
+            if last_open is None and len(store):
+                last_open = store.get(max(len(store) - 200, 0)).timestamp - 1  # préchauffage local
+            params = {"symbol": "SUIUSDT", "interval": timeframe, "limit": 200}
+            if last_open is not None:
+                params["startTime"] = int(last_open * 1000) + 1
+                params["limit"] = 1000
+            forming = None
             try:
                 response = requests.get(
-                    api["url"],
-                    params=api["params"],
+                    "https://api.binance.com/api/v3/klines",
+                    params=params,
                     timeout=8,
                     headers={"User-Agent": "Chimera-Nautilus-Agent/1.0"}
                 )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    parsed = api["parser"](data)
-                    
-                    price = parsed["price"]
-                    change_24h = parsed["change_24h"]
-                    volume_24h = parsed["volume_24h"]
-                    
-                    # Validation: vérifier que le prix est plausible
-                    if price <= 0 or price > 100:
-                        print(f"   [WARN] Prix suspect depuis {api['name']}: ${price}")
-                        continue
-                    
-                    # Déterminer la tendance basée sur le changement 24h
-                    if change_24h > 2:
-                        trend = "bullish"
-                    elif change_24h < -2:
-                        trend = "bearish"
+                response.raise_for_status()
+                now_ms = time.time() * 1000
+                for row in response.json():
+                    candle = Candle(row[0] / 1000, float(row[1]), float(row[2]), float(row[3]), float(row[4]), float(row[5]))
+                    if row[6] < now_ms:
+                        self.candles.ingest(timeframe, candle)
                     else:
-                        trend = "neutral"
-                    
-                    # Calculer momentum court terme (depuis dernière itération)
-                    recent_change = 0
-                    if self.last_price:
-                        recent_change = ((price - self.last_price) / self.last_price) * 100
-                    self.last_price = price
-                    
-                    market_data = {
-                        "sui_price": price,
-                        "trend": trend,
-                        "change_24h": change_24h,
-                        "recent_change_pct": recent_change,
-                        "volume_24h": volume_24h,
-                        "data_source": api["name"],
-                        "timestamp": current_time
-                    }
-                    
-                    # Mettre en cache
-                    self.price_cache["data"] = market_data
-                    self.price_cache["timestamp"] = current_time
-                    
-                    return market_data
-                    
-            except requests.exceptions.Timeout:
-                print(f"   [TIMEOUT] Timeout {api['name']} - essai suivant...")
-                continue
+                        forming = candle
             except Exception as e:
-                print(f"   [WARN] Erreur {api['name']}: {str(e)[:50]} - essai suivant...")
-                continue
+                print(f"   [WARN] Bougies {timeframe} Binance indisponibles, bougies locales: {str(e)[:50]}")
+            
+            start = last_open + 1 if last_open is not None else 0
+            for candle in store.range(start):
+                self.indicators.on_candle(timeframe, candle)
+            forming = forming or self.candles.current(timeframe)
+            if forming is not None:
+                self.indicators.on_forming(timeframe, forming)
         
-        # Si on a du cache même expiré, l'utiliser plutôt que simuler
-        if self.price_cache["data"]:
-            print(f"   [CACHE] Utilisation cache expiré (âge: {int(current_time - self.price_cache['timestamp'])}s)")
-            cache_data = self.price_cache["data"].copy()
-            cache_data["data_source"] = "cache"
-            return cache_data
+        try:
+            Path(INDICATOR_STATE_FILE).write_text(json.dumps(self.indicators.snapshot()))
+        except OSError as e:
+            print(f"   [WARN] État indicateurs non sauvegardé: {e}")
+    
+    def analyze_market(self):
+        """Analyse du marché SUI avec indicateurs techniques multi-timeframe"""
+        current_time = time.time()
+        
+        # Dernier prix connu, rafraîchi en arrière-plan (jamais d'attente réseau
+        # sauf au tout premier appel)
+        quote, age = self.market_data.latest()
+        if quote is None:
+            quote = self.market_data.wait_first(timeout=self.market_data.feed.timeout)
+            age = 0
+        if quote is not None:
+            price = quote["price"]
+            change_24h = quote["change_24h"]
+            volume_24h = quote["volume_24h"]
+            
+            # Déterminer la tendance basée sur le changement 24h
+            if change_24h > 2:
+                trend = "bullish"
+            elif change_24h < -2:
+                trend = "bearish"
+            else:
+                trend = "neutral"
+            
+            # Calculer momentum court terme (depuis dernière itération)
+            recent_change = 0
+            if self.last_price:
+                recent_change = ((price - self.last_price) / self.last_price) * 100
+            self.last_price = price
+            
+            if age > self.market_data.ttl:
+                print(f"   [CACHE] Prix périmé (âge: {int(age)}s) - sources indisponibles")
+            
+            return {
+                "sui_price": price,
+                "trend": trend,
+                "change_24h": change_24h,
+                "recent_change_pct": recent_change,
+                "volume_24h": volume_24h,
+                "data_source": quote["source"] if age <= self.market_data.ttl else "cache",
+                "confirmations": quote.get("confirmations", 1),
+                "price_age_s": round(age, 1),
+                "timestamp": current_time
+            }
+        
+        print("   [WARN] Aucune source de prix valide (Binance/Coinbase/CoinGecko)")
         
         # Fallback final: simulation si aucune donnée disponible
         print("   [SIM] Fallback: simulation de prix (toutes APIs échouées)")
@@ -439,15 +486,32 @@ class ChimeraAgent:
         # Mode manuel (stratégie dual-setup)
         price = market_data["sui_price"]
         
-        # Simuler les indicateurs (en production: fetch real OHLCV data)
-        # Pour la démo, on génère des valeurs cohérentes
-        ema15_15m = price * random.uniform(0.998, 1.002)
-        ema50_15m = price * random.uniform(0.995, 1.005)
-        ema9_5m = price * random.uniform(0.999, 1.001)
-        ema21_5m = price * random.uniform(0.997, 1.003)
-        vwap = price * random.uniform(0.999, 1.001)
-        rsi = random.uniform(30, 70)
-        atr_5m = price * random.uniform(0.002, 0.004)
+        # Indicateurs streaming (bougies réelles, mise à jour O(1) par bougie)
+        with self.tracer.span("update_indicators"):
+            self.update_indicators()
+        values = self.indicators.values()
+        params = TRADING_CONFIG["indicators"]
+        bias_tf = TRADING_CONFIG["timeframes"]["bias"]
+        entry_tf = TRADING_CONFIG["timeframes"]["entry"]
+        ema15_15m = values[f"ema{params['ema_bias'][0]}_{bias_tf}"]
+        ema50_15m = values[f"ema{params['ema_bias'][1]}_{bias_tf}"]
+        ema9_5m = values[f"ema{params['ema_entry'][0]}_{entry_tf}"]
+        ema21_5m = values[f"ema{params['ema_entry'][1]}_{entry_tf}"]
+        vwap = values[f"vwap_{bias_tf}"]
+        rsi = values[f"rsi_{entry_tf}"]
+        atr_5m = values[f"atr_{entry_tf}"]
+        
+        if not self.indicators.ready:
+            return {
+                "action": "HOLD",
+                "setup": None,
+                "confidence": 0.5,
+                "reasoning": "Indicateurs en préchauffage (historique de bougies insuffisant)",
+                "market_bias": "UNKNOWN",
+                "indicators": {"price": price, **values},
+                "risk_management": {},
+                "timestamp": int(time.time())
+            }
         atr_pct = (atr_5m / price) * 100
         
         # État du compte
@@ -473,7 +537,8 @@ class ChimeraAgent:
         position_size = 0
         
         # --- SETUP A: TREND PULLBACK ---
-        if market_bias in ["BULLISH", "BEARISH"] and 0.15 <= atr_pct <= 0.35:
+        low_atr, high_atr = TRADING_CONFIG["atr_normal_range"]
+        if market_bias in ["BULLISH", "BEARISH"] and low_atr <= atr_5m / price <= high_atr:
             # Vérifier conditions pullback
             if market_bias == "BULLISH":
                 # Long: EMA9 recroise au-dessus EMA21 + RSI > 50
@@ -512,9 +577,10 @@ class ChimeraAgent:
         # --- SETUP B: VWAP FADE (mean-revert en range) ---
         elif market_bias == "RANGE":
             vwap_distance = abs(price - vwap)
+            min_distance = TRADING_CONFIG["setup_b"]["distance_atr_mult"] * atr_5m
             
             # Short si extension au-dessus VWAP + RSI > 70
-            if price > vwap and vwap_distance >= atr_5m and rsi > TRADING_CONFIG["setup_b"]["rsi_overbought"]:
+            if price > vwap and vwap_distance >= min_distance and rsi > TRADING_CONFIG["setup_b"]["rsi_overbought"]:
                 action = "SELL_SUI"
                 setup = "VWAP_FADE_SHORT"
                 confidence = 0.65
@@ -529,7 +595,7 @@ class ChimeraAgent:
                 reasoning = f"VWAP Fade short: Prix={price:.4f} vs VWAP={vwap:.4f}, RSI={rsi:.1f} (surachat)"
             
             # Long si extension en-dessous VWAP + RSI < 30
-            elif price < vwap and vwap_distance >= atr_5m and rsi < TRADING_CONFIG["setup_b"]["rsi_oversold"]:
+            elif price < vwap and vwap_distance >= min_distance and rsi < TRADING_CONFIG["setup_b"]["rsi_oversold"]:
                 action = "BUY_SUI"
                 setup = "VWAP_FADE_LONG"
                 confidence = 0.65
@@ -603,21 +669,23 @@ class ChimeraAgent:
         }
         
         # Signature avec la clé de l'enclave (utilise sign_battle_result pour compatibilité)
-        try:
-            signature_data = self.enclave.sign_battle_result(
-                winner_id="agent",
-                loser_id="market",
-                xp_gain=0,
-                battle_log=[decision]
-            )
-            memory_entry["signature"] = signature_data["signature"]
-            memory_entry["public_key"] = signature_data["public_key"]
-        except AttributeError:
-            # Fallback si méthode sign_battle_result n'existe pas
-            memory_entry["signature"] = hashlib.sha256(json.dumps(memory_entry).encode()).hexdigest()
+        with self.tracer.span("sign"):
+            try:
+                signature_data = self.enclave.sign_battle_result(
+                    winner_id="agent",
+                    loser_id="market",
+                    xp_gain=0,
+                    battle_log=[decision]
+                )
+                memory_entry["signature"] = signature_data["signature"]
+                memory_entry["public_key"] = signature_data["public_key"]
+            except AttributeError:
+                # Fallback si méthode sign_battle_result n'existe pas
+                memory_entry["signature"] = hashlib.sha256(json.dumps(memory_entry).encode()).hexdigest()
         
         # Upload Walrus
-        blob_id = WalrusMemory.save(memory_entry)
+        with self.tracer.span("walrus_upload"):
+            blob_id = WalrusMemory.save(memory_entry)
         return blob_id
     
     def execute_battle(self, monster1_data: dict = None, monster2_data: dict = None):
@@ -692,11 +760,13 @@ class ChimeraAgent:
                 winner_id=result["winner_id"],
                 loser_id=result["loser_id"],
                 xp_gain=result["xp_gain"],
-                battle_log=result["battle_log"]
+                battle_log=result["battle_log"],
+                battle_log_hash=result.get("battle_log_hash")
             )
             battle_memory["signature"] = signature_data["signature"]
             battle_memory["public_key"] = signature_data["public_key"]
-            battle_memory["attestation"] = signature_data["attestation"]
+            battle_memory["attestation_digest"] = signature_data["attestation_digest"]
+            battle_memory["attestation_blob_id"] = getattr(self.enclave, "attestation_blob_id", None)
         except Exception as e:
             print(f"   [WARN] Signature TEE échouée: {str(e)[:50]}")
             battle_memory["signature"] = hashlib.sha256(json.dumps(battle_memory).encode()).hexdigest()
@@ -710,178 +780,265 @@ class ChimeraAgent:
         
         return battle_memory
     
-    def run_battle_mode(self):
-        """Mode combat NFT avec Gemini AI pour choisir les attaques"""
+    def battle_step(self):
+        """Un combat NFT de démo avec Gemini AI pour choisir les attaques"""
         from battle_engine import Monster, BattleEngine
         
-        print("[START] Mode Combat NFT - Gemini AI Battle Agent\n")
-        battle_count = 0
+        self.battle_count += 1
+        battle_count = self.battle_count
+        print(f"\n{'='*60}")
+        print(f" COMBAT #{battle_count} - {datetime.now().strftime('%H:%M:%S')}")
+        print(f"{'='*60}\n")
+        
+        # Créer deux monstres aléatoires pour la démo
+        monster1 = Monster(
+            monster_id=f"nft_{battle_count}_1",
+            name=random.choice(["Dragon Rouge", "Phoenix Doré", "Titan de Glace", "Léviathan"]),
+            strength=random.randint(60, 90),
+            agility=random.randint(50, 85),
+            intelligence=random.randint(55, 88),
+            level=random.randint(3, 7)
+        )
+        
+        monster2 = Monster(
+            monster_id=f"nft_{battle_count}_2",
+            name=random.choice(["Golem de Pierre", "Spectre Noir", "Hydre Venimeuse", "Griffon Céleste"]),
+            strength=random.randint(55, 92),
+            agility=random.randint(48, 87),
+            intelligence=random.randint(52, 90),
+            level=random.randint(3, 7)
+        )
+        
+        print(f"[NFT 1] {monster1.name} (Lvl {monster1.level})")
+        print(f"        STR: {monster1.strength} | AGI: {monster1.agility} | INT: {monster1.intelligence}")
+        print(f"\n[NFT 2] {monster2.name} (Lvl {monster2.level})")
+        print(f"        STR: {monster2.strength} | AGI: {monster2.agility} | INT: {monster2.intelligence}\n")
+        
+        # Lancer le combat avec Gemini AI
+        engine = BattleEngine(monster1, monster2)
+        result = engine.simulate_battle()
         
+        # Sauvegarder le résultat sur Walrus avec signature TEE
+        battle_memory = {
+            "battle_id": battle_count,
+            "timestamp": datetime.now().isoformat(),
+            "combattants": {
+                "monster1": monster1.to_dict(),
+                "monster2": monster2.to_dict()
+            },
+            "result": {
+                "winner_id": result["winner_id"],
+                "loser_id": result["loser_id"],
+                "xp_gain": result["xp_gain"],
+                "total_turns": result["total_turns"],
+                "winner_final_hp": result["winner_final_hp"]
+            },
+            "agent_id": "chimera-battle-agent-01",
+            "pcr0": self.enclave.pcrs["PCR0"][:16]
+        }
+        
+        # Signature TEE du résultat
         try:
-            while True:
-                battle_count += 1
-                print(f"\n{'='*60}")
-                print(f" COMBAT #{battle_count} - {datetime.now().strftime('%H:%M:%S')}")
-                print(f"{'='*60}\n")
-                
-                # Créer deux monstres aléatoires pour la démo
-                monster1 = Monster(
-                    monster_id=f"nft_{battle_count}_1",
-                    name=random.choice(["Dragon Rouge", "Phoenix Doré", "Titan de Glace", "Léviathan"]),
-                    strength=random.randint(60, 90),
-                    agility=random.randint(50, 85),
-                    intelligence=random.randint(55, 88),
-                    level=random.randint(3, 7)
-                )
-                
-                monster2 = Monster(
-                    monster_id=f"nft_{battle_count}_2",
-                    name=random.choice(["Golem de Pierre", "Spectre Noir", "Hydre Venimeuse", "Griffon Céleste"]),
-                    strength=random.randint(55, 92),
-                    agility=random.randint(48, 87),
-                    intelligence=random.randint(52, 90),
-                    level=random.randint(3, 7)
-                )
-                
-                print(f"[NFT 1] {monster1.name} (Lvl {monster1.level})")
-                print(f"        STR: {monster1.strength} | AGI: {monster1.agility} | INT: {monster1.intelligence}")
-                print(f"\n[NFT 2] {monster2.name} (Lvl {monster2.level})")
-                print(f"        STR: {monster2.strength} | AGI: {monster2.agility} | INT: {monster2.intelligence}\n")
-                
-                # Lancer le combat avec Gemini AI
-                engine = BattleEngine(monster1, monster2)
-                result = engine.simulate_battle()
-                
-                # Sauvegarder le résultat sur Walrus avec signature TEE
-                battle_memory = {
-                    "battle_id": battle_count,
-                    "timestamp": datetime.now().isoformat(),
-                    "combattants": {
-                        "monster1": monster1.to_dict(),
-                        "monster2": monster2.to_dict()
-                    },
-                    "result": {
-                        "winner_id": result["winner_id"],
-                        "loser_id": result["loser_id"],
-                        "xp_gain": result["xp_gain"],
-                        "total_turns": result["total_turns"],
-                        "winner_final_hp": result["winner_final_hp"]
-                    },
-                    "agent_id": "chimera-battle-agent-01",
-                    "pcr0": self.enclave.pcrs["PCR0"][:16]
-                }
-                
-                # Signature TEE du résultat
-                try:
-                    signature_data = self.enclave.sign_battle_result(
-                        winner_id=result["winner_id"],
-                        loser_id=result["loser_id"],
-                        xp_gain=result["xp_gain"],
-                        battle_log=result["battle_log"]
-                    )
-                    battle_memory["signature"] = signature_data["signature"]
-                    battle_memory["public_key"] = signature_data["public_key"]
-                    battle_memory["attestation"] = signature_data["attestation"]
-                except Exception as e:
-                    print(f"   [WARN] Signature TEE échouée: {str(e)[:50]}")
-                    battle_memory["signature"] = hashlib.sha256(json.dumps(battle_memory).encode()).hexdigest()
-                
-                # Upload sur Walrus
-                blob_id = WalrusMemory.save(battle_memory)
-                print(f"\n[WALRUS] Mémoire: {blob_id[:32]}...")
-                print(f"[TEE] Combat signé et attesté cryptographiquement\n")
-                
-                # Attendre avant le prochain combat
-                sleep_time = 45  # 45 secondes entre chaque combat
-                print(f"Prochain combat dans {sleep_time}s...\n")
-                time.sleep(sleep_time)
-                
-        except KeyboardInterrupt:
-            print("\n\n[STOP] Arrêt du Battle Agent...")
-            print(f"Total combats: {battle_count}")
+            signature_data = self.enclave.sign_battle_result(
+                winner_id=result["winner_id"],
+                loser_id=result["loser_id"],
+                xp_gain=result["xp_gain"],
+                battle_log=result["battle_log"],
+                battle_log_hash=result.get("battle_log_hash")
+            )
+            battle_memory["signature"] = signature_data["signature"]
+            battle_memory["public_key"] = signature_data["public_key"]
+            battle_memory["attestation_digest"] = signature_data["attestation_digest"]
+            battle_memory["attestation_blob_id"] = getattr(self.enclave, "attestation_blob_id", None)
+        except Exception as e:
+            print(f"   [WARN] Signature TEE échouée: {str(e)[:50]}")
+            battle_memory["signature"] = hashlib.sha256(json.dumps(battle_memory).encode()).hexdigest()
+        
+        # Upload sur Walrus
+        blob_id = WalrusMemory.save(battle_memory)
+        print(f"\n[WALRUS] Mémoire: {blob_id[:32]}...")
+        print(f"[TEE] Combat signé et attesté cryptographiquement\n")
+        
+        # Prochain combat dans BATTLE_INTERVAL secondes (45s par défaut)
+        print(f"Prochain combat dans {BATTLE_INTERVAL}s...\n")
+        return BATTLE_INTERVAL
     
-    def run_trading_mode(self):
-        """Mode trading (EN PAUSE - conservé pour référence future)"""
-        print("[INFO] Mode trading en pause - utilisez run_battle_mode() à la place\n")
-        print("[START] Démarrage de l'agent...\n")
-        iteration = 0
+    def trading_step(self):
+        """Une itération de trading tracée; retourne le délai avant la suivante"""
+        with self.tracer.cycle():
+            return self._trading_iteration()
+    
+    def _trading_iteration(self):
+        self.iteration += 1
+        print(f"\n{'='*60}")
+        print(f" ITÉRATION #{self.iteration} - {datetime.now().strftime('%H:%M:%S')}")
+        print(f"{'='*60}")
         
-        try:
-            while True:
-                iteration += 1
-                print(f"\n{'='*60}")
-                print(f" ITÉRATION #{iteration} - {datetime.now().strftime('%H:%M:%S')}")
-                print(f"{'='*60}")
-                
-                # 1. Analyser le marché
-                market = self.analyze_market()
-                
-                # Icones pour les sources de données
-                source_icons = {
-                    "binance": "[BINANCE]",
-                    "coinbase": "[COINBASE]", 
-                    "coingecko": "[COINGECKO]",
-                    "cache": "[CACHE]",
-                    "simulation": "[SIM]"
-                }
-                source_icon = source_icons.get(market.get("data_source"), "[UNKNOWN]")
-                
-                recent_change = market.get('recent_change_pct', 0)
-                change_indicator = "▲" if recent_change > 0 else "▼" if recent_change < 0 else "═"
-                
-                print(f"{source_icon} Prix: ${market['sui_price']:.4f} {change_indicator} {recent_change:+.3f}% | Trend: {market['trend']} | Vol 24h: ${market.get('volume_24h', 0)/1e6:.1f}M")
-                
-                # 2. Prendre une décision
-                decision = self.make_decision(market)
-                print(f"[DECISION] {decision['action']} | Setup: {decision.get('setup', 'N/A')} | Confiance: {decision['confidence']:.0%}")
-                print(f"[REASON] {decision['reasoning']}")
-                
-                # Afficher risk management si trade actif
-                if decision['action'] != 'HOLD':
-                    rm = decision.get('risk_management', {})
-                    print(f"[RISK] SL: ${rm.get('stop_loss', 0):.4f} | TP1: ${rm.get('take_profit_1', 0):.4f} | TP2: ${rm.get('take_profit_2', 0):.4f}")
-                    print(f"[SIZE] Position: ${rm.get('position_size_usd', 0):.2f} | Risque: ${rm.get('risk_usd', 0):.2f}")
-                
-                # 3. Exécuter l'action
-                execution = self.execute_action(decision)
-                
-                # 4. Sauvegarder dans la mémoire
-                blob_id = self.save_to_memory(decision, execution)
-                print(f" Mémoire Walrus: {blob_id[:32]}...")
-                
-                # 5. Attendre avant la prochaine itération
-                if decision["action"] == "HOLD":
-                    sleep_time = 35  # 35s si pas d'action (cache 30s + marge)
-                else:
-                    sleep_time = 40  # 40s si action effectuée
-                
-                print(f"\n Prochaine analyse dans {sleep_time}s...")
-                time.sleep(sleep_time)
-                
-        except KeyboardInterrupt:
-            print("\n\n Arrêt de l'agent...")
-
+        # 1. Analyser le marché
+        with self.tracer.span("analyze_market"):
+            market = self.analyze_market()
+        
+        # Icones pour les sources de données
+        source_icons = {
+            "binance": "[BINANCE]",
+            "coinbase": "[COINBASE]", 
+            "coingecko": "[COINGECKO]",
+            "cache": "[CACHE]",
+            "simulation": "[SIM]"
+        }
+        source_icon = source_icons.get(market.get("data_source"), "[UNKNOWN]")
+        
+        recent_change = market.get('recent_change_pct', 0)
+        change_indicator = "▲" if recent_change > 0 else "▼" if recent_change < 0 else "═"
+        
+        print(f"{source_icon} Prix: ${market['sui_price']:.4f} {change_indicator} {recent_change:+.3f}% | Trend: {market['trend']} | Vol 24h: ${market.get('volume_24h', 0)/1e6:.1f}M")
+        
+        # 2. Prendre une décision
+        with self.tracer.span("make_decision"):
+            decision = self.make_decision(market)
+        if self.signal_trigger is not None:
+            # Les prochains déclenchements sont mesurés depuis l'état de cette décision
+            self.signal_trigger.commit(market["sui_price"], self.indicators.values())
+        print(f"[DECISION] {decision['action']} | Setup: {decision.get('setup', 'N/A')} | Confiance: {decision['confidence']:.0%}")
+        print(f"[REASON] {decision['reasoning']}")
+        
+        # Afficher risk management si trade actif
+        if decision['action'] != 'HOLD':
+            rm = decision.get('risk_management', {})
+            print(f"[RISK] SL: ${rm.get('stop_loss', 0):.4f} | TP1: ${rm.get('take_profit_1', 0):.4f} | TP2: ${rm.get('take_profit_2', 0):.4f}")
+            print(f"[SIZE] Position: ${rm.get('position_size_usd', 0):.2f} | Risque: ${rm.get('risk_usd', 0):.2f}")
+        
+        # 3. Exécuter l'action
+        with self.tracer.span("execute_action"):
+            execution = self.execute_action(decision)
+        
+        # 4. Sauvegarder dans la mémoire
+        with self.tracer.span("save_to_memory"):
+            blob_id = self.save_to_memory(decision, execution)
+        print(f" Mémoire Walrus: {blob_id[:32]}...")
+        
+        # 5. Attendre avant la prochaine itération (réveil anticipé par bougie clôturée ou déclencheur)
+        if self.signal_trigger is not None:
+            sleep_time = TRADING_MAX_IDLE
+        else:
+            sleep_time = TRADING_INTERVAL if decision["action"] == "HOLD" else TRADING_INTERVAL + 5
+        print(f"\n Prochaine analyse dans {sleep_time}s...")
+        return sleep_time
+    
+    def signal_step(self):
+        """
+        Mode événementiel: compare les indicateurs streaming à l'état de la
+        dernière décision et réveille la tâche trading si un seuil est franchi.
+        Aucun appel LLM ni upload Walrus ici.
+        """
+        quote, age = self.market_data.latest()
+        if quote is None or age > self.market_data.ttl:
+            return None
+        now = time.time()
+        with self._indicators_lock:
+            # Bougie clôturée manquante: mise à jour complète, sinon bougies en formation (ticks)
+            if any(last is None or now >= last + 2 * TIMEFRAME_SECONDS[tf]
+                   for tf, last in self.indicators.last_close_time.items()):
+                self._update_indicators()
+            for tf in self.indicators.last_close_time:
+                forming = self.candles.current(tf)
+                if forming is not None:
+                    self.indicators.on_forming(tf, forming)
+            values = self.indicators.values()
+        reasons = self.signal_trigger.observe(quote["price"], values, now)
+        if reasons:
+            print(f"\n[TRIGGER] {' | '.join(reasons)} - décision anticipée")
+            self.runtime.wake("trading")
+        return None
+    
+    def run_battle_mode(self):
+        """Mode combat NFT seul"""
+        self.run_modes(["battle"])
+    
+    def run_trading_mode(self):
+        """Mode trading seul (EN PAUSE - conservé pour référence future)"""
+        self.run_modes(["trading"])
+    
     def run_listener_mode(self):
         """Mode qui écoute les BattleRequest on-chain et les règle via le TEE."""
-        print("[START] Listener BattleRequest on-chain\n")
-        from battle_request_listener import BattleRequestListener
-
-        listener = BattleRequestListener()
-        listener.run()
+        self.run_modes(["listener"])
+    
+    def run_modes(self, modes):
+        """
+        Lance les modes demandés comme tâches concurrentes d'une seule boucle
+        asyncio (enclave, pool RPC et client Gemini partagés)
+        """
+        runtime = AgentRuntime()
+        self.runtime = runtime
+        
+        # Attestation complète publiée une seule fois par époque de clé (upload
+        # bloquant: les mémoires référencent un vrai blob_id, pas un placeholder)
+        if hasattr(self.enclave, "publish_attestation"):
+            attestation_blob = self.enclave.publish_attestation(WalrusMemory.save_sync)
+            print(f"[ATTEST] Attestation publiée: {attestation_blob[:32]}...\n")
+        
+        if "listener" in modes:
+            print("[START] Listener BattleRequest on-chain\n")
+            from battle_request_listener import BattleRequestListener
+            
+            listener = BattleRequestListener()
+            listener.metrics.start_exporters()
+            runtime.add(AgentTask("listener", listener.poll, listener.poll_interval, priority=2))
+        
+        if "trading" in modes:
+            print("[INFO] Mode trading en pause - utilisez le mode battle à la place\n")
+            print("[START] Démarrage de l'agent...\n")
+            self.start_market_data()
+            entry_tf = TRADING_CONFIG["timeframes"]["entry"]
+            if self.signal_trigger is not None:
+                # Décisions sur seuils: chaque prix / bougie réévalue les déclencheurs
+                print(f"[TRIGGER] Mode événementiel (décision forcée toutes les {TRADING_MAX_IDLE}s)\n")
+                runtime.add(AgentTask("trading", self.trading_step, TRADING_MAX_IDLE, priority=1))
+                runtime.add(AgentTask("signals", self.signal_step, self.market_data.refresh_interval, priority=1))
+                self.market_data.subscribe(lambda quote: runtime.wake("signals"))
+                self.candles.on_close = lambda tf, candle: runtime.wake("signals")
+            else:
+                runtime.add(AgentTask("trading", self.trading_step, TRADING_INTERVAL, priority=1))
+                # Une bougie d'entrée clôturée déclenche l'analyse sans attendre l'intervalle
+                self.candles.on_close = lambda tf, candle: runtime.wake("trading") if tf == entry_tf else None
+        
+        if "battle" in modes:
+            print("[START] Mode Combat NFT - Gemini AI Battle Agent\n")
+            runtime.add(AgentTask("battle", self.battle_step, BATTLE_INTERVAL, priority=0))
+        
+        runtime.run()
+        
+        print("\n\n[STOP] Arrêt de l'agent...")
+        if "battle" in modes:
+            print(f"Total combats: {self.battle_count}")
     
     def run(self):
-        """Point d'entrée principal - lance le mode combat NFT par défaut"""
-        mode = os.getenv("AGENT_MODE", "listener").lower()
-        
-        if (mode == "trading"):
-            print("[MODE] Trading activé (expérimental)\n")
-            self.run_trading_mode()
-        elif mode == "listener":
-            print("[MODE] Listener on-chain activé (défaut)\n")
-            self.run_listener_mode()
-        else:
-            print("[MODE] Battle NFT manuel\n")
-            self.run_battle_mode()
+        """
+        Point d'entrée principal - AGENT_MODE liste les modes à lancer ensemble
+        (ex: "listener,trading" ou "all"); listener par défaut
+        """
+        modes = parse_agent_modes(os.getenv("AGENT_MODE", "listener"))
+        
+        if "trading" in modes:
+            print("[MODE] Trading activé (expérimental)")
+        if "listener" in modes:
+            print("[MODE] Listener on-chain activé")
+        if "battle" in modes:
+            print("[MODE] Battle NFT automatique")
+        print()
+        self.run_modes(modes)
+
+
+def parse_agent_modes(value: str) -> list:
+    """"listener,trading" -> ["listener", "trading"]; "all" -> les trois; autre valeur -> battle"""
+    modes = []
+    for token in value.lower().replace(" ", "").split(","):
+        if token == "all":
+            return ["listener", "trading", "battle"]
+        mode = token if token in ("listener", "trading") else "battle"
+        if mode not in modes:
+            modes.append(mode)
+    return modes
 
 
 def main():
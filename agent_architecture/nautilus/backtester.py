@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+DUAL-SETUP BACKTESTER
+=====================
+Replays the TREND_PULLBACK / VWAP_FADE rules of ChimeraAgent.make_decision
+over historical 5m OHLCV candles. Indicators are computed over whole NumPy
+arrays with the same definitions as indicators.py (SMA-seeded EMA, Wilder
+RSI / ATR, UTC-session VWAP); the 15m bias frame is resampled from the 5m
+candles and only used once its candle has closed (no lookahead).
+
+Trades: one position at a time, entered at the signal candle's close, half
+closed at TP1 (stop then moved to break-even), the rest at TP2 or stop. When
+a candle touches both stop and target the stop is assumed first.
+
+Input: CSV (timestamp, open, high, low, close, volume - Binance kline exports
+work as-is; timestamps in s or ms), Parquet with those columns (pandas), or
+the agent's own candle store (.ohlcv, see candle_store.py), read zero-copy.
+
+Offline tool, not part of the agent images: needs numpy (pip install numpy).
+
+Usage:
+    python3 backtester.py SUIUSDT-5m-2024.csv [--fee-bps 5]
+    python3 backtester.py .candles/SUIUSDT-5m.ohlcv
+"""
+
+import math
+import os
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from candle_store import TIMEFRAME_SECONDS as CANDLE_SECONDS, CandleStore
+
+COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+
+
+# === DATA LOADING ===
+def load_ohlcv(path: str) -> Dict[str, np.ndarray]:
+    """Load OHLCV columns as float64 arrays (timestamps converted to seconds)."""
+    if path.endswith(".ohlcv"):
+        return CandleStore(path).as_arrays()  # already sorted: views over the mapped file
+    if path.endswith(".parquet"):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise RuntimeError("Parquet input requires pandas (pip install pandas pyarrow)")
+        frame = pd.read_parquet(path)
+        data = {name: frame[name].to_numpy(dtype=np.float64) for name in COLUMNS}
+    else:
+        with open(path) as fh:
+            first = fh.readline()
+        has_header = any(c.isalpha() for c in first.split(",")[0])
+        raw = np.loadtxt(path, delimiter=",", skiprows=1 if has_header else 0, usecols=range(6), ndmin=2)
+        data = {name: raw[:, i].copy() for i, name in enumerate(COLUMNS)}
+    if len(data["timestamp"]) and data["timestamp"][0] > 1e11:
+        data["timestamp"] = data["timestamp"] / 1000
+    order = np.argsort(data["timestamp"], kind="stable")
+    return {name: values[order] for name, values in data.items()}
+
+
+def resample(candles: Dict[str, np.ndarray], seconds: int) -> Dict[str, np.ndarray]:
+    """Aggregate candles into `seconds` buckets aligned on the epoch."""
+    bucket = (candles["timestamp"] // seconds).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(bucket)] - 1
+    return {
+        "timestamp": bucket[starts].astype(np.float64) * seconds,
+        "open": candles["open"][starts],
+        "high": np.maximum.reduceat(candles["high"], starts),
+        "low": np.minimum.reduceat(candles["low"], starts),
+        "close": candles["close"][ends],
+        "volume": np.add.reduceat(candles["volume"], starts),
+    }
+
+
+# === VECTORIZED INDICATORS ===
+def _recursive_smooth(x: np.ndarray, alpha: float, period: int) -> np.ndarray:
+    """
+    y[t] = y[t-1] + alpha * (x[t] - y[t-1]) seeded with mean(x[:period]) at t = period-1.
+    Solved in closed form over blocks short enough that decay**-len stays well
+    conditioned, so the Python loop runs len(x) / block times.
+    """
+    out = np.full(len(x), np.nan)
+    if len(x) < period:
+        return out
+    out[period - 1] = x[:period].mean()
+    decay = 1.0 - alpha
+    if decay <= 0:
+        out[period - 1:] = x[period - 1:]
+        return out
+    block = max(1, int(10 / -math.log(decay)))
+    prev = out[period - 1]
+    i = period
+    while i < len(x):
+        chunk = x[i:i + block]
+        k = np.arange(1, len(chunk) + 1)
+        powers = decay ** k
+        # y[i+j] = decay^(j+1) * prev + alpha * sum_{m<=j} decay^(j-m) x[i+m]
+        weighted = np.cumsum(chunk / powers) * powers
+        out[i:i + len(chunk)] = powers * prev + alpha * weighted
+        prev = out[i + len(chunk) - 1]
+        i += len(chunk)
+    return out
+
+
+def ema(close: np.ndarray, period: int) -> np.ndarray:
+    return _recursive_smooth(close, 2 / (period + 1), period)
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    delta = np.diff(close)
+    avg_gain = _recursive_smooth(np.maximum(delta, 0.0), 1 / period, period)
+    avg_loss = _recursive_smooth(np.maximum(-delta, 0.0), 1 / period, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100 - 100 / (1 + avg_gain / avg_loss)
+    values = np.where(avg_loss == 0, np.where(avg_gain > 0, 100.0, 50.0), values)
+    return np.r_[np.nan, np.where(np.isnan(avg_gain), np.nan, values)]
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    prev_close = np.r_[np.nan, close[:-1]]
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return _recursive_smooth(true_range, 1 / period, period)
+
+
+def session_vwap(candles: Dict[str, np.ndarray], session_seconds: int = 86400) -> np.ndarray:
+    typical = (candles["high"] + candles["low"] + candles["close"]) / 3
+    pv = np.cumsum(typical * candles["volume"])
+    vol = np.cumsum(candles["volume"])
+    session = (candles["timestamp"] // session_seconds).astype(np.int64)
+    first = np.flatnonzero(np.r_[True, session[1:] != session[:-1]])
+    start_of = np.repeat(first, np.diff(np.r_[first, len(session)]))
+    pv_before = np.where(start_of > 0, pv[start_of - 1], 0.0)
+    vol_before = np.where(start_of > 0, vol[start_of - 1], 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (pv - pv_before) / (vol - vol_before)
+
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        csum = np.cumsum(np.r_[0.0, values])
+        out[period - 1:] = (csum[period:] - csum[:-period]) / period
+    return out
+
+
+def compute_indicators(
+    candles: Dict[str, np.ndarray],
+    config: Dict[str, Any],
+    cache: Optional[Dict[Any, np.ndarray]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    All strategy indicators aligned on the entry-timeframe candles.
+    ``cache`` (same candles only) memoizes series by (indicator, timeframe,
+    period) so parameter sweeps compute each series once.
+    """
+    params = config["indicators"]
+    entry_tf, bias_tf = config["timeframes"]["entry"], config["timeframes"]["bias"]
+    entry_seconds = CANDLE_SECONDS[entry_tf]
+    bias_seconds = CANDLE_SECONDS[bias_tf]
+    cache = {} if cache is None else cache
+
+    def memo(key, fn, *args):
+        if key not in cache:
+            cache[key] = fn(*args)
+        return cache[key]
+
+    bias = memo(("resample", bias_tf), resample, candles, bias_seconds)
+    out = {
+        "ema_fast_entry": memo(("ema", entry_tf, params["ema_entry"][0]), ema, candles["close"], params["ema_entry"][0]),
+        "ema_slow_entry": memo(("ema", entry_tf, params["ema_entry"][1]), ema, candles["close"], params["ema_entry"][1]),
+        "rsi": memo(("rsi", entry_tf, params["rsi_period"]), rsi, candles["close"], params["rsi_period"]),
+        "atr": memo(("atr", entry_tf, params["atr_period"]), atr, candles["high"], candles["low"], candles["close"], params["atr_period"]),
+        "volume_sma": memo(("sma", entry_tf, params["volume_sma"]), sma, candles["volume"], params["volume_sma"]),
+    }
+    bias_values = {
+        "ema_fast_bias": memo(("ema", bias_tf, params["ema_bias"][0]), ema, bias["close"], params["ema_bias"][0]),
+        "ema_slow_bias": memo(("ema", bias_tf, params["ema_bias"][1]), ema, bias["close"], params["ema_bias"][1]),
+        "vwap": memo(("vwap", bias_tf), session_vwap, bias),
+    }
+    # Latest bias candle already closed when the entry candle closes
+    entry_close = candles["timestamp"] + entry_seconds
+    closed = np.searchsorted(bias["timestamp"] + bias_seconds, entry_close, side="right") - 1
+    valid = closed >= 0
+    for name, values in bias_values.items():
+        aligned = np.full(len(closed), np.nan)
+        aligned[valid] = values[closed[valid]]
+        out[name] = aligned
+    return out
+
+
+# === SIGNALS AND TRADES ===
+def generate_signals(candles: Dict[str, np.ndarray], ind: Dict[str, np.ndarray], config: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Vectorized make_decision: direction (+1/-1/0), setup code (1=A, 2=B), stop and targets."""
+    price = candles["close"]
+    vwap, atr_v, rsi_v = ind["vwap"], ind["atr"], ind["rsi"]
+    low_atr, high_atr = config["atr_normal_range"]
+    setup_a, setup_b = config["setup_a"], config["setup_b"]
+
+    with np.errstate(invalid="ignore"):
+        bullish = (ind["ema_fast_bias"] > ind["ema_slow_bias"]) & (price > vwap)
+        bearish = (ind["ema_fast_bias"] < ind["ema_slow_bias"]) & (price < vwap)
+        ranging = ~bullish & ~bearish
+        atr_frac = atr_v / price
+        atr_ok = (atr_frac >= low_atr) & (atr_frac <= high_atr)
+        far = np.abs(price - vwap) >= setup_b["distance_atr_mult"] * atr_v
+
+        a_long = bullish & atr_ok & (ind["ema_fast_entry"] > ind["ema_slow_entry"]) & (rsi_v > 50)
+        a_short = bearish & atr_ok & (ind["ema_fast_entry"] < ind["ema_slow_entry"]) & (rsi_v < 50)
+        b_short = ranging & (price > vwap) & far & (rsi_v > setup_b["rsi_overbought"])
+        b_long = ranging & (price < vwap) & far & (rsi_v < setup_b["rsi_oversold"])
+
+    ready = ~np.isnan(ind["ema_slow_bias"] + ind["ema_slow_entry"] + rsi_v + atr_v + vwap)
+    direction = np.where(ready & (a_long | b_long), 1, np.where(ready & (a_short | b_short), -1, 0))
+    setup = np.where(a_long | a_short, 1, np.where(b_long | b_short, 2, 0)) * (direction != 0)
+
+    stop_mult = np.where(setup == 1, setup_a["stop_atr_mult"], setup_b["stop_atr_mult"])
+    stop = price - direction * stop_mult * atr_v
+    tp1 = np.where(setup == 1, price + direction * setup_a["tp1_atr_mult"] * atr_v, vwap)
+    tp2 = np.where(
+        setup == 1,
+        price + direction * setup_a["tp2_atr_mult"] * atr_v,
+        price + direction * setup_b["tp_atr_mult"] * atr_v
+    )
+    return {"direction": direction, "setup": setup, "stop": stop, "tp1": tp1, "tp2": tp2}
+
+
+def _first_hit(mask: np.ndarray) -> int:
+    """Index of the first True, or len(mask) when none."""
+    hits = np.flatnonzero(mask)
+    return int(hits[0]) if len(hits) else len(mask)
+
+
+def simulate_trades(
+    candles: Dict[str, np.ndarray],
+    signals: Dict[str, np.ndarray],
+    config: Dict[str, Any],
+    fee_bps: float = 5.0,
+    max_hold: int = 288
+) -> Dict[str, np.ndarray]:
+    """Walk entry signals one position at a time; exits are found with vectorized scans."""
+    high, low, close = candles["high"], candles["low"], candles["close"]
+    risk_usd = config["equity"] * config["risk_per_trade_pct"]
+    fee = fee_bps / 10_000
+    entries = np.flatnonzero(signals["direction"] != 0)
+    rows = []
+    next_free = 0
+    for i in entries:
+        if i < next_free or i + 1 >= len(close):
+            continue
+        side = signals["direction"][i]
+        entry, stop, tp1, tp2 = close[i], signals["stop"][i], signals["tp1"][i], signals["tp2"][i]
+        stop_distance = abs(entry - stop)
+        if not stop_distance > 0 or side * (tp1 - entry) <= 0:
+            continue
+        size = risk_usd / stop_distance
+        if signals["setup"][i] == 2:
+            size *= 0.5  # taille réduite en VWAP fade, comme make_decision
+
+        window = slice(i + 1, min(i + 1 + max_hold, len(close)))
+        adverse = low[window] if side > 0 else high[window]
+        favorable = high[window] if side > 0 else low[window]
+        stop_at = _first_hit(side * (adverse - stop) <= 0)
+        tp1_at = _first_hit(side * (favorable - tp1) >= 0)
+
+        if stop_at <= tp1_at:
+            exit_at = min(stop_at, len(adverse) - 1)
+            exit_price = stop if stop_at < len(adverse) else close[window][-1]
+            pnl = side * (exit_price - entry) * size
+            fees = fee * size * (entry + exit_price)
+        else:
+            # Half at TP1, remainder: break-even stop or TP2 after TP1
+            rest = slice(tp1_at + 1, len(adverse))
+            be_at = _first_hit(side * (adverse[rest] - entry) <= 0)
+            tp2_at = _first_hit(side * (favorable[rest] - tp2) >= 0)
+            if tp2_at < be_at:
+                exit_at, exit_price = tp1_at + 1 + tp2_at, tp2
+            elif be_at < len(adverse[rest]):
+                exit_at, exit_price = tp1_at + 1 + be_at, entry
+            else:
+                exit_at, exit_price = len(adverse) - 1, close[window][-1]
+            if side * (favorable[tp1_at] - tp2) >= 0 and side * (adverse[tp1_at] - entry) > 0:
+                exit_at, exit_price = tp1_at, tp2  # TP1 and TP2 in the same candle
+            pnl = side * ((tp1 - entry) + (exit_price - entry)) * size / 2
+            fees = fee * size * (entry + (tp1 + exit_price) / 2)
+
+        exit_index = i + 1 + exit_at
+        rows.append((i, exit_index, side, signals["setup"][i], entry, exit_price, pnl - fees))
+        next_free = exit_index + 1
+
+    trades = np.array(rows, dtype=np.float64).reshape(-1, 7)
+    return {
+        "entry_index": trades[:, 0].astype(np.int64),
+        "exit_index": trades[:, 1].astype(np.int64),
+        "side": trades[:, 2].astype(np.int8),
+        "setup": trades[:, 3].astype(np.int8),
+        "entry_price": trades[:, 4],
+        "exit_price": trades[:, 5],
+        "pnl": trades[:, 6],
+    }
+
+
+def summarize(candles: Dict[str, np.ndarray], trades: Dict[str, np.ndarray], config: Dict[str, Any]) -> Dict[str, Any]:
+    pnl = trades["pnl"]
+    equity = config["equity"] + np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.r_[config["equity"], equity])[1:]
+    drawdown = (peak - equity) / peak if len(equity) else np.zeros(0)
+    gains, losses = pnl[pnl > 0].sum(), -pnl[pnl < 0].sum()
+    days = (candles["timestamp"][-1] - candles["timestamp"][0]) / 86400 if len(candles["timestamp"]) > 1 else 0
+
+    # Daily returns for a Sharpe ratio (trades booked on their exit day)
+    daily = np.zeros(max(int(math.ceil(days)), 1))
+    if len(pnl):
+        exit_day = ((candles["timestamp"][trades["exit_index"]] - candles["timestamp"][0]) // 86400).astype(np.int64)
+        np.add.at(daily, np.minimum(exit_day, len(daily) - 1), pnl / config["equity"])
+    sharpe = float(daily.mean() / daily.std() * math.sqrt(365)) if daily.std() > 0 else 0.0
+
+    by_setup = {}
+    for code, name in ((1, config["setup_a"]["name"]), (2, config["setup_b"]["name"])):
+        mask = trades["setup"] == code
+        by_setup[name] = {
+            "trades": int(mask.sum()),
+            "pnl": float(pnl[mask].sum()),
+            "hit_rate": float((pnl[mask] > 0).mean()) if mask.any() else 0.0,
+        }
+    return {
+        "candles": int(len(candles["close"])),
+        "days": round(float(days), 1),
+        "trades": int(len(pnl)),
+        "pnl": float(pnl.sum()),
+        "return_pct": float(pnl.sum() / config["equity"] * 100),
+        "hit_rate": float((pnl > 0).mean()) if len(pnl) else 0.0,
+        "profit_factor": float(gains / losses) if losses > 0 else float("inf") if gains > 0 else 0.0,
+        "max_drawdown_pct": float(drawdown.max() * 100) if len(drawdown) else 0.0,
+        "sharpe": sharpe,
+        "by_setup": by_setup,
+    }
+
+
+def run_backtest(
+    candles: Dict[str, np.ndarray],
+    config: Dict[str, Any],
+    fee_bps: Optional[float] = None,
+    cache: Optional[Dict[Any, np.ndarray]] = None
+) -> Dict[str, Any]:
+    """Indicators -> signals -> trades -> summary for one config."""
+    fee = fee_bps if fee_bps is not None else float(os.getenv("BACKTEST_FEE_BPS", "5"))
+    indicators = compute_indicators(candles, config, cache)
+    signals = generate_signals(candles, indicators, config)
+    trades = simulate_trades(candles, signals, config, fee_bps=fee)
+    return summarize(candles, trades, config)
+
+
+def main() -> None:
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Backtest the dual-setup strategy on OHLCV history")
+    parser.add_argument("path", help="CSV or Parquet file of 5m candles")
+    parser.add_argument("--fee-bps", type=float, default=None, help="fee per side in basis points")
+    args = parser.parse_args()
+
+    from app import TRADING_CONFIG
+
+    started = time.perf_counter()
+    candles = load_ohlcv(args.path)
+    report = run_backtest(candles, TRADING_CONFIG, fee_bps=args.fee_bps)
+    elapsed = time.perf_counter() - started
+
+    print(f"📈 Backtest {args.path}: {report['candles']} candles / {report['days']} days ({elapsed:.2f}s)")
+    print(f"   Trades: {report['trades']} | Hit rate: {report['hit_rate']*100:.1f}% | Profit factor: {report['profit_factor']:.2f}")
+    print(f"   PnL: ${report['pnl']:.2f} ({report['return_pct']:+.2f}%) | Max DD: {report['max_drawdown_pct']:.2f}% | Sharpe: {report['sharpe']:.2f}")
+    for name, stats in report["by_setup"].items():
+        print(f"   {name}: {stats['trades']} trades, ${stats['pnl']:.2f}, hit {stats['hit_rate']*100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
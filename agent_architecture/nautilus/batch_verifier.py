@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+BATCH SIGNATURE VERIFIER
+========================
+Re-verifies many enclave signatures at once for auditing jobs: verify keys are
+parsed once per process (load_verify_key cache), payloads are BCS-encoded
+without per-item logging, and large inputs are split into chunks checked in
+parallel on a process pool. Results signed in a Merkle batch by the signing
+daemon are checked against their root (each root signature once) plus their
+inclusion proof.
+
+The input is the settlement results file written by settlement_tracker.py
+(SETTLEMENT_RESULTS_FILE): the latest record of each request carries the
+signed payload, signature, enclave public key and batch proof. Records
+without a signature (e.g. rebuilt from chain history by battle_backfill.py
+with no local proof) are reported as unsigned.
+
+Usage:
+    python3 batch_verifier.py [.battle_results.jsonl]
+"""
+
+import functools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from nacl.exceptions import BadSignatureError
+from nacl.encoding import RawEncoder
+
+from nautilus_enclave import (
+    EnclaveSimulator,
+    _batch_root_message,
+    _merkle_leaf,
+    load_verify_key,
+    verify_merkle_proof,
+)
+
+# (public_key_hex, payload_dict, signature_hex, batch_proof or None)
+VerificationItem = Tuple[str, Dict[str, Any], str, Optional[Dict[str, Any]]]
+
+
+@functools.lru_cache(maxsize=256)
+def _root_signature_ok(public_key_hex: str, root_hex: str, leaf_count: int, signature_hex: str) -> bool:
+    try:
+        load_verify_key(public_key_hex).verify(
+            _batch_root_message(bytes.fromhex(root_hex), leaf_count),
+            bytes.fromhex(signature_hex),
+            encoder=RawEncoder
+        )
+        return True
+    except (BadSignatureError, ValueError, TypeError):
+        return False
+
+
+def _verify_one(
+    public_key_hex: str,
+    payload: Dict[str, Any],
+    signature_hex: str,
+    batch: Optional[Dict[str, Any]] = None
+) -> bool:
+    try:
+        payload_bytes = EnclaveSimulator._payload_bytes(payload)
+        if batch is not None:
+            count = int(batch["count"])
+            return _root_signature_ok(public_key_hex, batch["root"], count, signature_hex) and verify_merkle_proof(
+                _merkle_leaf(payload_bytes), int(batch["proof"]["index"]), count,
+                batch["proof"]["siblings"], bytes.fromhex(batch["root"])
+            )
+        load_verify_key(public_key_hex).verify(payload_bytes, bytes.fromhex(signature_hex), encoder=RawEncoder)
+        return True
+    except (BadSignatureError, ValueError, KeyError, TypeError):
+        return False
+
+
+def _verify_chunk(items: Sequence[VerificationItem]) -> List[bool]:
+    return [_verify_one(*item) for item in items]
+
+
+def items_from_results(results: Iterable[Dict[str, Any]]) -> List[VerificationItem]:
+    """Extract verification items from signed results (tracker record, orchestrator or enclave shape)."""
+    items = []
+    for result in results:
+        public_key = result.get("enclave_public_key") or result.get("public_key")
+        batch = result.get("signature_batch") or result.get("batch")
+        items.append((public_key, result.get("payload"), result.get("signature"), batch))
+    return items
+
+
+def latest_records(lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """Last record per request from a settlement results file (status transitions are appended)."""
+    latest: Dict[Any, Dict[str, Any]] = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        key = record.get("request_id")
+        if key is None:
+            key = (record.get("winner_id"), record.get("loser_id"), (record.get("payload") or {}).get("timestamp"))
+        latest[key] = record
+    return list(latest.values())
+
+
+def verify_many(
+    pairs: Sequence[Any],
+    public_key_hex: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Verify a list of signatures.
+
+    Args:
+        pairs: (payload, signature_hex[, batch]) when ``public_key_hex`` is
+            given, otherwise (public_key_hex, payload, signature_hex[, batch])
+        workers: process pool size (default: CPU count)
+        chunk_size: items per pool task; inputs no larger than one chunk are
+            verified in-process
+
+    Returns:
+        dict with per-item ``results`` (same order as input) and throughput stats
+    """
+    items: List[VerificationItem] = [
+        ((public_key_hex,) + tuple(pair) if public_key_hex else tuple(pair) + (None,))[:4]
+        for pair in pairs
+    ]
+    chunk = chunk_size or int(os.getenv("VERIFY_CHUNK_SIZE", "512"))
+    started = time.perf_counter()
+
+    if len(items) <= chunk:
+        results = _verify_chunk(items)
+        used_workers = 1
+    else:
+        used_workers = workers or int(os.getenv("VERIFY_WORKERS", str(os.cpu_count() or 2)))
+        chunks = [items[i:i + chunk] for i in range(0, len(items), chunk)]
+        with ProcessPoolExecutor(max_workers=used_workers) as pool:
+            results = [ok for chunk_results in pool.map(_verify_chunk, chunks) for ok in chunk_results]
+
+    elapsed = time.perf_counter() - started
+    valid = sum(results)
+    return {
+        "results": results,
+        "total": len(results),
+        "valid": valid,
+        "invalid": len(results) - valid,
+        "workers": used_workers,
+        "elapsed_s": elapsed,
+        "per_second": len(results) / elapsed if elapsed > 0 else float("inf"),
+    }
+
+
+def main() -> None:
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else os.getenv("SETTLEMENT_RESULTS_FILE", ".battle_results.jsonl")
+    if not os.path.exists(path):
+        print(f"Usage: python3 batch_verifier.py [results.jsonl]  ({path} not found)")
+        sys.exit(1)
+    with open(path) as fh:
+        records = latest_records(fh)
+    results = [record for record in records if record.get("signature") and record.get("payload")]
+    report = verify_many(items_from_results(results))
+    print(f"🔍 Verified {report['total']} signatures in {report['elapsed_s']:.2f}s "
+          f"({report['per_second']:.0f}/s, {report['workers']} workers)")
+    print(f"   ✅ valid: {report['valid']} | ❌ invalid: {report['invalid']} | unsigned: {len(records) - len(results)}")
+    for index, ok in enumerate(report["results"]):
+        if not ok:
+            print(f"   ❌ request {results[index].get('request_id')} ({results[index].get('status')})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""Backfill historical BattleRequest / BattleEvent ranges, then hand over to live listening.
+
+Usage:
+    python3 battle_backfill.py --since-hours 24 [--follow]
+    python3 battle_backfill.py --start-checkpoint 1200000 --end-checkpoint 1250000
+    python3 battle_backfill.py --start-ms 1730000000000 --end-ms 1730086400000 --rebuild-only
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from battle_request_listener import BattleRequestListener
+from settlement_tracker import get_settlement_tracker
+
+logger = logging.getLogger(__name__)
+
+# suix_queryEvents page size limit on public fullnodes
+MAX_PAGE_SIZE = 50
+
+
+def _event_key(entry: Dict[str, Any]) -> Tuple[str, str]:
+    event_id = entry.get("id") or {}
+    return str(event_id.get("txDigest")), str(event_id.get("eventSeq"))
+
+
+def merge_segments(segments: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Concatenate time-ordered segments and drop events seen at a segment boundary twice."""
+    merged: List[Dict[str, Any]] = []
+    seen = set()
+    for segment in segments:
+        for entry in segment:
+            key = _event_key(entry)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(entry)
+    return merged
+
+
+class BattleBackfill:
+    """Recovers a listener backlog by fetching time segments concurrently.
+
+    The range is split into ``segments`` contiguous time windows, each paged
+    through on its own thread with a ``MoveEventType`` + ``TimeRange`` filter.
+    Segments are merged in time order and deduplicated by event id.
+
+    ``BattleEvent`` history is used to rebuild the local index (request_id ->
+    on-chain outcome) and the settlement results file, and any BattleRequest
+    that already has a BattleEvent is skipped, so a backfill never settles the
+    same request twice. After processing, the listener cursor is moved past
+    the backfilled requests up to the first one that failed, so live polling
+    retries it and resumes with no gap.
+    """
+
+    def __init__(
+        self,
+        listener: Optional[BattleRequestListener] = None,
+        segments: Optional[int] = None,
+        workers: Optional[int] = None,
+        battle_event_type: Optional[str] = None,
+        index_path: Optional[str] = None,
+        results_path: Optional[str] = None
+    ) -> None:
+        self.listener = listener or BattleRequestListener()
+        self.segments = segments or int(os.getenv("BACKFILL_SEGMENTS", "8"))
+        self.workers = workers or int(os.getenv("BACKFILL_WORKERS", "8"))
+        self.request_event_type = self.listener.event_type
+        self.battle_event_type = battle_event_type or os.getenv("BATTLE_EVENT_TYPE") or (
+            self.request_event_type.rsplit("::", 1)[0] + "::BattleEvent"
+        )
+        self.index_file = Path(index_path or os.getenv("BATTLE_INDEX_FILE", ".battle_index.json"))
+        self.results_file = Path(results_path or os.getenv("SETTLEMENT_RESULTS_FILE", ".battle_results.jsonl"))
+
+    # --- range resolution ---
+
+    def checkpoint_time_ms(self, sequence: int) -> int:
+        checkpoint = self.listener._rpc_call("sui_getCheckpoint", [str(sequence)])
+        return int(checkpoint["timestampMs"])
+
+    def latest_time_ms(self) -> int:
+        latest = self.listener._rpc_call("sui_getLatestCheckpointSequenceNumber", [])
+        return self.checkpoint_time_ms(int(latest))
+
+    # --- concurrent fetch ---
+
+    def _fetch_segment(self, event_type: str, start_ms: int, end_ms: int) -> List[Dict[str, Any]]:
+        query = {"And": [
+            {"MoveEventType": event_type},
+            {"TimeRange": {"startTime": str(start_ms), "endTime": str(end_ms)}}
+        ]}
+        events: List[Dict[str, Any]] = []
+        cursor = None
+        while True:
+            page = self.listener._rpc_call("suix_queryEvents", [query, cursor, MAX_PAGE_SIZE, False])
+            events.extend(page.get("data", []))
+            cursor = page.get("nextCursor")
+            if not page.get("hasNextPage") or cursor is None:
+                return events
+
+    def fetch_range(self, event_type: str, start_ms: int, end_ms: int) -> List[Dict[str, Any]]:
+        """Fetch all ``event_type`` events in [start_ms, end_ms), in chain order."""
+        span = max(end_ms - start_ms, 1)
+        count = max(min(self.segments, span), 1)
+        bounds = [start_ms + (span * i) // count for i in range(count + 1)]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(self._fetch_segment, event_type, bounds[i], bounds[i + 1])
+                for i in range(count)
+            ]
+            segments = [future.result() for future in futures]
+        merged = merge_segments(segments)
+        logger.info("Fetched %s %s events over %s segments", len(merged), event_type.rsplit("::", 1)[-1], count)
+        return merged
+
+    # --- local stores ---
+
+    def rebuild_stores(self, battle_events: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Rewrite the index and results files from on-chain BattleEvent history.
+
+        The results file is rewritten under the settlement tracker's lock, so
+        records appended by in-flight settlements are not lost.
+        """
+        index: Dict[str, Dict[str, Any]] = {}
+        if self.index_file.exists():
+            try:
+                index = json.loads(self.index_file.read_text())
+            except Exception as exc:
+                logger.warning("Could not read index file %s (%s) - rebuilding from scratch", self.index_file, exc)
+
+        for entry in battle_events:
+            parsed = entry.get("parsedJson") or {}
+            if "request_id" not in parsed:
+                continue
+            index[str(parsed["request_id"])] = {
+                "winner_id": parsed.get("winner_id"),
+                "loser_id": parsed.get("loser_id"),
+                "xp_gain": int(parsed.get("xp_gained", 0)),
+                "digest": (entry.get("id") or {}).get("txDigest"),
+                "timestamp_ms": int(entry.get("timestampMs") or 0),
+            }
+
+        tmp = self.index_file.with_name(self.index_file.name + ".tmp")
+        tmp.write_text(json.dumps(index, sort_keys=True))
+        tmp.replace(self.index_file)
+
+        with get_settlement_tracker().results_lock:
+            self._rewrite_results(index)
+        return index
+
+    def _rewrite_results(self, index: Dict[str, Dict[str, Any]]) -> None:
+        # Keep local records for requests the chain does not know about yet,
+        # replace the rest with the confirmed on-chain outcome.
+        latest_local: Dict[str, Dict[str, Any]] = {}
+        if self.results_file.exists():
+            for line in self.results_file.read_text().splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                latest_local[str(record.get("request_id"))] = record
+        lines = [json.dumps(record) for request_id, record in latest_local.items() if request_id not in index]
+        now = int(time.time())
+        for request_id, outcome in index.items():
+            local = latest_local.get(request_id, {})
+            lines.append(json.dumps({
+                "request_id": int(request_id),
+                "winner_id": outcome["winner_id"],
+                "loser_id": outcome["loser_id"],
+                "xp_gain": outcome["xp_gain"],
+                "replay": local.get("replay"),
+                # The enclave proof only exists locally: keep it for batch_verifier.py
+                "payload": local.get("payload"),
+                "signature": local.get("signature"),
+                "enclave_public_key": local.get("enclave_public_key"),
+                "signature_batch": local.get("signature_batch"),
+                "status": "confirmed",
+                "digest": outcome["digest"],
+                "attempts": None,
+                "error": None,
+                "updated_at": now,
+            }))
+        tmp = self.results_file.with_name(self.results_file.name + ".tmp")
+        tmp.write_text("".join(line + "\n" for line in lines))
+        tmp.replace(self.results_file)
+
+    # --- orchestration ---
+
+    def run(self, start_ms: int, end_ms: Optional[int] = None, process: bool = True) -> Dict[str, Any]:
+        end_ms = end_ms or self.latest_time_ms() + 1
+        started = time.time()
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            battles_future = pool.submit(self.fetch_range, self.battle_event_type, start_ms, end_ms)
+            requests_future = pool.submit(self.fetch_range, self.request_event_type, start_ms, end_ms) if process else None
+            battle_events = battles_future.result()
+            request_events = requests_future.result() if requests_future else []
+
+        index = self.rebuild_stores(battle_events)
+        summary = {"battle_events": len(battle_events), "requests": len(request_events),
+                   "processed": 0, "already_settled": 0, "failed": 0}
+
+        handled_up_to = None
+        for entry in request_events:
+            request_data = self.listener._parse_event(entry)
+            if request_data and self.listener.owns(request_data["request_id"]):
+                if str(request_data["request_id"]) in index:
+                    summary["already_settled"] += 1
+                elif self.listener.handle_request(request_data):
+                    summary["processed"] += 1
+                else:
+                    # Stop here: the listener resumes at (and retries) this request
+                    summary["failed"] += 1
+                    break
+            handled_up_to = entry.get("id")
+
+        if handled_up_to is not None:
+            # Hand over: live polling continues right after the last handled request
+            self.listener.cursor = handled_up_to
+            self.listener._save_cursor(self.listener.cursor)
+
+        summary["elapsed_s"] = round(time.time() - started, 2)
+        logger.info("Backfill complete: %s", summary)
+        return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill BattleRequest/BattleEvent history")
+    parser.add_argument("--start-ms", type=int, help="range start (unix ms)")
+    parser.add_argument("--end-ms", type=int, help="range end (unix ms, default: chain head)")
+    parser.add_argument("--start-checkpoint", type=int, help="range start checkpoint")
+    parser.add_argument("--end-checkpoint", type=int, help="range end checkpoint")
+    parser.add_argument("--since-hours", type=float, help="range start relative to now")
+    parser.add_argument("--segments", type=int, help="number of concurrent time segments")
+    parser.add_argument("--rebuild-only", action="store_true", help="only rebuild local stores, do not settle")
+    parser.add_argument("--follow", action="store_true", help="continue with live listening afterwards")
+    args = parser.parse_args()
+
+    backfill = BattleBackfill(segments=args.segments)
+    if args.start_checkpoint is not None:
+        start_ms = backfill.checkpoint_time_ms(args.start_checkpoint)
+    elif args.since_hours is not None:
+        start_ms = int((time.time() - args.since_hours * 3600) * 1000)
+    elif args.start_ms is not None:
+        start_ms = args.start_ms
+    else:
+        parser.error("one of --start-ms, --start-checkpoint or --since-hours is required")
+    end_ms = args.end_ms
+    if args.end_checkpoint is not None:
+        end_ms = backfill.checkpoint_time_ms(args.end_checkpoint) + 1
+
+    backfill.run(start_ms, end_ms, process=not args.rebuild_only)
+    if args.follow:
+        backfill.listener.run()
+    elif backfill.listener.async_settlement:
+        # Background settlements would be lost with the process
+        get_settlement_tracker().wait_all()
+
+
+if __name__ == "__main__":
+    main()
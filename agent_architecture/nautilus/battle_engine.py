@@ -14,12 +14,13 @@ import os
 import requests
 import hashlib
 import json
+import struct
 from typing import List, Dict, Optional, Tuple
 from enum import Enum
 
 # Import Gemini AI (optionnel)
 try:
-    from gemini_trader import GeminiTrader
+    from gemini_trader import get_gemini_trader
     GEMINI_AVAILABLE = True
 except ImportError:
     GEMINI_AVAILABLE = False
@@ -43,6 +44,89 @@ TARGETS = {
     Action.AGILITY: "strength",  # Agility targets Strength (uses enemy's force against them)
 }
 
+# === BATTLE LOG HASH CHAIN ===
+# Each turn is absorbed as it is produced: h_n = SHA256(h_{n-1} || encode(turn_n)),
+# starting from a genesis bound to both monster IDs. h_n is the commitment for
+# turn n; the last one is the battle log hash signed by the enclave.
+LOG_CHAIN_DOMAIN = b"CHIMERA_BATTLE_LOG_V1"
+ACTION_CODES = {Action.FORCE: 0, Action.INTELLIGENCE: 1, Action.AGILITY: 2}
+# turn, action1, action2, damage dealt by 1, damage dealt by 2, hp1, hp2, counter flags
+TURN_FORMAT = struct.Struct("<HBBHHHHB")
+
+
+def log_chain_genesis(monster1_id: str, monster2_id: str) -> bytes:
+    return hashlib.sha256(LOG_CHAIN_DOMAIN + monster1_id.encode() + b"\x00" + monster2_id.encode()).digest()
+
+
+def encode_turn(
+    turn: int,
+    action1: Action,
+    action2: Action,
+    damage_by_1: int,
+    damage_by_2: int,
+    hp1: int,
+    hp2: int,
+    countered1: bool,
+    countered2: bool
+) -> bytes:
+    """Compact 14-byte encoding of one resolved turn."""
+    flags = (1 if countered1 else 0) | (2 if countered2 else 0)
+    return TURN_FORMAT.pack(
+        turn, ACTION_CODES[action1], ACTION_CODES[action2],
+        damage_by_1, damage_by_2, max(hp1, 0), max(hp2, 0), flags
+    )
+
+
+def encode_turn_log(turn_log: Dict, name1: Optional[str] = None, name2: Optional[str] = None) -> bytes:
+    """
+    Rebuild a turn's compact encoding from its battle_log entry (for replays).
+    
+    Reads the slot-keyed fields (m1_*, m2_*), which stay distinct when both
+    monsters share a name; the monster names are only needed for entries
+    logged before those fields existed.
+    """
+    first, second = ("m1", "m2") if "m1_action" in turn_log else (name1, name2)
+    return encode_turn(
+        turn_log["turn"],
+        Action(turn_log[f"{first}_action"]),
+        Action(turn_log[f"{second}_action"]),
+        turn_log[f"{first}_damage_dealt"],
+        turn_log[f"{second}_damage_dealt"],
+        turn_log[f"{first}_hp"],
+        turn_log[f"{second}_hp"],
+        turn_log[f"{first}_countered"],
+        turn_log[f"{second}_countered"],
+    )
+
+
+def chain_turn(previous: bytes, encoded_turn: bytes) -> bytes:
+    return hashlib.sha256(previous + encoded_turn).digest()
+
+
+def verify_log_chain(
+    turn_logs: List[Dict],
+    name1: Optional[str],
+    name2: Optional[str],
+    commitments: List[str],
+    previous: bytes
+) -> bool:
+    """
+    Check a contiguous slice of turns against their commitments.
+    
+    For a partial replay starting at turn k, pass the turns k..m, the
+    commitments k..m and, as ``previous``, commitment k-1 (or the genesis
+    from log_chain_genesis() when k is the first turn).
+    """
+    if len(turn_logs) != len(commitments):
+        return False
+    node = previous
+    for turn_log, commitment in zip(turn_logs, commitments):
+        node = chain_turn(node, encode_turn_log(turn_log, name1, name2))
+        if node.hex() != commitment:
+            return False
+    return True
+
+
 # === MONSTER REPRESENTATION ===
 class Monster:
     def __init__(self, monster_id: str, name: str, strength: int, agility: int, intelligence: int, level: int = 1):
@@ -148,7 +232,7 @@ class BattleGeminiAI:
             api_key = os.getenv("GEMINI_API_KEY")
             if api_key:
                 try:
-                    self.gemini = GeminiTrader(api_key)
+                    self.gemini = get_gemini_trader()
                     print("[BATTLE AI] Gemini activé pour les combats")
                 except Exception as e:
                     print(f"[BATTLE AI] Erreur init Gemini: {str(e)[:50]}")
@@ -168,7 +252,7 @@ class BattleGeminiAI:
             prompt = self._build_battle_prompt(attacker, defender, turn, battle_history)
             
             # Appeler Gemini
-            response = self.gemini.model.generate_content(prompt)
+            response = self.gemini.generate(prompt)
             
             # Parser la réponse
             action = self._parse_battle_response(response.text)
@@ -253,6 +337,8 @@ class BattleEngine:
         self.monster1 = monster1
         self.monster2 = monster2
         self.battle_log: List[Dict] = []
+        self.log_chain = log_chain_genesis(monster1.id, monster2.id)
+        self.turn_commitments: List[str] = []
         
         # Initialiser Gemini AI pour les combats
         self.gemini_ai = None
@@ -330,7 +416,18 @@ class BattleEngine:
         self.monster2.hp -= damage_to_m2
         self.monster1.hp -= damage_to_m1
         
-        # Log the turn
+        # Log the turn: name-keyed fields for display, slot-keyed fields (m1_*, m2_*)
+        # as the record the hash chain commits to (names may collide, slots cannot)
+        slots = {
+            "m1_action": action1.value,
+            "m2_action": action2.value,
+            "m1_damage_dealt": damage_to_m2,
+            "m2_damage_dealt": damage_to_m1,
+            "m1_hp": max(self.monster1.hp, 0),
+            "m2_hp": max(self.monster2.hp, 0),
+            "m1_countered": m1_countered,
+            "m2_countered": m2_countered,
+        }
         turn_log = {
             "turn": turn_num,
             f"{self.monster1.name}_action": action1.value,
@@ -341,8 +438,16 @@ class BattleEngine:
             f"{self.monster2.name}_hp": max(self.monster2.hp, 0),
             f"{self.monster1.name}_countered": m1_countered,
             f"{self.monster2.name}_countered": m2_countered,
+            **slots,
         }
         
+        # Absorb the turn into the running log hash
+        self.log_chain = chain_turn(self.log_chain, encode_turn(
+            turn_num, action1, action2, damage_to_m2, damage_to_m1,
+            self.monster1.hp, self.monster2.hp, m1_countered, m2_countered
+        ))
+        self.turn_commitments.append(self.log_chain.hex())
+        
         return turn_log
     
     def simulate_battle(self) -> Dict:
@@ -361,8 +466,8 @@ class BattleEngine:
             turn_log = self.resolve_turn(turn)
             self.battle_log.append(turn_log)
             
-            print(f"Turn {turn}: {self.monster1.name} {turn_log[f'{self.monster1.name}_hp']}HP | "
-                  f"{self.monster2.name} {turn_log[f'{self.monster2.name}_hp']}HP")
+            print(f"Turn {turn}: {self.monster1.name} {turn_log['m1_hp']}HP | "
+                  f"{self.monster2.name} {turn_log['m2_hp']}HP")
             
             # Check for winner
             if self.monster1.hp <= 0 or self.monster2.hp <= 0:
@@ -389,7 +494,9 @@ class BattleEngine:
             "battle_log": self.battle_log,
             "winner_final_hp": winner.hp,
             "total_turns": len(self.battle_log),
-            "timestamp": int(hashlib.md5(str(self.battle_log).encode()).hexdigest(), 16) % 10000
+            "battle_log_hash": self.log_chain.hex(),
+            "turn_commitments": self.turn_commitments,
+            "timestamp": int.from_bytes(self.log_chain[:8], "big") % 10000
         }
         
         return result
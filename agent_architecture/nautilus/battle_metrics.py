@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""In-process metrics for the battle listener and orchestrator.
+
+Counters, gauges and fixed-bucket histograms kept in plain dicts behind one
+lock, so recording is a dict lookup and an add. Exported either as Prometheus
+text on ``BATTLE_METRICS_PORT`` (``/metrics``) or as a JSON stats file written
+every ``BATTLE_METRICS_INTERVAL`` seconds to ``BATTLE_METRICS_FILE``.
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets (seconds) shared by every stage histogram
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_HELP = {
+    "battle_stage_seconds": "Latency of each battle stage (rpc, fetch, simulate, sign, settle)",
+    "battle_failures_total": "Failures by stage",
+    "battle_battles_total": "Battles simulated and signed",
+    "battle_settlements_total": "Settlements by final status",
+    "battle_listener_events_total": "BattleRequest events fetched by the listener",
+    "battle_listener_events_behind_head": "BattleRequest events on chain not processed yet (head request_id minus cursor)",
+    "battle_listener_oldest_pending_age_seconds": "Wall-clock age of the oldest BattleRequest not processed yet",
+    "battle_listener_behind_head": "1 while the last poll reported more pages after the cursor",
+    "battle_listener_lag_seconds": "Time between the event being processed and the newest BattleRequest on chain",
+    "battle_listener_cursor_timestamp_ms": "Timestamp of the event at the listener cursor",
+    "battle_listener_cursor_info": "Listener cursor position",
+    "battle_battles_per_second": "Battle throughput over the last export interval",
+    "trading_phase_seconds": "Latency of each trading cycle phase (trading_trace.py)",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join('%s="%s"' % (k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Bucket upper bound containing the q-quantile (coarse, but free to compute)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for index, bucket_count in enumerate(self.counts):
+            running += bucket_count
+            if running >= target:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class MetricsRegistry:
+    """Thread-safe metric store with Prometheus and JSON exporters."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._types: Dict[str, str] = {}
+        self._values: Dict[str, Dict[LabelKey, Any]] = {}
+        self._gauge_functions: Dict[str, Callable[[], float]] = {}
+        # One throughput window per exporter, so the HTTP and file exporters do not reset each other
+        self._rate_marks: Dict[str, Tuple[float, float, float]] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._writer: Optional[threading.Thread] = None
+
+    # --- recording ---
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._types.setdefault(name, "counter")
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._types.setdefault(name, "gauge")
+            self._values.setdefault(name, {})[key] = value
+
+    def set_info(self, name: str, **labels: Any) -> None:
+        """Gauge whose only series is the given label set (replaces the previous one)."""
+        with self._lock:
+            self._types.setdefault(name, "gauge")
+            self._values[name] = {_label_key(labels): 1}
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._types.setdefault(name, "histogram")
+            series = self._values.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(DEFAULT_BUCKETS)
+            histogram.observe(value)
+
+    def set_function(self, name: str, function: Callable[[], float]) -> None:
+        """Gauge evaluated at export time (stays current even if the recorder stalls)."""
+        with self._lock:
+            self._types.setdefault(name, "gauge")
+            self._gauge_functions[name] = function
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        """Observe ``battle_stage_seconds{stage=...}``; count a failure if the block raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("battle_failures_total", stage=stage)
+            raise
+        finally:
+            self.observe("battle_stage_seconds", time.perf_counter() - started, stage=stage)
+
+    # --- export ---
+
+    def _battles_per_second(self, exporter: str) -> float:
+        now = time.time()
+        with self._lock:
+            battles = sum(self._values.get("battle_battles_total", {}).values())
+            mark_time, mark_count, rate = self._rate_marks.get(exporter, (now, battles, 0.0))
+            elapsed = now - mark_time
+            if elapsed >= 1.0:
+                rate = (battles - mark_count) / elapsed
+                mark_time, mark_count = now, battles
+            self._rate_marks[exporter] = (mark_time, mark_count, rate)
+        return rate
+
+    def _refresh_functions(self) -> None:
+        with self._lock:
+            functions = list(self._gauge_functions.items())
+        for name, function in functions:
+            try:
+                self.set(name, function())
+            except Exception as exc:
+                logger.debug("Gauge %s failed (%s)", name, exc)
+
+    def render_prometheus(self) -> str:
+        self._refresh_functions()
+        self.set("battle_battles_per_second", self._battles_per_second("http"))
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self._values):
+                kind = self._types[name]
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in self._values[name].items():
+                    if kind != "histogram":
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(value.buckets, value.counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', repr(bound)))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {value.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {value.total}")
+                    lines.append(f"{name}_count{_format_labels(key)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-friendly view; histograms are summarised as count/avg/p50/p95/p99."""
+        self._refresh_functions()
+        battles_per_second = self._battles_per_second("file")
+        out: Dict[str, Any] = {"timestamp": int(time.time()), "battle_battles_per_second": battles_per_second}
+        with self._lock:
+            for name, series in self._values.items():
+                if name in out:
+                    continue
+                entries = {}
+                for key, value in series.items():
+                    label = ",".join(f"{k}={v}" for k, v in key) or "_"
+                    if isinstance(value, _Histogram):
+                        entries[label] = {
+                            "count": value.count,
+                            "avg": value.total / value.count if value.count else 0.0,
+                            "p50": value.quantile(0.50),
+                            "p95": value.quantile(0.95),
+                            "p99": value.quantile(0.99),
+                        }
+                    else:
+                        entries[label] = value
+                out[name] = entries
+        return out
+
+    def write_stats_file(self, path: Path) -> None:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(self.snapshot(), indent=2, default=str))
+        tmp.replace(path)
+
+    def start_exporters(
+        self,
+        port: Optional[int] = None,
+        stats_path: Optional[str] = None,
+        interval: Optional[float] = None
+    ) -> None:
+        """Start the HTTP endpoint and/or stats file writer configured via env vars (idempotent)."""
+        port_setting = port or os.getenv("BATTLE_METRICS_PORT")
+        if port_setting and self._server is None:
+            registry = self
+
+            class _Handler(BaseHTTPRequestHandler):
+                def do_GET(self) -> None:
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = registry.render_prometheus().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args: Any) -> None:
+                    pass
+
+            self._server = ThreadingHTTPServer(("0.0.0.0", int(port_setting)), _Handler)
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info("Metrics endpoint on :%s/metrics", port_setting)
+
+        path_setting = stats_path or os.getenv("BATTLE_METRICS_FILE")
+        if path_setting and self._writer is None:
+            path = Path(path_setting)
+            every = interval or float(os.getenv("BATTLE_METRICS_INTERVAL", "15"))
+
+            def _write_loop() -> None:
+                while True:
+                    time.sleep(every)
+                    try:
+                        self.write_stats_file(path)
+                    except Exception as exc:
+                        logger.warning("Could not write metrics file %s (%s)", path, exc)
+
+            self._writer = threading.Thread(target=_write_loop, name="metrics-file", daemon=True)
+            self._writer.start()
+
+
+# Global metrics registry (singleton)
+_metrics_instance = None
+
+def get_metrics() -> MetricsRegistry:
+    """Get or create the global metrics registry"""
+    global _metrics_instance
+    if _metrics_instance is None:
+        _metrics_instance = MetricsRegistry()
+    return _metrics_instance
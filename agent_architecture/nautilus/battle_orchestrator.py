@@ -8,14 +8,23 @@ Coordinates between battle simulation (off-chain) and blockchain settlement (on-
 import json
 import logging
 import os
+import queue
 import subprocess
-from typing import Any, Dict, Optional
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 
 import requests
 
 from battle_engine import Monster, BattleEngine
+from battle_metrics import get_metrics
 from nautilus_enclave import get_enclave
 from monster_manager import MonsterManager
+from replay_archive import get_replay_archive
+from rpc_pool import get_rpc_session
+from settlement_tracker import SettlementHandle, SettlementTracker, get_settlement_tracker
+from walrus_queue import store_json
 
 # === CONFIGURATION ===
 NIMBUS_BRIDGE_URL = os.getenv("NIMBUS_BRIDGE_URL", "http://nimbus-bridge:3001")
@@ -25,12 +34,13 @@ BATTLE_PACKAGE_ID = os.getenv("BATTLE_PACKAGE_ID")
 BATTLE_CONFIG_ID = os.getenv("BATTLE_CONFIG_ID")
 SUI_GAS_BUDGET = os.getenv("SUI_GAS_BUDGET", "20000000")
 SUI_BIN = os.getenv("SUI_BIN", "sui")
+WALRUS_PUBLISHER_URL = os.getenv("WALRUS_PUBLISHER_URL", "https://publisher.walrus-testnet.walrus.space/v1/store")
 
 
 def _rpc_call(method: str, params: list[Any]) -> Dict[str, Any]:
     """Execute a JSON-RPC call against the configured Sui fullnode."""
     payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
-    response = requests.post(SUI_RPC_URL, json=payload, timeout=20)
+    response = get_rpc_session().post(SUI_RPC_URL, json=payload, timeout=20)
     response.raise_for_status()
     body = response.json()
     if "error" in body:
@@ -90,22 +100,48 @@ def fetch_monster_from_chain(monster_object_id: str) -> Monster:
         return Monster(monster_object_id, "Unknown", 30, 30, 30, 1)
 
 
+def publish_enclave_attestation() -> Optional[str]:
+    """
+    Publish the enclave's full attestation to Walrus once per key epoch
+    (blocking, at startup) so signed results can reference its blob id.
+    Under the signing daemon, the daemon publishes and reports the blob id.
+    """
+    enclave = get_enclave()
+    if hasattr(enclave, "publish_attestation"):
+        enclave.publish_attestation(lambda attestation: store_json(WALRUS_PUBLISHER_URL, attestation))
+    blob_id = getattr(enclave, "attestation_blob_id", None)
+    if blob_id:
+        logging.info("🔐 Enclave attestation on Walrus: %s", blob_id)
+    else:
+        logging.warning("⚠️  Enclave attestation not published - results carry its digest only")
+    return blob_id
+
+
 # === BATTLE SETTLEMENT ON BLOCKCHAIN ===
 def settle_battle_on_chain(
     winner_id: str,
     loser_id: str,
     xp_gain: int,
     battle_log: list,
-    request_id: Optional[int] = None
+    request_id: Optional[int] = None,
+    replay: Optional[Dict[str, Any]] = None
 ):
     """
     Call the Nimbus Bridge to execute settle_battle on-chain.
     This requires the EXECUTE_MOVE_CALL action we created earlier.
+    
+    Returns None when the bridge call fails, so the caller can retry. The
+    TEE-only result (no transaction) is only produced when NIMBUS_BRIDGE_URL
+    is explicitly empty.
+    
+    ``replay`` is the battle log's reference inside a packed Walrus replay
+    archive (see replay_archive.py); it is archived here when not given.
+    settle_battle takes no replay argument, so the reference travels with
+    the settlement result and the local results file, keyed by request_id.
     """
     
-    # Upload battle log to Walrus first
-    # TODO: Implement Walrus upload
-    replay_blob_id = "WALRUS_SIMULATION_BLOB"
+    if replay is None:
+        replay = get_replay_archive().append(battle_log, key=request_id)
     
     # Prepare the moveCall parameters for settle_battle
     move_call_params = {
@@ -135,9 +171,12 @@ def settle_battle_on_chain(
             response.raise_for_status()
             result = response.json()
             print(f"✅ Battle settled on-chain via Nimbus: {result}")
+            if isinstance(result, dict):
+                result.setdefault("replay", replay)
             return result
         except Exception as exc:
             print(f"❌ Nimbus settlement failed: {exc}")
+            return None
 
     if not (BATTLE_PACKAGE_ID and BATTLE_CONFIG_ID):
         print("⚠️  Missing BATTLE_PACKAGE_ID or BATTLE_CONFIG_ID - cannot settle battle")
@@ -149,25 +188,25 @@ def settle_battle_on_chain(
     print(f"   Loser: {loser_id}")
     print(f"   XP Gain: {xp_gain}")
     print(f"   Request ID: {request_id}")
-    print(f"   Battle Log: {len(battle_log)} turns")
+    print(f"   Battle Log: {len(battle_log)} turns (replay {replay['archive'][:24]}...@{replay['offset']})")
     print("✅ TEE signature generated - settlement would happen here")
     
     # Return success for testing purposes
-    return {"status": "success_tee_only", "winner": winner_id, "xp": xp_gain, "request_id": request_id}
+    return {"status": "success_tee_only", "winner": winner_id, "xp": xp_gain, "request_id": request_id, "replay": replay}
 
 
 # === MAIN ORCHESTRATION ===
-def run_battle_and_settle(
+def simulate_and_sign_battle(
     monster1_id: str,
     monster2_id: str,
     request_id: Optional[int] = None,
     requester: Optional[str] = None
-):
+) -> Dict[str, Any]:
     """
-    Complete battle flow:
+    Off-chain half of the battle flow:
     1. Read monster stats from blockchain
     2. Simulate battle off-chain
-    3. Settle result on-chain
+    2.5 Sign result with the Nautilus enclave
     """
     
     print("\n" + "="*60)
@@ -176,48 +215,98 @@ def run_battle_and_settle(
     if request_id is not None:
         print(f"[REQ] Battle request #{request_id} from {requester or 'unknown'}")
     
+    metrics = get_metrics()
+    
     # Step 1: Load monsters from blockchain
     print("[1/3] Loading monsters from blockchain...")
-    monster1 = fetch_monster_from_chain(monster1_id)
-    monster2 = fetch_monster_from_chain(monster2_id)
+    with metrics.timed("fetch"):
+        monster1 = fetch_monster_from_chain(monster1_id)
+        monster2 = fetch_monster_from_chain(monster2_id)
     print(f"  ✓ {monster1.name} (STR:{monster1.strength} AGI:{monster1.agility} INT:{monster1.intelligence})")
     print(f"  ✓ {monster2.name} (STR:{monster2.strength} AGI:{monster2.agility} INT:{monster2.intelligence})")
     
     # Step 2: Simulate battle
     print("\n[2/3] Simulating battle off-chain (TEE)...")
-    engine = BattleEngine(monster1, monster2)
-    result = engine.simulate_battle()
+    with metrics.timed("simulate"):
+        engine = BattleEngine(monster1, monster2)
+        result = engine.simulate_battle()
     
     # Step 2.5: Sign result with Nautilus enclave
     print("\n[2.5/3] Signing result with Nautilus enclave...")
     enclave = get_enclave()
-    signed_result = enclave.sign_battle_result(
-        result["winner_id"],
-        result["loser_id"],
-        result["xp_gain"],
-        result["battle_log"]
-    )
+    with metrics.timed("sign"):
+        signed_result = enclave.sign_battle_result(
+            result["winner_id"],
+            result["loser_id"],
+            result["xp_gain"],
+            result["battle_log"],
+            battle_log_hash=result.get("battle_log_hash")
+        )
+    metrics.inc("battle_battles_total")
     print(f"  ✓ Signature: {signed_result['signature'][:32]}...")
     print(f"  ✓ Public Key: {signed_result['public_key'][:32]}...")
     print(f"  ✓ PCR0: {signed_result['pcr0'][:32]}...")
     
-    # Merge signed data with battle result
+    _merge_signature(result, signed_result, request_id, requester)
+    return result
+
+
+def _merge_signature(
+    result: Dict[str, Any],
+    signed_result: Dict[str, Any],
+    request_id: Optional[int],
+    requester: Optional[str]
+) -> None:
+    """Merge signed data with battle result"""
     result['signature'] = signed_result['signature']
     result['enclave_public_key'] = signed_result['public_key']
-    result['enclave_attestation'] = signed_result['attestation']
+    result['enclave_attestation_digest'] = signed_result['attestation_digest']
+    result['enclave_attestation_blob_id'] = getattr(get_enclave(), "attestation_blob_id", None)
     result['payload'] = signed_result['payload']
+    if signed_result.get('batch'):
+        # Signed by the daemon as part of a Merkle batch: keep the inclusion proof
+        result['signature_batch'] = signed_result['batch']
     result['request_id'] = request_id
     result['requester'] = requester
-    
-    # Step 3: Settle on blockchain
-    print("\n[3/3] Settling battle on blockchain...")
-    settlement = settle_battle_on_chain(
+
+
+def _settle_result(result: Dict[str, Any]):
+    # Archive once, so settlement retries reuse the same replay reference
+    if "replay" not in result:
+        result["replay"] = get_replay_archive().append(
+            result["battle_log"],
+            key=result.get("request_id"),
+            battle_log_hash=result.get("battle_log_hash")
+        )
+    return settle_battle_on_chain(
         result["winner_id"],
         result["loser_id"],
         result["xp_gain"],
         result["battle_log"],
-        request_id=request_id
+        request_id=result.get("request_id"),
+        replay=result["replay"]
     )
+
+
+def run_battle_and_settle(
+    monster1_id: str,
+    monster2_id: str,
+    request_id: Optional[int] = None,
+    requester: Optional[str] = None
+):
+    """
+    Complete battle flow:
+    1. Read monster stats from blockchain
+    2. Simulate battle off-chain
+    3. Settle result on-chain (blocks until the bridge answers)
+    """
+    result = simulate_and_sign_battle(monster1_id, monster2_id, request_id, requester)
+    
+    # Step 3: Settle on blockchain
+    print("\n[3/3] Settling battle on blockchain...")
+    metrics = get_metrics()
+    with metrics.timed("settle"):
+        settlement = _settle_result(result)
     
     if settlement:
         print("\n🎉 BATTLE COMPLETE!")
@@ -225,11 +314,218 @@ def run_battle_and_settle(
         print(f"   XP Gained: {result['xp_gain']}")
         print(f"   Total Turns: {result['total_turns']}")
     else:
+        metrics.inc("battle_failures_total", stage="settle")
         print("\n⚠️  Battle simulated but settlement failed (check Nimbus Bridge)")
     
     return result
 
 
+def submit_battle_and_settle(
+    monster1_id: str,
+    monster2_id: str,
+    request_id: Optional[int] = None,
+    requester: Optional[str] = None,
+    tracker: Optional[SettlementTracker] = None
+) -> SettlementHandle:
+    """
+    Same flow as run_battle_and_settle, but step 3 is handed to the settlement
+    tracker. Returns as soon as the result is signed; the handle resolves once
+    the transaction is confirmed (or escalated) on-chain.
+    """
+    result = simulate_and_sign_battle(monster1_id, monster2_id, request_id, requester)
+    
+    print("\n[3/3] Submitting settlement in background...")
+    tracker = tracker or get_settlement_tracker()
+    return tracker.submit(result, lambda: _settle_result(result))
+
+
+# === STAGED STREAMING PIPELINE ===
+# Stage functions are module-level so they can run in worker processes.
+def _fetch_stage(item: Dict[str, Any]) -> Dict[str, Any]:
+    item["monster1"] = fetch_monster_from_chain(item["monster1_id"])
+    item["monster2"] = fetch_monster_from_chain(item["monster2_id"])
+    return item
+
+
+def _simulate_stage(item: Dict[str, Any]) -> Dict[str, Any]:
+    engine = BattleEngine(item.pop("monster1"), item.pop("monster2"))
+    item["result"] = engine.simulate_battle()
+    return item
+
+
+def _sign_stage(item: Dict[str, Any]) -> Dict[str, Any]:
+    result = item["result"]
+    signed_result = get_enclave().sign_battle_result(
+        result["winner_id"],
+        result["loser_id"],
+        result["xp_gain"],
+        result["battle_log"],
+        battle_log_hash=result.get("battle_log_hash")
+    )
+    _merge_signature(result, signed_result, item.get("request_id"), item.get("requester"))
+    return item
+
+
+def _settle_stage(item: Dict[str, Any]) -> Dict[str, Any]:
+    item["settlement"] = _settle_result(item["result"])
+    return item
+
+
+_STOP = object()
+
+
+class BattlePipeline:
+    """
+    Streaming fetch -> simulate -> sign -> settle pipeline.
+
+    Each stage is its own worker group reading from a bounded queue, so a slow
+    stage applies backpressure upstream instead of buffering without limit, and
+    each stage can be sized independently. I/O-bound stages (fetch, settle) run
+    on threads; CPU-bound stages (simulate, sign) run on a process pool driven
+    by one feeder thread per worker.
+
+    Every battle comes out of ``results()`` as a dict with ``result``,
+    ``settlement``, ``error`` (first failing stage, if any) and ``timings``
+    (seconds spent in each stage, plus ``total``).
+
+    Note: sign workers are separate processes. Set ENCLAVE_SOCKET (see
+    signing_daemon.py) so they all sign through the shared daemon key;
+    otherwise each holds its own enclave key, so keep ``sign_workers=1``.
+    """
+
+    STAGES = ("fetch", "simulate", "sign", "settle")
+
+    def __init__(
+        self,
+        fetch_workers: Optional[int] = None,
+        simulate_workers: Optional[int] = None,
+        sign_workers: Optional[int] = None,
+        settle_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        settle: bool = True
+    ) -> None:
+        self.workers = {
+            "fetch": fetch_workers or int(os.getenv("PIPELINE_FETCH_WORKERS", "4")),
+            "simulate": simulate_workers or int(os.getenv("PIPELINE_SIMULATE_WORKERS", str(os.cpu_count() or 2))),
+            "sign": sign_workers or int(os.getenv("PIPELINE_SIGN_WORKERS", "1")),
+            "settle": settle_workers or int(os.getenv("PIPELINE_SETTLE_WORKERS", "4")),
+        }
+        size = queue_size or int(os.getenv("PIPELINE_QUEUE_SIZE", "32"))
+        stages = list(self.STAGES) if settle else list(self.STAGES[:-1])
+        self.stages = stages
+
+        functions: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+            "fetch": _fetch_stage,
+            "simulate": _simulate_stage,
+            "sign": _sign_stage,
+            "settle": _settle_stage,
+        }
+        self._pools = {
+            name: ProcessPoolExecutor(max_workers=self.workers[name])
+            for name in ("simulate", "sign")
+        }
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=size) for _ in stages]
+        self._output: queue.Queue = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._remaining = {name: self.workers[name] for name in stages}
+        self._lock = threading.Lock()
+
+        for position, name in enumerate(stages):
+            inbox = self._queues[position]
+            outbox = self._queues[position + 1] if position + 1 < len(stages) else self._output
+            for worker in range(self.workers[name]):
+                thread = threading.Thread(
+                    target=self._stage_loop,
+                    args=(name, functions[name], inbox, outbox),
+                    name=f"pipeline-{name}-{worker}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _stage_loop(self, name: str, function, inbox: queue.Queue, outbox: queue.Queue) -> None:
+        pool = self._pools.get(name)
+        metrics = get_metrics()
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                with self._lock:
+                    self._remaining[name] -= 1
+                    last = self._remaining[name] == 0
+                if last:
+                    outbox.put(_STOP)
+                else:
+                    inbox.put(_STOP)
+                return
+            if item.get("error") is None:
+                started = time.perf_counter()
+                try:
+                    if pool is not None:
+                        # Timings stay on this side, so a failing worker leaves the item intact
+                        payload = {key: value for key, value in item.items() if key != "timings"}
+                        item = dict(pool.submit(function, payload).result(), timings=item["timings"])
+                    else:
+                        item = function(item)
+                except Exception as exc:
+                    logging.exception("Pipeline stage %s failed for request %s", name, item.get("request_id"))
+                    item["error"] = f"{name}: {exc}"
+                    metrics.inc("battle_failures_total", stage=name)
+                elapsed = time.perf_counter() - started
+                item["timings"][name] = elapsed
+                metrics.observe("battle_stage_seconds", elapsed, stage=name)
+                if name == "sign" and item.get("error") is None:
+                    metrics.inc("battle_battles_total")
+            if outbox is self._output:
+                item["timings"]["total"] = time.perf_counter() - item.pop("_started")
+            outbox.put(item)
+
+    def submit(
+        self,
+        monster1_id: str,
+        monster2_id: str,
+        request_id: Optional[int] = None,
+        requester: Optional[str] = None
+    ) -> None:
+        """Enqueue one battle. Blocks while the fetch queue is full."""
+        self._queues[0].put({
+            "monster1_id": monster1_id,
+            "monster2_id": monster2_id,
+            "request_id": request_id,
+            "requester": requester,
+            "result": None,
+            "settlement": None,
+            "error": None,
+            "timings": {},
+            "_started": time.perf_counter(),
+        })
+
+    def close(self) -> None:
+        """Stop accepting battles; results() ends once in-flight ones drain."""
+        self._queues[0].put(_STOP)
+
+    def results(self) -> Iterator[Dict[str, Any]]:
+        """Yield finished battles in completion order until the pipeline is closed and drained."""
+        while True:
+            item = self._output.get()
+            if item is _STOP:
+                break
+            yield item
+        for thread in self._threads:
+            thread.join()
+        for pool in self._pools.values():
+            pool.shutdown()
+
+    def run(self, battles: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Feed ``battles`` (dicts of submit() kwargs) and stream results back."""
+        def feed() -> None:
+            for battle in battles:
+                self.submit(**battle)
+            self.close()
+
+        threading.Thread(target=feed, name="pipeline-feed", daemon=True).start()
+        return self.results()
+
+
 # === CLI ENTRY POINT ===
 if __name__ == "__main__":
     import sys
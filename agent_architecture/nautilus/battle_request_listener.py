@@ -10,9 +10,15 @@ import time
 from pathlib import Path
 from typing import Any, Dict, Optional
 
-import requests
-
-from battle_orchestrator import BATTLE_PACKAGE_ID, run_battle_and_settle
+from battle_metrics import get_metrics
+from battle_orchestrator import (
+    BATTLE_PACKAGE_ID,
+    publish_enclave_attestation,
+    run_battle_and_settle,
+    submit_battle_and_settle,
+)
+from rpc_pool import get_rpc_session
+from shard_coordinator import ShardCoordinator, shard_for_request
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=os.getenv("BATTLE_LISTENER_LOG", "INFO"))
@@ -24,7 +30,13 @@ def _normalize_rpc_url(url: Optional[str]) -> str:
 
 
 class BattleRequestListener:
-    """Polls the Sui RPC for `BattleRequest` events and executes them sequentially."""
+    """Polls the Sui RPC for `BattleRequest` events and executes them sequentially.
+
+    With ``shard_count > 1`` every instance reads the full event stream but only
+    executes the requests whose ``request_id`` hashes to its shard, and keeps its
+    own checkpoint file. Shard slots are claimed through :class:`ShardCoordinator`
+    lock files; an instance that finds no free slot waits as a standby.
+    """
 
     def __init__(
         self,
@@ -32,7 +44,11 @@ class BattleRequestListener:
         event_type: Optional[str] = None,
         poll_interval: Optional[int] = None,
         batch_size: Optional[int] = None,
-        cursor_path: Optional[str] = None
+        cursor_path: Optional[str] = None,
+        async_settlement: Optional[bool] = None,
+        shard_count: Optional[int] = None,
+        shard_index: Optional[int] = None,
+        lock_dir: Optional[str] = None
     ) -> None:
         self.rpc_url = _normalize_rpc_url(rpc_url or os.getenv("SUI_RPC_URL"))
         self.event_type = event_type or os.getenv("BATTLE_REQUEST_EVENT_TYPE")
@@ -43,8 +59,27 @@ class BattleRequestListener:
         self.poll_interval = poll_interval or int(os.getenv("BATTLE_REQUEST_POLL_INTERVAL", "12"))
         self.batch_size = batch_size or int(os.getenv("BATTLE_REQUEST_BATCH_SIZE", "5"))
         cursor_default = os.getenv("BATTLE_LISTENER_CURSOR_FILE", ".battle_listener.cursor")
-        self.cursor_file = Path(cursor_path or cursor_default)
-        self.cursor: Optional[Dict[str, Any]] = self._load_cursor()
+        self.base_cursor_file = Path(cursor_path or cursor_default)
+        self.cursor_file = self.base_cursor_file
+        self.cursor: Optional[Dict[str, Any]] = None
+        self.metrics = get_metrics()
+        self._has_more = False
+        self._oldest_pending_ms: Optional[int] = None
+        self.metrics.set_function("battle_listener_oldest_pending_age_seconds", self.oldest_pending_age)
+
+        self.shard_count = shard_count or int(os.getenv("BATTLE_LISTENER_SHARD_COUNT", "1"))
+        index_setting = shard_index if shard_index is not None else os.getenv("BATTLE_LISTENER_SHARD_INDEX", "auto")
+        self.preferred_shard = None if str(index_setting).lower() == "auto" else int(index_setting)
+        self.coordinator = ShardCoordinator(self.shard_count, lock_dir) if self.shard_count > 1 else None
+        self.shard_index: Optional[int] = None
+        if self.coordinator is None:
+            self.shard_index = 0
+            self.cursor = self._load_cursor()
+        else:
+            self._claim_shard()
+        if async_settlement is None:
+            async_settlement = os.getenv("BATTLE_SETTLE_ASYNC", "true").lower() == "true"
+        self.async_settlement = async_settlement
 
     def _load_cursor(self) -> Optional[Dict[str, Any]]:
         if not self.cursor_file.exists():
@@ -55,6 +90,26 @@ class BattleRequestListener:
             logger.warning("Could not read cursor file %s (%s)", self.cursor_file, exc)
             return None
 
+    def _claim_shard(self) -> bool:
+        """Try to take a shard slot and switch to that shard's checkpoint."""
+        index = self.coordinator.acquire(self.preferred_shard)
+        if index is None:
+            return False
+        self.shard_index = index
+        self.cursor_file = self.base_cursor_file.with_name(
+            f"{self.base_cursor_file.name}.shard{index}-of-{self.shard_count}"
+        )
+        self.cursor = self._load_cursor()
+        if self.cursor is None and self.base_cursor_file.exists():
+            # First sharded run: start where the single listener stopped
+            self.cursor_file, shard_file = self.base_cursor_file, self.cursor_file
+            self.cursor = self._load_cursor()
+            self.cursor_file = shard_file
+        return True
+
+    def owns(self, request_id: int) -> bool:
+        return shard_for_request(request_id, self.shard_count) == self.shard_index
+
     def _save_cursor(self, cursor: Optional[Dict[str, Any]]) -> None:
         if cursor is None:
             return
@@ -65,9 +120,10 @@ class BattleRequestListener:
 
     def _rpc_call(self, method: str, params: list[Any]) -> Dict[str, Any]:
         payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
-        response = requests.post(self.rpc_url, json=payload, timeout=20)
-        response.raise_for_status()
-        data = response.json()
+        with self.metrics.timed("rpc"):
+            response = get_rpc_session().post(self.rpc_url, json=payload, timeout=20)
+            response.raise_for_status()
+            data = response.json()
         if "error" in data:
             raise RuntimeError(data["error"])
         return data.get("result", {})
@@ -97,43 +153,119 @@ class BattleRequestListener:
         result = self._rpc_call("suix_queryEvents", params)
         events = result.get("data", [])
         next_cursor = result.get("nextCursor")
+        self._has_more = bool(result.get("hasNextPage"))
         return events, next_cursor
 
+    @staticmethod
+    def _event_position(entry: Dict[str, Any]) -> tuple[Optional[int], int]:
+        """(request_id, timestampMs) of an event entry; request ids are sequential on chain."""
+        try:
+            request_id: Optional[int] = int(entry["parsedJson"]["request_id"])
+        except (KeyError, TypeError, ValueError):
+            request_id = None
+        return request_id, int(entry.get("timestampMs") or 0)
+
+    def _head_event(self) -> tuple[Optional[int], int]:
+        """(request_id, timestampMs) of the newest BattleRequest on chain (the head of the stream)."""
+        result = self._rpc_call("suix_queryEvents", [{"MoveEventType": self.event_type}, None, 1, True])
+        data = result.get("data", [])
+        return self._event_position(data[0]) if data else (None, 0)
+
+    def oldest_pending_age(self) -> float:
+        """Wall-clock seconds since the oldest unprocessed request was emitted (0 when caught up)."""
+        pending = self._oldest_pending_ms
+        return max(time.time() - pending / 1000, 0.0) if pending else 0.0
+
+    def _set_backlog(self, head_id: Optional[int], request_id: Optional[int], pending: int) -> None:
+        if head_id is not None and request_id is not None:
+            self.metrics.set("battle_listener_events_behind_head", max(head_id - request_id, 0) + pending)
+
+    def handle_request(self, request_data: Dict[str, Any]) -> bool:
+        """Run and settle one parsed request. Returns False if processing failed."""
+        logger.info(
+            "⚔️  Processing battle request %s | %s vs %s",
+            request_data["request_id"],
+            request_data["monster1_id"],
+            request_data["monster2_id"]
+        )
+        settle = submit_battle_and_settle if self.async_settlement else run_battle_and_settle
+        try:
+            settle(
+                request_data["monster1_id"],
+                request_data["monster2_id"],
+                request_id=request_data["request_id"],
+                requester=request_data.get("requester")
+            )
+        except Exception as exc:
+            logger.exception("Battle processing failed for request %s (%s)", request_data["request_id"], exc)
+            self.metrics.inc("battle_failures_total", stage="request")
+            return False
+        return True
+
     def run_once(self) -> None:
+        if self.shard_index is None and not self._claim_shard():
+            logger.debug("No free shard among %s - standing by", self.shard_count)
+            return
         events, next_cursor = self._pull_requests()
+        metrics = self.metrics
+        metrics.set("battle_listener_behind_head", 1 if self._has_more else 0)
         if not events:
+            self._oldest_pending_ms = None
+            metrics.set("battle_listener_events_behind_head", 0)
+            metrics.set("battle_listener_lag_seconds", 0)
             return
+        metrics.inc("battle_listener_events_total", len(events))
+        # Caught up: this page ends at the head; behind: one extra query for the newest event
+        head_id, head_ms = self._head_event() if self._has_more else self._event_position(events[-1])
         for entry in events:
+            request_id, event_ms = self._event_position(entry)
+            self._oldest_pending_ms = event_ms or self._oldest_pending_ms
+            self._set_backlog(head_id, request_id, 1)
+            metrics.set("battle_listener_lag_seconds", max(head_ms - event_ms, 0) / 1000 if head_ms and event_ms else 0)
             request_data = self._parse_event(entry)
-            if not request_data:
+            if not request_data or not self.owns(request_data["request_id"]):
                 continue
-            logger.info(
-                "⚔️  Processing battle request %s | %s vs %s",
-                request_data["request_id"],
-                request_data["monster1_id"],
-                request_data["monster2_id"]
-            )
-            try:
-                run_battle_and_settle(
-                    request_data["monster1_id"],
-                    request_data["monster2_id"],
-                    request_id=request_data["request_id"],
-                    requester=request_data.get("requester")
-                )
-            except Exception as exc:
-                logger.exception("Battle processing failed for request %s (%s)", request_data["request_id"], exc)
+            if not self.handle_request(request_data):
                 break
         self.cursor = next_cursor
         self._save_cursor(self.cursor)
+        last_id, last_ms = self._event_position(events[-1])
+        if self._has_more:
+            # The next page starts after this event: its age bounds the oldest pending one
+            self._oldest_pending_ms = last_ms or self._oldest_pending_ms
+            self._set_backlog(head_id, last_id, 0)
+        else:
+            self._oldest_pending_ms = None
+            metrics.set("battle_listener_events_behind_head", 0)
+            metrics.set("battle_listener_lag_seconds", 0)
+        if isinstance(self.cursor, dict):
+            metrics.set_info(
+                "battle_listener_cursor_info",
+                tx_digest=self.cursor.get("txDigest"),
+                event_seq=self.cursor.get("eventSeq"),
+                shard=self.shard_index
+            )
+        if events[-1].get("timestampMs"):
+            metrics.set("battle_listener_cursor_timestamp_ms", int(events[-1]["timestampMs"]))
 
     def run(self) -> None:
         logger.info("Listening for BattleRequest events (%s)", self.event_type)
+        self.metrics.start_exporters()
+        publish_enclave_attestation()
+        if self.shard_count > 1:
+            logger.info("Shard %s of %s (cursor %s)", self.shard_index, self.shard_count, self.cursor_file)
         while True:
-            try:
-                self.run_once()
-            except Exception as exc:
-                logger.exception("Listener iteration failed (%s)", exc)
-            time.sleep(self.poll_interval)
+            time.sleep(self.poll())
+
+    def poll(self) -> float:
+        """One listener iteration; returns the delay before the next one (0 while behind head)."""
+        try:
+            self.run_once()
+        except Exception as exc:
+            logger.exception("Listener iteration failed (%s)", exc)
+            self.metrics.inc("battle_failures_total", stage="listener")
+            return self.poll_interval
+        return 0 if self._has_more else self.poll_interval
 
 
 def main() -> None:
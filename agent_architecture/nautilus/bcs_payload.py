@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+BCS ENCODING FOR ENCLAVE PAYLOADS
+=================================
+Canonical Binary Canonical Serialization of the battle result payload signed
+by the enclave. The byte layout is exactly `bcs::to_bytes` of:
+
+    public struct BattleResultPayload has copy, drop {
+        winner_id: address,
+        loser_id: address,
+        xp_gain: u64,
+        battle_log_hash: vector<u8>,   // 32-byte SHA-256
+        timestamp: u64,
+    }
+
+so a Move verifier can rebuild the message from typed arguments and check the
+Ed25519 signature with `sui::ed25519::ed25519_verify`.
+"""
+
+import hashlib
+
+ADDRESS_LENGTH = 32
+HASH_LENGTH = 32
+U64_MAX = (1 << 64) - 1
+
+# Field order of BattleResultPayload (BCS encodes struct fields in declaration order)
+BATTLE_RESULT_FIELDS = ("winner_id", "loser_id", "xp_gain", "battle_log_hash", "timestamp")
+
+
+def encode_uleb128(value: int) -> bytes:
+    """ULEB128 length prefix used for BCS vectors."""
+    if value < 0:
+        raise ValueError("ULEB128 value must be non-negative")
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def encode_u64(value: int) -> bytes:
+    value = int(value)
+    if not 0 <= value <= U64_MAX:
+        raise ValueError(f"u64 out of range: {value}")
+    return value.to_bytes(8, "little")
+
+
+def encode_address(value: str) -> bytes:
+    """
+    Encode a Sui address / object ID as 32 raw bytes (left-padded like `0x2`).
+
+    Off-chain identifiers that are not hex (simulated monsters such as
+    "nft_12_1", agent memories signed as "agent") are mapped to the
+    BLAKE2b-256 hash of their UTF-8 bytes, so they still occupy one address slot.
+    """
+    text = str(value)
+    hex_part = text[2:] if text.lower().startswith("0x") else text
+    try:
+        raw = bytes.fromhex(hex_part.rjust(ADDRESS_LENGTH * 2, "0"))
+    except ValueError:
+        raw = b""
+    if len(raw) != ADDRESS_LENGTH or not text.lower().startswith("0x"):
+        return hashlib.blake2b(text.encode(), digest_size=ADDRESS_LENGTH).digest()
+    return raw
+
+
+def encode_bytes(value: bytes) -> bytes:
+    """BCS vector<u8>: ULEB128 length followed by the raw bytes."""
+    return encode_uleb128(len(value)) + value
+
+
+def encode_battle_result(payload: dict) -> bytes:
+    """BCS-encode a battle result payload dict (as produced by sign_battle_result)."""
+    log_hash = payload["battle_log_hash"]
+    log_hash_bytes = bytes.fromhex(log_hash) if isinstance(log_hash, str) else bytes(log_hash)
+    if len(log_hash_bytes) != HASH_LENGTH:
+        raise ValueError(f"battle_log_hash must be {HASH_LENGTH} bytes, got {len(log_hash_bytes)}")
+    return b"".join((
+        encode_address(payload["winner_id"]),
+        encode_address(payload["loser_id"]),
+        encode_u64(payload["xp_gain"]),
+        encode_bytes(log_hash_bytes),
+        encode_u64(payload["timestamp"]),
+    ))
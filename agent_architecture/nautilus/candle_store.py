@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+OHLCV CANDLE STORE
+==================
+Multi-timeframe candles on disk, one fixed-record file per timeframe
+(<CANDLE_STORE_DIR>/<SYMBOL>-<tf>.ohlcv):
+
+    header (64 bytes): magic b"CHOHLCV1" | timeframe seconds u32 | pad u32 | count u64 | pad
+    record (48 bytes): timestamp f64 | open f64 | high f64 | low f64 | close f64 | volume f64
+
+Records are sorted by candle open time. Readers memory-map the file and
+scan it without copies (`as_arrays()` gives NumPy column views), and
+`range()` finds a time window by binary search. The writer appends a
+record before bumping `count`, so readers never see a half-written row.
+
+CandleAggregator turns price ticks into candles for every timeframe and
+closes them into the store; exchange candles ingested for the same bucket
+(Binance klines, which carry real volume) overwrite the tick-built rows.
+Spot tickers carry no per-trade volume, so ticks given the rolling 24h quote
+volume are credited its average rate over the time since the previous tick
+(in base units, like klines): VWAP and the volume SMA then work without
+Binance, as a time-weighted approximation.
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from indicators import Candle
+
+TIMEFRAME_SECONDS = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600, "4h": 14400, "1d": 86400}
+
+MAGIC = b"CHOHLCV1"
+HEADER_SIZE = 64
+_HEADER = struct.Struct("<8sIIQ")
+_COUNT_OFFSET = 16
+_RECORD = struct.Struct("<dddddd")
+RECORD_SIZE = _RECORD.size
+MAX_TICK_GAP = 60.0  # seconds of 24h-average volume credited to one tick at most
+
+
+class _TimestampView:
+    """Sequence of record timestamps for bisect (no list materialization)."""
+
+    def __init__(self, store: "CandleStore", count: int) -> None:
+        self._store, self._count = store, count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> float:
+        return struct.unpack_from("<d", self._store._map, HEADER_SIZE + index * RECORD_SIZE)[0]
+
+
+class CandleStore:
+    def __init__(self, path: str, timeframe: Optional[str] = None) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._map: Optional[mmap.mmap] = None
+        self._fd: Optional[int] = None
+        if not self.path.exists() or self.path.stat().st_size < HEADER_SIZE:
+            if timeframe is None:
+                raise FileNotFoundError(f"no candle store at {self.path}")
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("wb") as fh:
+                fh.write(_HEADER.pack(MAGIC, TIMEFRAME_SECONDS[timeframe], 0, 0).ljust(HEADER_SIZE, b"\0"))
+        with self.path.open("rb") as fh:
+            magic, self.timeframe_seconds, _, _ = _HEADER.unpack(fh.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a candle store")
+
+    # --- reading ---
+
+    def _remap(self) -> int:
+        """Map the file (again, if it grew); returns the committed record count."""
+        size = self.path.stat().st_size
+        if self._map is None or len(self._map) < size:
+            with self.path.open("rb") as fh:
+                self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return struct.unpack_from("<Q", self._map, _COUNT_OFFSET)[0]
+
+    def __len__(self) -> int:
+        return self._remap()
+
+    def get(self, index: int) -> Candle:
+        count = self._remap()
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError(index)
+        return Candle(*_RECORD.unpack_from(self._map, HEADER_SIZE + index * RECORD_SIZE))
+
+    def last(self) -> Optional[Candle]:
+        return self.get(-1) if len(self) else None
+
+    def index_of(self, timestamp: float) -> int:
+        """Index of the first candle opening at or after `timestamp`."""
+        return bisect.bisect_left(_TimestampView(self, self._remap()), timestamp)
+
+    def range(self, start: float = 0.0, end: float = float("inf")) -> List[Candle]:
+        """Candles with start <= open time < end."""
+        count = self._remap()
+        first = self.index_of(start)
+        last = bisect.bisect_left(_TimestampView(self, count), end) if end != float("inf") else count
+        return [Candle(*_RECORD.unpack_from(self._map, HEADER_SIZE + i * RECORD_SIZE)) for i in range(first, last)]
+
+    def as_arrays(self) -> Dict[str, Any]:
+        """Zero-copy NumPy column views over the mapped records (needs numpy)."""
+        import numpy as np
+        count = self._remap()
+        table = np.frombuffer(self._map, dtype="<f8", count=count * 6, offset=HEADER_SIZE).reshape(count, 6)
+        return {name: table[:, i] for i, name in enumerate(Candle._fields)}
+
+    # --- writing (single writer process) ---
+
+    def _writer_fd(self) -> int:
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR)
+        return self._fd
+
+    def upsert(self, candle: Candle) -> bool:
+        """
+        Append a newer candle, or overwrite the stored candle with the same open
+        time. Older candles missing from the file are not inserted (returns False).
+        """
+        with self._lock:
+            fd = self._writer_fd()
+            count = struct.unpack("<Q", os.pread(fd, 8, _COUNT_OFFSET))[0]
+            if count:
+                last_ts = struct.unpack("<d", os.pread(fd, 8, HEADER_SIZE + (count - 1) * RECORD_SIZE))[0]
+                if candle.timestamp <= last_ts:
+                    index = self.index_of(candle.timestamp) if candle.timestamp < last_ts else count - 1
+                    if index >= count or self.get(index).timestamp != candle.timestamp:
+                        return False
+                    os.pwrite(fd, _RECORD.pack(*candle), HEADER_SIZE + index * RECORD_SIZE)
+                    return True
+            os.pwrite(fd, _RECORD.pack(*candle), HEADER_SIZE + count * RECORD_SIZE)
+            os.pwrite(fd, struct.pack("<Q", count + 1), _COUNT_OFFSET)
+            return True
+
+    def extend(self, candles: Iterable[Candle]) -> int:
+        return sum(self.upsert(candle) for candle in candles)
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+class CandleAggregator:
+    """Builds OHLCV candles from price ticks for several timeframes."""
+
+    def __init__(
+        self,
+        timeframes: Iterable[str],
+        store_dir: Optional[str] = None,
+        symbol: str = "SUIUSDT",
+        on_close: Optional[Callable[[str, Candle], None]] = None
+    ) -> None:
+        directory = Path(store_dir or os.getenv("CANDLE_STORE_DIR", ".candles"))
+        self.timeframes = list(dict.fromkeys(timeframes))
+        self.stores = {tf: CandleStore(str(directory / f"{symbol}-{tf}.ohlcv"), tf) for tf in self.timeframes}
+        self.forming: Dict[str, Optional[Candle]] = {tf: None for tf in self.timeframes}
+        self.on_close = on_close
+        self._last_tick: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def on_tick(
+        self,
+        price: float,
+        volume: float = 0.0,
+        timestamp: Optional[float] = None,
+        volume_24h: Optional[float] = None
+    ) -> None:
+        """
+        Fold one price observation into the forming candles. Without a traded
+        `volume`, a rolling 24h quote volume (USD) is turned into a proxy: its
+        average rate over the time since the previous tick, in base units.
+        """
+        ts = time.time() if timestamp is None else timestamp
+        closed = []
+        with self._lock:
+            if not volume and volume_24h and price > 0 and self._last_tick is not None:
+                elapsed = min(max(ts - self._last_tick, 0.0), MAX_TICK_GAP)
+                volume = volume_24h / price * elapsed / 86400
+            self._last_tick = ts if self._last_tick is None else max(self._last_tick, ts)
+            for tf in self.timeframes:
+                seconds = TIMEFRAME_SECONDS[tf]
+                bucket = ts // seconds * seconds
+                candle = self.forming[tf]
+                if candle is not None and bucket < candle.timestamp:
+                    continue  # late tick of an already closed bucket: keep the forming candle
+                if candle is not None and bucket > candle.timestamp:
+                    self.stores[tf].upsert(candle)
+                    closed.append((tf, candle))
+                    candle = None
+                if candle is None:
+                    candle = Candle(bucket, price, price, price, price, volume)
+                else:
+                    candle = candle._replace(
+                        high=max(candle.high, price), low=min(candle.low, price),
+                        close=price, volume=candle.volume + volume
+                    )
+                self.forming[tf] = candle
+        if self.on_close:
+            for tf, candle in closed:
+                self.on_close(tf, candle)
+
+    def ingest(self, timeframe: str, candle: Candle) -> None:
+        """Store a closed exchange candle (replaces a tick-built candle of the same bucket)."""
+        with self._lock:
+            self.stores[timeframe].upsert(candle)
+            forming = self.forming.get(timeframe)
+            if forming is not None and forming.timestamp <= candle.timestamp:
+                self.forming[timeframe] = None
+
+    def current(self, timeframe: str) -> Optional[Candle]:
+        with self._lock:
+            return self.forming.get(timeframe)
@@ -6,9 +6,45 @@ Utilise Google Gemini pour analyser le marché et prendre des décisions de trad
 
 import os
 import json
+import math
+import threading
 import time
-from typing import Dict, Any
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
 import google.generativeai as genai
+from google.api_core.exceptions import InvalidArgument
+
+# Réponse JSON contrainte par schéma (plus de parsing de texte libre)
+TRADING_DECISION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "format": "enum", "enum": ["BUY_SUI", "SELL_SUI", "HOLD"]},
+        "setup": {
+            "type": "string",
+            "format": "enum",
+            "enum": ["TREND_PULLBACK_LONG", "TREND_PULLBACK_SHORT", "VWAP_FADE_LONG", "VWAP_FADE_SHORT", "NONE"]
+        },
+        "confidence": {"type": "number"},
+        "reasoning": {"type": "string"}
+    },
+    "required": ["action", "setup", "confidence", "reasoning"]
+}
+
+
+def market_state_key(market_data: Dict[str, Any]) -> Tuple[int, str, int]:
+    """
+    État de marché quantifié: (palier de prix, tendance, bande de momentum).
+    Deux analyses avec la même clé donneraient la même décision.
+    """
+    price_step = float(os.getenv("GEMINI_PRICE_BUCKET_PCT", "0.25")) / 100
+    momentum_step = float(os.getenv("GEMINI_MOMENTUM_BAND_PCT", "0.1"))
+    price = max(market_data.get("sui_price", 0), 1e-9)
+    momentum = market_data.get("recent_change_pct", 0) or 0
+    return (
+        int(math.floor(math.log(price) / math.log1p(price_step))),
+        market_data.get("trend", "neutral"),
+        max(-3, min(3, int(round(momentum / momentum_step))))
+    )
 
 class GeminiTrader:
     """
@@ -29,6 +65,16 @@ class GeminiTrader:
         
         genai.configure(api_key=self.api_key)
         
+        # Appels simultanés plafonnés (trading + combats partagent le même client)
+        self._slots = threading.BoundedSemaphore(int(os.getenv("GEMINI_MAX_CONCURRENCY", "2")))
+        
+        # Décisions en cache par état de marché quantifié (TTL court)
+        self.decision_ttl = float(os.getenv("GEMINI_DECISION_TTL", "120"))
+        self._decisions: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._decisions_lock = threading.Lock()
+        self.structured_output = True
+        self.stats = {"calls": 0, "cache_hits": 0, "parse_failures": 0}
+        
         # Utiliser gemini-2.0-flash-exp (modèle gratuit et performant)
         # ou gemini-3-pro-preview pour Gemini 3 (payant)
         try:
@@ -46,6 +92,13 @@ class GeminiTrader:
                 self.model = genai.GenerativeModel('gemini-pro')
                 print("[GEMINI] ✅ Modèle Gemini Pro initialisé")
     
+    def generate(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None):
+        """generate_content sur le pool partagé (GEMINI_MAX_CONCURRENCY appels en vol)"""
+        with self._slots:
+            if generation_config is None:
+                return self.model.generate_content(prompt)
+            return self.model.generate_content(prompt, generation_config=generation_config)
+    
     def analyze_market(self, market_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Analyse le marché avec Gemini et retourne une décision de trading
@@ -57,20 +110,25 @@ class GeminiTrader:
             Décision structurée avec action, confiance, raisonnement
         """
         
-        # Construire le prompt pour Gemini
-        prompt = self._build_trading_prompt(market_data)
+        # Même état de marché qu'une décision récente: pas d'appel LLM
+        key = market_state_key(market_data)
+        now = time.time()
+        with self._decisions_lock:
+            cached = self._decisions.get(key)
+            if cached is not None and now - cached[0] <= self.decision_ttl:
+                self._decisions.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                core = cached[1]
+            else:
+                core = None
+        if core is not None:
+            decision = self._build_decision(core, market_data)
+            decision["cached"] = True
+            print(f"[GEMINI] ♻️  Décision en cache: {decision['action']} ({decision['confidence']:.0%}, état inchangé)")
+            return decision
         
         try:
-            # Appeler Gemini
-            response = self.model.generate_content(prompt)
-            
-            # Parser la réponse
-            decision = self._parse_gemini_response(response.text, market_data)
-            
-            print(f"[GEMINI] 🤖 Décision: {decision['action']} ({decision['confidence']:.0%})")
-            
-            return decision
-            
+            core = self._request_decision(market_data)
         except Exception as e:
             print(f"[GEMINI] ❌ Erreur: {e}")
             # Fallback: décision conservative
@@ -81,9 +139,66 @@ class GeminiTrader:
                 "setup": None,
                 "timestamp": int(time.time())
             }
+        
+        if core is None:
+            self.stats["parse_failures"] += 1
+            return {
+                "action": "HOLD",
+                "setup": None,
+                "confidence": 0.5,
+                "reasoning": "Impossible de parser la réponse Gemini",
+                "timestamp": int(time.time())
+            }
+        
+        with self._decisions_lock:
+            self._decisions[key] = (now, core)
+            self._decisions.move_to_end(key)
+            while len(self._decisions) > 256:
+                self._decisions.popitem(last=False)
+        
+        decision = self._build_decision(core, market_data)
+        print(f"[GEMINI] 🤖 Décision: {decision['action']} ({decision['confidence']:.0%})")
+        return decision
+    
+    def _request_decision(self, market_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Appel Gemini: JSON contraint par TRADING_DECISION_SCHEMA, texte libre si non supporté"""
+        self.stats["calls"] += 1
+        if self.structured_output:
+            try:
+                response = self.generate(
+                    self._build_trading_prompt(market_data, structured=True),
+                    generation_config={
+                        "response_mime_type": "application/json",
+                        "response_schema": TRADING_DECISION_SCHEMA,
+                        "temperature": 0.2
+                    }
+                )
+            except (TypeError, ValueError, InvalidArgument) as e:
+                # SDK (TypeError/ValueError) ou modèle (400 InvalidArgument sur le schéma)
+                # sans sortie structurée: prompt JSON + parsing tolérant. Les autres
+                # erreurs 400 (clé, quota, prompt) ne désactivent pas le mode structuré.
+                if isinstance(e, InvalidArgument) and not self._schema_rejected(e):
+                    raise
+                print(f"[GEMINI] ⚠️  Sortie structurée indisponible ({str(e)[:60]}), mode texte")
+                self.structured_output = False
+            else:
+                try:
+                    return self._core_decision(json.loads(response.text))
+                except json.JSONDecodeError as e:
+                    print(f"[GEMINI] ⚠️  JSON structuré invalide: {e}")
+                    return None
+        
+        response = self.generate(self._build_trading_prompt(market_data))
+        return self._parse_gemini_response(response.text, market_data)
+    
+    @staticmethod
+    def _schema_rejected(error: Exception) -> bool:
+        """Erreur 400 due à response_schema / response_mime_type (modèle sans sortie structurée)"""
+        message = str(error).lower()
+        return any(word in message for word in ("schema", "mime", "json mode", "structured"))
     
-    def _build_trading_prompt(self, market_data: Dict[str, Any]) -> str:
-        """Construit un prompt structuré pour Gemini"""
+    def _build_trading_prompt(self, market_data: Dict[str, Any], structured: bool = False) -> str:
+        """Construit un prompt structuré pour Gemini (format de réponse imposé par schéma si structured)"""
         
         price = market_data.get("sui_price", 0)
         trend = market_data.get("trend", "neutral")
@@ -123,24 +238,24 @@ INSTRUCTIONS:
 Analyse ces données et décide:
 1. Quelle ACTION: BUY_SUI, SELL_SUI, ou HOLD
 2. Quel SETUP: TREND_PULLBACK_LONG, TREND_PULLBACK_SHORT, VWAP_FADE_LONG, VWAP_FADE_SHORT, ou None
-3. Niveau de CONFIANCE: 0-100%
+3. Niveau de CONFIANCE: nombre entre 0 et 1 (ex: 0.75)
 4. RAISONNEMENT: Explication courte (1 phrase)
-
+"""
+        if structured:
+            return prompt + "\nsetup NONE si aucun setup clair.\n"
+        prompt += """
 Réponds UNIQUEMENT en JSON strict (pas de markdown):
-{{
+{
   "action": "BUY_SUI|SELL_SUI|HOLD",
   "setup": "TREND_PULLBACK_LONG|...|None",
   "confidence": 0.XX,
   "reasoning": "ton explication ici"
-}}
+}
 """
         return prompt
     
-    def _parse_gemini_response(self, response_text: str, market_data: Dict) -> Dict[str, Any]:
-        """Parse la réponse JSON de Gemini"""
-        
-        import time
-        
+    def _parse_gemini_response(self, response_text: str, market_data: Dict) -> Optional[Dict[str, Any]]:
+        """Parse la réponse JSON texte libre de Gemini (mode sans schéma); None si illisible"""
         try:
             # Nettoyer la réponse (enlever markdown si présent)
             clean_text = response_text.strip()
@@ -149,73 +264,91 @@ Réponds UNIQUEMENT en JSON strict (pas de markdown):
                 lines = clean_text.split("\n")
                 clean_text = "\n".join([l for l in lines if not l.startswith("```")])
             
-            # Parser JSON
-            decision = json.loads(clean_text)
-            
-            # Valider et compléter
-            action = decision.get("action", "HOLD")
-            setup = decision.get("setup", None)
-            confidence = float(decision.get("confidence", 0.5))
-            reasoning = decision.get("reasoning", "Décision Gemini")
-            
-            # Simuler des indicateurs (en production: calculer réellement)
-            price = market_data["sui_price"]
-            atr_5m = price * 0.003  # ~0.3%
-            
-            # Calculer risk management basique
-            risk_usd = 30.0  # 1.5% de 2000 USDC
-            
-            if action in ["BUY_SUI", "SELL_SUI"]:
-                stop_distance = 0.4 * atr_5m
-                position_size = risk_usd / stop_distance
-                
-                if action == "BUY_SUI":
-                    stop_loss = price - stop_distance
-                    tp1 = price + (1.0 * atr_5m)
-                    tp2 = price + (1.5 * atr_5m)
-                else:  # SELL
-                    stop_loss = price + stop_distance
-                    tp1 = price - (1.0 * atr_5m)
-                    tp2 = price - (1.5 * atr_5m)
-            else:
-                stop_loss = 0
-                tp1 = 0
-                tp2 = 0
-                position_size = 0
-            
-            return {
-                "action": action,
-                "setup": setup,
-                "confidence": confidence,
-                "reasoning": reasoning,
-                "market_bias": market_data.get("trend", "neutral").upper(),
-                "indicators": {
-                    "price": price,
-                    "atr_5m": atr_5m,
-                    "atr_pct": (atr_5m / price) * 100
-                },
-                "risk_management": {
-                    "stop_loss": stop_loss,
-                    "take_profit_1": tp1,
-                    "take_profit_2": tp2,
-                    "position_size_usd": position_size,
-                    "risk_usd": risk_usd
-                },
-                "timestamp": int(time.time())
-            }
+            return self._core_decision(json.loads(clean_text))
             
         except json.JSONDecodeError as e:
             print(f"[GEMINI] ⚠️  Erreur parsing JSON: {e}")
             print(f"[GEMINI] Réponse brute: {response_text[:200]}")
+            return None
+    
+    @staticmethod
+    def _core_decision(decision: Dict[str, Any]) -> Dict[str, Any]:
+        """Valide et complète la décision brute (action, setup, confiance, raisonnement)"""
+        action = decision.get("action", "HOLD")
+        if action not in ("BUY_SUI", "SELL_SUI", "HOLD"):
+            action = "HOLD"
+        setup = decision.get("setup", None)
+        if setup in ("NONE", "None", ""):
+            setup = None
+        confidence = float(decision.get("confidence", 0.5))
+        if 1.0 < confidence <= 100.0:
+            confidence /= 100  # réponse en pourcentage (80 -> 0.80)
+        return {
+            "action": action,
+            "setup": setup,
+            "confidence": min(max(confidence, 0.0), 1.0),
+            "reasoning": decision.get("reasoning", "Décision Gemini")
+        }
+    
+    def _build_decision(self, core: Dict[str, Any], market_data: Dict) -> Dict[str, Any]:
+        """Décision complète: niveaux de risque recalculés au prix courant"""
+        action = core["action"]
+        
+        # Simuler des indicateurs (en production: calculer réellement)
+        price = market_data["sui_price"]
+        atr_5m = price * 0.003  # ~0.3%
+        
+        # Calculer risk management basique
+        risk_usd = 30.0  # 1.5% de 2000 USDC
+        
+        if action in ["BUY_SUI", "SELL_SUI"]:
+            stop_distance = 0.4 * atr_5m
+            position_size = risk_usd / stop_distance
             
-            # Fallback conservateur
-            return {
-                "action": "HOLD",
-                "setup": None,
-                "confidence": 0.5,
-                "reasoning": "Impossible de parser la réponse Gemini",
-                "timestamp": int(time.time())
-            }
+            if action == "BUY_SUI":
+                stop_loss = price - stop_distance
+                tp1 = price + (1.0 * atr_5m)
+                tp2 = price + (1.5 * atr_5m)
+            else:  # SELL
+                stop_loss = price + stop_distance
+                tp1 = price - (1.0 * atr_5m)
+                tp2 = price - (1.5 * atr_5m)
+        else:
+            stop_loss = 0
+            tp1 = 0
+            tp2 = 0
+            position_size = 0
+        
+        return {
+            **core,
+            "market_bias": market_data.get("trend", "neutral").upper(),
+            "indicators": {
+                "price": price,
+                "atr_5m": atr_5m,
+                "atr_pct": (atr_5m / price) * 100
+            },
+            "risk_management": {
+                "stop_loss": stop_loss,
+                "take_profit_1": tp1,
+                "take_profit_2": tp2,
+                "position_size_usd": position_size,
+                "risk_usd": risk_usd
+            },
+            "timestamp": int(time.time())
+        }
+
+
+# Client partagé par le trading et les combats (un seul modèle par processus)
+_trader_instance: Optional[GeminiTrader] = None
+_trader_lock = threading.Lock()
+
+def get_gemini_trader() -> GeminiTrader:
+    """Get or create the process-wide Gemini client (raises if GEMINI_API_KEY is missing)."""
+    global _trader_instance
+    with _trader_lock:
+        if _trader_instance is None:
+            _trader_instance = GeminiTrader()
+        return _trader_instance
 
 
 if __name__ == "__main__":
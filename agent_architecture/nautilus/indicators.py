@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+STREAMING INDICATORS
+====================
+Incremental EMA, Wilder RSI, ATR, session VWAP and volume SMA for the
+dual-setup strategy. Every indicator consumes one closed candle in O(1)
+(`update`), can evaluate the still-forming candle without mutating its
+state (`peek`), and round-trips through `snapshot()` / `restore()` so the
+agent resumes warm after a restart.
+
+Seeding matches the textbook definitions: EMA, RSI and ATR start from the
+simple average of their first `period` inputs, then switch to their
+recursive (EMA / Wilder) form.
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+
+class Candle(NamedTuple):
+    timestamp: float  # open time, seconds
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+class RingBuffer:
+    """Fixed-capacity buffer with a running sum (O(1) append and mean)."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._data: List[float] = [0.0] * capacity
+        self._start = 0
+        self.count = 0
+        self.total = 0.0
+
+    def append(self, value: float) -> Optional[float]:
+        """Add a value; returns the value it evicted once the buffer is full."""
+        evicted = None
+        if self.count == self.capacity:
+            evicted = self._data[self._start]
+            self.total -= evicted
+            self._data[self._start] = value
+            self._start = (self._start + 1) % self.capacity
+        else:
+            self._data[(self._start + self.count) % self.capacity] = value
+            self.count += 1
+        self.total += value
+        return evicted
+
+    @property
+    def full(self) -> bool:
+        return self.count == self.capacity
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def values(self) -> List[float]:
+        return [self._data[(self._start + i) % self.capacity] for i in range(self.count)]
+
+    def snapshot(self) -> List[float]:
+        return self.values()
+
+    def restore(self, values: List[float]) -> None:
+        self.__init__(self.capacity)
+        for value in values[-self.capacity:]:
+            self.append(value)
+
+
+class EMA:
+    def __init__(self, period: int) -> None:
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self._seed = RingBuffer(period)
+        self.value: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.value is not None
+
+    def _next(self, price: float) -> Optional[float]:
+        if self.value is not None:
+            return self.value + (price - self.value) * self.alpha
+        if self._seed.count + 1 == self.period:
+            return (self._seed.total + price) / self.period
+        return None
+
+    def update(self, price: float) -> Optional[float]:
+        value = self._next(price)
+        if self.value is None and value is None:
+            self._seed.append(price)
+        self.value = value
+        return value
+
+    def peek(self, price: float) -> Optional[float]:
+        return self._next(price)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"value": self.value, "seed": self._seed.snapshot()}
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        self.value = state["value"]
+        self._seed.restore(state["seed"])
+
+
+class WilderRSI:
+    def __init__(self, period: int = 14) -> None:
+        self.period = period
+        self.prev_close: Optional[float] = None
+        self.avg_gain: Optional[float] = None
+        self.avg_loss: Optional[float] = None
+        self._gains = RingBuffer(period)
+        self._losses = RingBuffer(period)
+
+    @property
+    def ready(self) -> bool:
+        return self.avg_gain is not None
+
+    def _averages(self, close: float):
+        delta = close - self.prev_close
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        if self.avg_gain is not None:
+            n = self.period
+            return gain, loss, (self.avg_gain * (n - 1) + gain) / n, (self.avg_loss * (n - 1) + loss) / n
+        if self._gains.count + 1 == self.period:
+            return gain, loss, (self._gains.total + gain) / self.period, (self._losses.total + loss) / self.period
+        return gain, loss, None, None
+
+    @staticmethod
+    def _rsi(avg_gain: Optional[float], avg_loss: Optional[float]) -> Optional[float]:
+        if avg_gain is None:
+            return None
+        if avg_loss == 0:
+            return 100.0 if avg_gain > 0 else 50.0
+        return 100 - 100 / (1 + avg_gain / avg_loss)
+
+    @property
+    def value(self) -> Optional[float]:
+        return self._rsi(self.avg_gain, self.avg_loss)
+
+    def update(self, close: float) -> Optional[float]:
+        if self.prev_close is not None:
+            gain, loss, avg_gain, avg_loss = self._averages(close)
+            if avg_gain is None:
+                self._gains.append(gain)
+                self._losses.append(loss)
+            self.avg_gain, self.avg_loss = avg_gain, avg_loss
+        self.prev_close = close
+        return self.value
+
+    def peek(self, close: float) -> Optional[float]:
+        if self.prev_close is None:
+            return None
+        _, _, avg_gain, avg_loss = self._averages(close)
+        return self._rsi(avg_gain, avg_loss)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "prev_close": self.prev_close, "avg_gain": self.avg_gain, "avg_loss": self.avg_loss,
+            "gains": self._gains.snapshot(), "losses": self._losses.snapshot()
+        }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        self.prev_close, self.avg_gain, self.avg_loss = state["prev_close"], state["avg_gain"], state["avg_loss"]
+        self._gains.restore(state["gains"])
+        self._losses.restore(state["losses"])
+
+
+class ATR:
+    """Wilder-smoothed Average True Range."""
+
+    def __init__(self, period: int = 14) -> None:
+        self.period = period
+        self.prev_close: Optional[float] = None
+        self.value: Optional[float] = None
+        self._seed = RingBuffer(period)
+
+    @property
+    def ready(self) -> bool:
+        return self.value is not None
+
+    def _true_range(self, candle: Candle) -> float:
+        if self.prev_close is None:
+            return candle.high - candle.low
+        return max(candle.high - candle.low, abs(candle.high - self.prev_close), abs(candle.low - self.prev_close))
+
+    def _next(self, true_range: float) -> Optional[float]:
+        if self.value is not None:
+            return (self.value * (self.period - 1) + true_range) / self.period
+        if self._seed.count + 1 == self.period:
+            return (self._seed.total + true_range) / self.period
+        return None
+
+    def update(self, candle: Candle) -> Optional[float]:
+        true_range = self._true_range(candle)
+        value = self._next(true_range)
+        if self.value is None and value is None:
+            self._seed.append(true_range)
+        self.value = value
+        self.prev_close = candle.close
+        return value
+
+    def peek(self, candle: Candle) -> Optional[float]:
+        return self._next(self._true_range(candle))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"prev_close": self.prev_close, "value": self.value, "seed": self._seed.snapshot()}
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        self.prev_close, self.value = state["prev_close"], state["value"]
+        self._seed.restore(state["seed"])
+
+
+class VWAP:
+    """Session-anchored VWAP on the typical price; resets every `session_seconds` (UTC days by default)."""
+
+    def __init__(self, session_seconds: int = 86400) -> None:
+        self.session_seconds = session_seconds
+        self.session: Optional[int] = None
+        self.pv = 0.0
+        self.volume = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.volume > 0
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.pv / self.volume if self.volume else None
+
+    def _totals(self, candle: Candle):
+        session = int(candle.timestamp // self.session_seconds)
+        pv, volume = (self.pv, self.volume) if session == self.session else (0.0, 0.0)
+        typical = (candle.high + candle.low + candle.close) / 3
+        return session, pv + typical * candle.volume, volume + candle.volume
+
+    def update(self, candle: Candle) -> Optional[float]:
+        self.session, self.pv, self.volume = self._totals(candle)
+        return self.value
+
+    def peek(self, candle: Candle) -> Optional[float]:
+        _, pv, volume = self._totals(candle)
+        return pv / volume if volume else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"session": self.session, "pv": self.pv, "volume": self.volume}
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        self.session, self.pv, self.volume = state["session"], state["pv"], state["volume"]
+
+
+class VolumeSMA:
+    def __init__(self, period: int = 20) -> None:
+        self.period = period
+        self._window: Deque[float] = deque(maxlen=period)
+        self.total = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return len(self._window) == self.period
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.total / len(self._window) if self._window else None
+
+    def update(self, volume: float) -> Optional[float]:
+        if self.ready:
+            self.total -= self._window[0]
+        self._window.append(volume)
+        self.total += volume
+        return self.value
+
+    def peek(self, volume: float) -> Optional[float]:
+        if not self.ready:
+            return (self.total + volume) / (len(self._window) + 1)
+        return (self.total - self._window[0] + volume) / self.period
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"window": list(self._window)}
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        self._window = deque(state["window"][-self.period:], maxlen=self.period)
+        self.total = sum(self._window)
+
+
+class StrategyIndicators:
+    """
+    Indicator state of the dual-setup strategy (TRADING_CONFIG["indicators"]):
+    15m bias frame: EMA15/EMA50, VWAP, ATR - 5m entry frame: EMA9/EMA21, RSI, ATR, volume SMA.
+    """
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        params = config["indicators"]
+        self.bias_tf = config["timeframes"]["bias"]
+        self.entry_tf = config["timeframes"]["entry"]
+        fast_bias, slow_bias = params["ema_bias"]
+        fast_entry, slow_entry = params["ema_entry"]
+        self.frames: Dict[str, Dict[str, Any]] = {
+            self.bias_tf: {
+                f"ema{fast_bias}": EMA(fast_bias),
+                f"ema{slow_bias}": EMA(slow_bias),
+                "vwap": VWAP(),
+                "atr": ATR(params["atr_period"]),
+            },
+            self.entry_tf: {
+                f"ema{fast_entry}": EMA(fast_entry),
+                f"ema{slow_entry}": EMA(slow_entry),
+                "rsi": WilderRSI(params["rsi_period"]),
+                "atr": ATR(params["atr_period"]),
+                "volume_sma": VolumeSMA(params["volume_sma"]),
+            },
+        }
+        self.last_close_time: Dict[str, Optional[float]] = {tf: None for tf in self.frames}
+        self.forming: Dict[str, Optional[Candle]] = {tf: None for tf in self.frames}
+
+    @staticmethod
+    def _feed(name: str, indicator: Any, candle: Candle, peek: bool = False) -> Optional[float]:
+        if isinstance(indicator, (EMA, WilderRSI)):
+            arg = candle.close
+        elif isinstance(indicator, VolumeSMA):
+            arg = candle.volume
+        else:
+            arg = candle
+        return indicator.peek(arg) if peek else indicator.update(arg)
+
+    def on_candle(self, timeframe: str, candle: Candle) -> None:
+        """Feed one closed candle (ignored if not newer than the last one seen)."""
+        last = self.last_close_time[timeframe]
+        if last is not None and candle.timestamp <= last:
+            return
+        for name, indicator in self.frames[timeframe].items():
+            self._feed(name, indicator, candle)
+        self.last_close_time[timeframe] = candle.timestamp
+
+    def on_forming(self, timeframe: str, candle: Candle) -> None:
+        """Latest state of the candle that has not closed yet (used by `values`)."""
+        self.forming[timeframe] = candle
+
+    @property
+    def ready(self) -> bool:
+        return all(ind.ready for frame in self.frames.values() for ind in frame.values() if not isinstance(ind, VolumeSMA))
+
+    def values(self) -> Dict[str, Optional[float]]:
+        """Current indicator values, including the forming candle when one is known."""
+        out: Dict[str, Optional[float]] = {}
+        for timeframe, frame in self.frames.items():
+            forming = self.forming[timeframe]
+            if forming is not None and self.last_close_time[timeframe] is not None \
+                    and forming.timestamp <= self.last_close_time[timeframe]:
+                forming = None
+            for name, indicator in frame.items():
+                value = self._feed(name, indicator, forming, peek=True) if forming else indicator.value
+                out[f"{name}_{timeframe}"] = value
+        return out
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "frames": {tf: {name: ind.snapshot() for name, ind in frame.items()} for tf, frame in self.frames.items()},
+            "last_close_time": self.last_close_time,
+        }
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        for tf, frame in state["frames"].items():
+            for name, ind_state in frame.items():
+                if tf in self.frames and name in self.frames[tf]:
+                    self.frames[tf][name].restore(ind_state)
+        self.last_close_time.update(state.get("last_close_time", {}))
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+MARKET DATA SERVICE
+===================
+Stale-while-revalidate SUI quotes. A background refresher pulls the hedged
+PriceFeed every MARKET_REFRESH_INTERVAL seconds (well inside the TTL), so
+readers never wait on the network: `latest()` returns the newest quote and
+its age immediately, and subscribers are called on every new quote.
+
+The newest quote is also published in a small memory-mapped snapshot file
+(MARKET_SNAPSHOT_FILE) guarded by a sequence counter (seqlock), so other
+processes read prices in microseconds with `MarketSnapshotReader`. Only the
+process holding the file's flock refreshes; the others just read the map.
+
+Snapshot layout (little-endian, 80 bytes):
+    seq u64 | price f64 | change_24h f64 | volume_24h f64 | fetched_at f64
+    | latency_ms f64 | confirmations u32 | source 20s | pad
+"""
+
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from price_feed import PriceFeed
+
+logger = logging.getLogger(__name__)
+
+_SEQ = struct.Struct("<Q")
+_BODY = struct.Struct("<dddddI20s")
+SNAPSHOT_SIZE = 80
+
+
+class MarketSnapshotReader:
+    """Lock-free reader of the snapshot file written by the refreshing process."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or os.getenv("MARKET_SNAPSHOT_FILE", ".market_snapshot.bin")
+        self._map: Optional[mmap.mmap] = None
+
+    def _mapped(self) -> Optional[mmap.mmap]:
+        if self._map is None:
+            try:
+                with open(self.path, "rb") as fh:
+                    self._map = mmap.mmap(fh.fileno(), SNAPSHOT_SIZE, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return None
+        return self._map
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        mapped = self._mapped()
+        if mapped is None:
+            return None
+        for _ in range(100):
+            seq = _SEQ.unpack_from(mapped, 0)[0]
+            if seq & 1:
+                continue  # writer mid-update
+            body = _BODY.unpack_from(mapped, _SEQ.size)
+            if _SEQ.unpack_from(mapped, 0)[0] == seq:
+                break
+        else:
+            return None
+        if seq == 0:
+            return None
+        price, change, volume, fetched_at, latency_ms, confirmations, source = body
+        return {
+            "price": price,
+            "change_24h": change,
+            "volume_24h": volume,
+            "fetched_at": fetched_at,
+            "latency_ms": latency_ms,
+            "confirmations": confirmations,
+            "source": source.rstrip(b"\0").decode(),
+        }
+
+
+class MarketDataService:
+    def __init__(
+        self,
+        feed: Optional[PriceFeed] = None,
+        refresh_interval: Optional[float] = None,
+        ttl: Optional[float] = None,
+        snapshot_path: Optional[str] = None
+    ) -> None:
+        self.feed = feed or PriceFeed()
+        self.refresh_interval = refresh_interval or float(os.getenv("MARKET_REFRESH_INTERVAL", "10"))
+        self.ttl = ttl or float(os.getenv("MARKET_TTL", "30"))
+        self.snapshot_path = snapshot_path or os.getenv("MARKET_SNAPSHOT_FILE", ".market_snapshot.bin")
+
+        self._quote: Optional[Dict[str, Any]] = None
+        self._cond = threading.Condition()
+        self._subscribers: List[Callable[[Dict[str, Any]], None]] = []
+        self._reader = MarketSnapshotReader(self.snapshot_path)
+        self._writer: Optional[mmap.mmap] = None
+        self._lock_fh = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- lifecycle ---
+
+    def start(self) -> "MarketDataService":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="market-data", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _claim_writer(self) -> bool:
+        """Become the refreshing process if nobody else holds the snapshot file."""
+        if self._writer is not None:
+            return True
+        fh = open(self.snapshot_path, "a+b")
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            fh.close()
+            return False
+        if os.fstat(fh.fileno()).st_size < SNAPSHOT_SIZE:
+            fh.truncate(SNAPSHOT_SIZE)
+        self._lock_fh = fh
+        self._writer = mmap.mmap(fh.fileno(), SNAPSHOT_SIZE)
+        return True
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            if not self._claim_writer():
+                # Another process refreshes: follow its snapshot
+                shared = self._reader.read()
+                if shared is not None and (self._quote is None or shared["fetched_at"] > self._quote["fetched_at"]):
+                    self._publish(shared, write=False)
+                self._stop.wait(min(self.refresh_interval, 1.0))
+                continue
+            quote = self.feed.fetch()
+            if quote is None:
+                logger.warning("Market data refresh failed - serving last quote, retry in %.0fs", backoff)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.refresh_interval)
+                continue
+            backoff = 1.0
+            quote["fetched_at"] = time.time()
+            self._publish(quote, write=True)
+            self._stop.wait(self.refresh_interval)
+
+    def _publish(self, quote: Dict[str, Any], write: bool) -> None:
+        if write and self._writer is not None:
+            seq = _SEQ.unpack_from(self._writer, 0)[0]
+            seq += 2 if seq % 2 == 0 else 1
+            _SEQ.pack_into(self._writer, 0, seq - 1)  # odd: update in progress
+            _BODY.pack_into(
+                self._writer, _SEQ.size,
+                quote["price"], quote.get("change_24h") or 0.0, quote.get("volume_24h") or 0.0,
+                quote["fetched_at"], quote.get("latency_ms") or 0.0, quote.get("confirmations", 1),
+                quote.get("source", "")[:20].encode()
+            )
+            _SEQ.pack_into(self._writer, 0, seq)
+        with self._cond:
+            self._quote = quote
+            self._cond.notify_all()
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(quote)
+            except Exception as exc:
+                logger.warning("Market data subscriber %r failed: %s", callback, exc)
+
+    # --- readers ---
+
+    def latest(self) -> Tuple[Optional[Dict[str, Any]], float]:
+        """(newest quote or None, age in seconds) - never blocks on the network."""
+        quote = self._quote
+        if quote is None:
+            quote = self._reader.read()  # warm start from another process' snapshot
+        if quote is None:
+            return None, float("inf")
+        return quote, time.time() - quote["fetched_at"]
+
+    def wait_first(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Block until a first quote is available (startup only)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._quote is not None, timeout)
+            return self._quote
+
+    def is_fresh(self) -> bool:
+        _, age = self.latest()
+        return age <= self.ttl
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """Call `callback(quote)` on the refresher thread for each new quote."""
+        with self._cond:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        with self._cond:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+MEMORY BLOB CODEC
+=================
+Storage format of the memory packs uploaded by walrus_queue.
+
+Binary pack:  b"CHMP" | version u8 | codec u8 | compressed JSON body
+    body = {"format": "chimera-memory-pack-v2",
+            "shared": {"<ref>": <object>, ...},     # deduplicated sub-objects
+            "items":  {"<content_hash>": <memory with {"$ref": "<ref>"}>, ...}}
+
+Monster snapshots that repeat across the memories of a pack are stored once
+in "shared" and referenced by the first 32 hex chars of their SHA-256. The
+body is compressed with zstd when `zstandard` is installed, otherwise with
+zlib primed by a preset dictionary of the compact-encoded keys and values
+every memory repeats (agent ids, decision fields, signature keys).
+
+Plain JSON blobs (chimera-memory-pack-v1 and single memories uploaded by
+WalrusMemory.save_sync) are still decoded as-is.
+"""
+
+import hashlib
+import json
+import struct
+import zlib
+from typing import Any, Dict, Tuple
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+MAGIC = b"CHMP"
+VERSION = 3
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+PACK_FORMAT = "chimera-memory-pack-v2"
+_HEADER = struct.Struct(">4sBB")
+
+# Sub-objects hoisted into the pack's shared table (dotted paths)
+SHARED_PATHS = ("combattants.monster1", "combattants.monster2")
+
+# Preset dictionary: fragments of real packs as encode_pack writes them
+# (sorted keys, compact separators), rarest first because zlib favours
+# matches near the end. Changing it requires bumping VERSION and keeping the
+# previous dictionary in _ZLIB_DICTIONARIES so older packs still decode.
+ZLIB_DICTIONARY = "".join((
+    '{"format":"chimera-memory-pack-v2","items":{"', '"shared":{"',
+    'Pullback haussier: EMA9(', 'Pullback baissier: EMA9(', ')>EMA21(', ')<EMA21(', '), RSI=', ', ATR%=',
+    'VWAP Fade short: Prix=', 'VWAP Fade long: Prix=', ' vs VWAP=', ' (surachat)', ' (survente)',
+    '"setup":"TREND_PULLBACK_LONG"', '"setup":"TREND_PULLBACK_SHORT"', '"setup":"VWAP_FADE_LONG"', '"setup":"VWAP_FADE_SHORT"',
+    '"execution":{"action":"SELL_SUI","params":{"amount":10,"slippage":0.01},"status":"simulated"}',
+    '"execution":{"action":"BUY_SUI","params":{"amount":10,"slippage":0.01},"status":"simulated"}',
+    '"decision":{"action":"SELL_SUI","confidence":0.', '"decision":{"action":"BUY_SUI","confidence":0.',
+    '"market_bias":"BULLISH"', '"market_bias":"BEARISH"',
+    'Dragon Rouge', 'Phoenix Dor\\u00e9', 'Titan de Glace', 'L\\u00e9viathan',
+    'Golem de Pierre', 'Spectre Noir', 'Hydre Venimeuse', 'Griffon C\\u00e9leste',
+    '{"agility":', ',"hp":', ',"id":"nft_', ',"intelligence":', ',"level":', ',"name":"', ',"strength":',
+    '{"agent_id":"chimera-battle-agent-01","attestation_blob_id":"', '","attestation_digest":"', '","battle_id":',
+    ',"combattants":{"monster1":{"$ref":"', '"},"monster2":{"$ref":"', '"}},"pcr0":"',
+    '","result":{"loser_id":"nft_', '","total_turns":', ',"winner_final_hp":', ',"winner_id":"nft_', '","xp_gain":',
+    '},"signature":"', '","timestamp":"20',
+    '{"agent_id":"chimera-nautilus-01","decision":{"action":"HOLD","confidence":0.5,"indicators":{"atr_5m":0.0',
+    ',"atr_pct":0.', ',"ema15_15m":', ',"ema21_5m":', ',"ema50_15m":', ',"ema9_5m":', ',"price":', ',"rsi":', ',"vwap":',
+    '},"market_bias":"RANGE","reasoning":"Pas de setup: Biais=RANGE, EMA15=', ', EMA50=', ', VWAP=', ', RSI=',
+    '","risk_management":{"position_size_usd":0,"risk_usd":30.0,"stop_loss":0,"take_profit_1":0,"take_profit_2":0}',
+    ',"setup":null,"timestamp":17', '},"execution":null,"pcr0":"', '","public_key":"', '","signature":"',
+)).encode()
+
+# Dictionary of the version 2 packs (decode only)
+_ZLIB_DICTIONARY_V2 = "".join((
+    '"enclave_version": "1.0.0", "module_id": "chimera-nautilus-agent", "key_epoch": ',
+    '"digest": "SHA384", "pcrs": {"PCR0": "', '"PCR1": "', '"PCR2": "',
+    '"setup": "TREND_PULLBACK", "setup": "VWAP_FADE", "reason": "',
+    '"action": "HOLD", "action": "OPEN_LONG", "action": "OPEN_SHORT", "confidence": ',
+    '"indicators": {"atr_5m": ', '"atr_pct": ', '"ema_20": ', '"ema_50": ', '"rsi": ', '"vwap": ',
+    '"risk_management": {"position_size_usd": ', '"risk_usd": ', '"stop_loss": ',
+    '"take_profit_1": ', '"take_profit_2": ', '"market_data": {"price": ', '"source": "',
+    '"execution": null, "decision": {', '"agent_id": "chimera-nautilus-01", ',
+    '"combattants": {"monster1": {"$ref": "', '"monster2": {"$ref": "',
+    '"result": {"loser_id": "', '"total_turns": ', '"winner_final_hp": ', '"winner_id": "',
+    '"xp_gain": ', '"agent_id": "chimera-battle-agent-01", "attestation_blob_id": "',
+    '"attestation_digest": "', '"battle_id": ', '"timestamp": "2025-',
+    '"agility": ', '"intelligence": ', '"level": ', '"monster_id": "nft_', '"name": "', '"strength": ',
+    '"pcr0": "', '"public_key": "', '"signature": "', '"timestamp": 17',
+)).encode()
+
+_ZLIB_DICTIONARIES = {2: _ZLIB_DICTIONARY_V2, VERSION: ZLIB_DICTIONARY}
+
+
+def _ref(obj: Any) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _split_path(path: str) -> Tuple[str, ...]:
+    return tuple(path.split("."))
+
+
+def _hoist(memory: Any, shared: Dict[str, Any]) -> Any:
+    """Copy of ``memory`` with SHARED_PATHS replaced by {"$ref": ...} entries in ``shared``."""
+    if not isinstance(memory, dict):
+        return memory
+    out = dict(memory)
+    for path in SHARED_PATHS:
+        keys = _split_path(path)
+        parent = out
+        for key in keys[:-1]:
+            child = parent.get(key)
+            if not isinstance(child, dict):
+                parent = None
+                break
+            parent[key] = child = dict(child)
+            parent = child
+        if parent is None or not isinstance(parent.get(keys[-1]), dict):
+            continue
+        ref = _ref(parent[keys[-1]])
+        shared.setdefault(ref, parent[keys[-1]])
+        parent[keys[-1]] = {"$ref": ref}
+    return out
+
+
+def expand(memory: Any, shared: Dict[str, Any]) -> Any:
+    """Inverse of the hoisting: replace {"$ref": ...} entries by the shared objects."""
+    if isinstance(memory, dict):
+        if set(memory) == {"$ref"} and memory["$ref"] in shared:
+            return shared[memory["$ref"]]
+        return {key: expand(value, shared) for key, value in memory.items()}
+    if isinstance(memory, list):
+        return [expand(value, shared) for value in memory]
+    return memory
+
+
+def encode_pack(items: Dict[str, Any]) -> bytes:
+    """Serialize {content_hash: memory} into a compressed, deduplicated pack blob."""
+    shared: Dict[str, Any] = {}
+    hoisted = {digest: _hoist(memory, shared) for digest, memory in items.items()}
+    body = json.dumps(
+        {"format": PACK_FORMAT, "shared": shared, "items": hoisted},
+        sort_keys=True, separators=(",", ":")
+    ).encode()
+    if ZSTD_AVAILABLE:
+        return _HEADER.pack(MAGIC, VERSION, CODEC_ZSTD) + zstandard.ZstdCompressor(level=9).compress(body)
+    compressor = zlib.compressobj(9, zlib.DEFLATED, zlib.MAX_WBITS, 9, zlib.Z_DEFAULT_STRATEGY, ZLIB_DICTIONARY)
+    return _HEADER.pack(MAGIC, VERSION, CODEC_ZLIB) + compressor.compress(body) + compressor.flush()
+
+
+def decode_blob(data: bytes) -> Any:
+    """Decode a Walrus memory blob: binary pack (returned with refs still in place) or plain JSON."""
+    if not data.startswith(MAGIC):
+        return json.loads(data)
+    _, version, codec = _HEADER.unpack_from(data)
+    if version not in _ZLIB_DICTIONARIES:
+        raise ValueError(f"unsupported memory pack version {version}")
+    compressed = data[_HEADER.size:]
+    if codec == CODEC_ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise ValueError("memory pack is zstd-compressed but zstandard is not installed")
+        body = zstandard.ZstdDecompressor().decompress(compressed)
+    elif codec == CODEC_ZLIB:
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS, _ZLIB_DICTIONARIES[version])
+        body = decompressor.decompress(compressed) + decompressor.flush()
+    else:
+        raise ValueError(f"unknown memory pack codec {codec}")
+    return json.loads(body)
+
+
+def pack_item(pack: Dict[str, Any], digest: str) -> Any:
+    """One memory out of a decoded pack, with shared sub-objects expanded."""
+    item = pack.get("items", {}).get(digest)
+    if item is None:
+        return None
+    return expand(item, pack.get("shared", {}))
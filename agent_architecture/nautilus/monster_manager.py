@@ -5,7 +5,7 @@ import logging
 import os
 from typing import Any, Dict, List, Optional
 
-import requests
+from rpc_pool import get_rpc_session
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +24,7 @@ class MonsterManager:
     def _rpc_call(self, method: str, params: List[Any]) -> Dict[str, Any]:
         """Effectue un appel RPC à Sui"""
         payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
-        response = requests.post(self.rpc_url, json=payload, timeout=20)
+        response = get_rpc_session().post(self.rpc_url, json=payload, timeout=20)
         response.raise_for_status()
         data = response.json()
         if "error" in data:
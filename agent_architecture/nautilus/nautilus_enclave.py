@@ -6,12 +6,88 @@ Simule une enclave TEE avec génération de clés et signature cryptographique.
 En production, ce serait remplacé par AWS Nitro Enclaves.
 """
 
+import functools
 import hashlib
 import json
 import time
 from nacl.signing import SigningKey, VerifyKey
 from nacl.encoding import RawEncoder
 import os
+from typing import List, Optional
+
+from bcs_payload import encode_battle_result
+
+# Domain separation for Merkle batch signing (leaf / inner node / signed root)
+MERKLE_LEAF_PREFIX = b"\x00"
+MERKLE_NODE_PREFIX = b"\x01"
+BATCH_ROOT_DOMAIN = b"CHIMERA_BATTLE_BATCH_V1"
+
+
+@functools.lru_cache(maxsize=1024)
+def load_verify_key(public_key_hex: str) -> VerifyKey:
+    """Parse a hex public key once; auditors see the same few enclave keys repeatedly."""
+    return VerifyKey(bytes.fromhex(public_key_hex), encoder=RawEncoder)
+
+
+def attestation_digest(attestation: dict) -> str:
+    """16-byte SHA-256 prefix of the canonical attestation document"""
+    return hashlib.sha256(json.dumps(attestation, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def _merkle_leaf(payload_bytes: bytes) -> bytes:
+    return hashlib.sha256(MERKLE_LEAF_PREFIX + payload_bytes).digest()
+
+
+def _merkle_parent(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(MERKLE_NODE_PREFIX + left + right).digest()
+
+
+def _merkle_levels(leaves: List[bytes]) -> List[List[bytes]]:
+    """
+    Build all tree levels bottom-up. An unpaired last node is promoted
+    unchanged to the next level (no duplication, so no second-preimage
+    ambiguity between batches of different sizes).
+    """
+    levels = [leaves]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [_merkle_parent(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def _merkle_proof(levels: List[List[bytes]], index: int) -> List[str]:
+    """Sibling hashes from leaf to root (promoted levels contribute nothing)."""
+    siblings = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            siblings.append(level[sibling].hex())
+        index //= 2
+    return siblings
+
+
+def verify_merkle_proof(leaf: bytes, index: int, leaf_count: int, siblings: List[str], root: bytes) -> bool:
+    """Recompute the root from a leaf, its index and the batch size."""
+    if not 0 <= index < leaf_count:
+        return False
+    node, width, remaining = leaf, leaf_count, list(siblings)
+    while width > 1:
+        if index ^ 1 < width:
+            if not remaining:
+                return False
+            sibling = bytes.fromhex(remaining.pop(0))
+            node = _merkle_parent(sibling, node) if index % 2 else _merkle_parent(node, sibling)
+        index //= 2
+        width = (width + 1) // 2
+    return not remaining and node == root
+
+
+def _batch_root_message(root: bytes, leaf_count: int) -> bytes:
+    return BATCH_ROOT_DOMAIN + root + leaf_count.to_bytes(8, "little")
+
 
 class EnclaveSimulator:
     """Simule une enclave Nautilus avec signature ED25519"""
@@ -22,6 +98,12 @@ class EnclaveSimulator:
         self.signing_key = SigningKey.generate()
         self.verify_key = self.signing_key.verify_key
         
+        # Attestation is issued once per key epoch and referenced by digest
+        self.key_epoch = 0
+        self._attestation: Optional[dict] = None
+        self._attestation_digest: Optional[str] = None
+        self.attestation_blob_id: Optional[str] = None
+        
         # PCR values (simulated - in real TEE these would be measurements)
         self.pcrs = {
             "PCR0": hashlib.sha256(b"chimera_battle_v1.0.0").hexdigest(),
@@ -41,58 +123,168 @@ class EnclaveSimulator:
         """Get public key as bytes"""
         return self.verify_key.encode(encoder=RawEncoder)
     
-    def sign_battle_result(self, winner_id: str, loser_id: str, xp_gain: int, battle_log: list) -> dict:
+    def sign_battle_result(
+        self,
+        winner_id: str,
+        loser_id: str,
+        xp_gain: int,
+        battle_log: list,
+        battle_log_hash: Optional[str] = None
+    ) -> dict:
         """
         Sign a battle result with the enclave's private key.
         
+        Args:
+            battle_log_hash: final hash-chain digest from BattleEngine; when
+                given, the log is not re-serialized here
+        
         Returns:
             dict with signature, public_key, and attestation info
         """
         # Create deterministic payload for signing
-        # This MUST match the BCS format expected by Move
+        # Signed bytes are the BCS encoding of this payload (see bcs_payload.py)
         payload = {
             "winner_id": winner_id,
             "loser_id": loser_id,
             "xp_gain": xp_gain,
-            "battle_log_hash": self._hash_battle_log(battle_log),
+            "battle_log_hash": battle_log_hash or self._hash_battle_log(battle_log),
             "timestamp": int(time.time())
         }
         
-        # Serialize to canonical JSON (sorted keys for determinism)
-        payload_bytes = json.dumps(payload, sort_keys=True).encode()
+        signed_result = self.sign_payload(payload)
+        
+        print(f"   [ENCLAVE] ✅ Battle result signed")
+        print(f"   Signature: {signed_result['signature'][:32]}...")
+        
+        return signed_result
+    
+    def sign_payload(self, payload: dict) -> dict:
+        """
+        Sign an already-built payload. The result references the epoch's
+        attestation by digest; fetch the full document with get_attestation().
+        """
+        payload_bytes = self._payload_bytes(payload)
         
         # Sign with ED25519
         signed = self.signing_key.sign(payload_bytes, encoder=RawEncoder)
-        signature = signed.signature
-        
-        print(f"   [ENCLAVE] ✅ Battle result signed")
-        print(f"   Signature: {signature.hex()[:32]}...")
         
         return {
-            "signature": signature.hex(),
+            "signature": signed.signature.hex(),
             "public_key": self.get_public_key_hex(),
             "payload": payload,
             "pcr0": self.pcrs["PCR0"],
-            "attestation": self._generate_attestation()
+            "attestation_digest": self.get_attestation_digest()
         }
     
+    def sign_battle_batch(self, results: list) -> dict:
+        """
+        Sign many battle results with a single signature over a Merkle root.
+        
+        Args:
+            results: dicts with winner_id, loser_id, xp_gain and battle_log
+                (or the engine's battle_log_hash)
+            
+        Returns:
+            dict with root, one signature, the attestation digest and, per battle,
+            its payload plus a compact inclusion proof (index + sibling hashes)
+        """
+        if not results:
+            raise ValueError("cannot sign an empty batch")
+        timestamp = int(time.time())
+        payloads = [
+            {
+                "winner_id": r["winner_id"],
+                "loser_id": r["loser_id"],
+                "xp_gain": r["xp_gain"],
+                "battle_log_hash": r.get("battle_log_hash") or self._hash_battle_log(r.get("battle_log", [])),
+                "timestamp": timestamp
+            }
+            for r in results
+        ]
+        return self.sign_payload_batch(payloads)
+    
+    def sign_payload_batch(self, payloads: list) -> dict:
+        """sign_battle_batch() for already-built payloads."""
+        if not payloads:
+            raise ValueError("cannot sign an empty batch")
+        levels = _merkle_levels([_merkle_leaf(self._payload_bytes(p)) for p in payloads])
+        root = levels[-1][0]
+        
+        signed = self.signing_key.sign(_batch_root_message(root, len(payloads)), encoder=RawEncoder)
+        
+        print(f"   [ENCLAVE] ✅ Batch of {len(payloads)} battle results signed")
+        print(f"   Root: {root.hex()[:32]}...")
+        
+        return {
+            "root": root.hex(),
+            "count": len(payloads),
+            "signature": signed.signature.hex(),
+            "public_key": self.get_public_key_hex(),
+            "pcr0": self.pcrs["PCR0"],
+            "attestation_digest": self.get_attestation_digest(),
+            "items": [
+                {"payload": payload, "proof": {"index": i, "siblings": _merkle_proof(levels, i)}}
+                for i, payload in enumerate(payloads)
+            ]
+        }
+    
+    @staticmethod
+    def _payload_bytes(payload: dict) -> bytes:
+        """Serialize to the canonical BCS layout expected by Move"""
+        return encode_battle_result(payload)
+    
     def _hash_battle_log(self, battle_log: list) -> str:
-        """Generate SHA256 hash of battle log"""
+        """Generate SHA256 hash of battle log (for logs not produced by BattleEngine)"""
         log_bytes = json.dumps(battle_log, sort_keys=True).encode()
         return hashlib.sha256(log_bytes).hexdigest()
     
     def _generate_attestation(self) -> dict:
         """Generate simulated attestation document"""
+        issued_at = time.time()
         return {
             "mode": "DOCKER_SIMULATION",
             "pcrs": self.pcrs,
             "public_key": self.get_public_key_hex(),
-            "timestamp": int(time.time()),
+            "key_epoch": self.key_epoch,
+            "timestamp": int(issued_at),
             "enclave_id": hashlib.sha256(
-                (self.get_public_key_hex() + str(time.time())).encode()
+                (self.get_public_key_hex() + str(issued_at)).encode()
             ).hexdigest()[:16]
         }
     
+    def get_attestation(self) -> dict:
+        """Attestation document for the current key epoch (built on first use)"""
+        if self._attestation is None:
+            self._attestation = self._generate_attestation()
+            self._attestation_digest = attestation_digest(self._attestation)
+        return self._attestation
+    
+    def get_attestation_digest(self) -> str:
+        """Short digest that signed results carry in place of the full document"""
+        self.get_attestation()
+        return self._attestation_digest
+    
+    def publish_attestation(self, publisher) -> Optional[str]:
+        """
+        Publish the full attestation once per epoch.
+        
+        Args:
+            publisher: callable storing a dict and returning a reference
+                (e.g. WalrusMemory.save returning a blob_id)
+        """
+        if self.attestation_blob_id is None:
+            self.attestation_blob_id = publisher(self.get_attestation())
+        return self.attestation_blob_id
+    
+    def rotate_key(self) -> None:
+        """Start a new key epoch: fresh keypair, attestation re-issued on next use"""
+        self.signing_key = SigningKey.generate()
+        self.verify_key = self.signing_key.verify_key
+        self.key_epoch += 1
+        self._attestation = None
+        self._attestation_digest = None
+        self.attestation_blob_id = None
+    
     @staticmethod
     def verify_signature(public_key_hex: str, payload_dict: dict, signature_hex: str) -> bool:
         """
@@ -107,12 +299,11 @@ class EnclaveSimulator:
             True if signature is valid, False otherwise
         """
         try:
-            # Reconstruct verify key
-            public_key_bytes = bytes.fromhex(public_key_hex)
-            verify_key = VerifyKey(public_key_bytes, encoder=RawEncoder)
+            # Reconstruct verify key (cached per public key)
+            verify_key = load_verify_key(public_key_hex)
             
             # Reconstruct payload bytes (same canonical format)
-            payload_bytes = json.dumps(payload_dict, sort_keys=True).encode()
+            payload_bytes = EnclaveSimulator._payload_bytes(payload_dict)
             
             # Convert signature to bytes
             signature_bytes = bytes.fromhex(signature_hex)
@@ -124,16 +315,93 @@ class EnclaveSimulator:
         except Exception as e:
             print(f"   [ENCLAVE] ❌ Signature verification failed: {e}")
             return False
+    
+    @staticmethod
+    def _verify_batch_root(public_key_hex: str, root: bytes, leaf_count: int, signature_hex: str) -> bool:
+        try:
+            load_verify_key(public_key_hex).verify(
+                _batch_root_message(root, leaf_count),
+                bytes.fromhex(signature_hex),
+                encoder=RawEncoder
+            )
+            return True
+        except Exception as e:
+            print(f"   [ENCLAVE] ❌ Batch root verification failed: {e}")
+            return False
+    
+    @staticmethod
+    def _verify_inclusion(root: bytes, leaf_count: int, payload_dict: dict, proof: dict) -> bool:
+        try:
+            leaf = _merkle_leaf(EnclaveSimulator._payload_bytes(payload_dict))
+            return verify_merkle_proof(leaf, int(proof["index"]), leaf_count, proof["siblings"], root)
+        except Exception as e:
+            print(f"   [ENCLAVE] ❌ Batch item verification failed: {e}")
+            return False
+    
+    @staticmethod
+    def verify_batch_item(
+        public_key_hex: str,
+        root_hex: str,
+        leaf_count: int,
+        signature_hex: str,
+        payload_dict: dict,
+        proof: dict
+    ) -> bool:
+        """
+        Verify one battle from a signed batch: the root signature, then the
+        payload's inclusion proof against that root.
+        
+        Returns:
+            True if both checks pass, False otherwise
+        """
+        root = bytes.fromhex(root_hex)
+        return (
+            EnclaveSimulator._verify_batch_root(public_key_hex, root, leaf_count, signature_hex)
+            and EnclaveSimulator._verify_inclusion(root, leaf_count, payload_dict, proof)
+        )
+    
+    @staticmethod
+    def verify_signed_result(public_key_hex: str, payload_dict: dict, signature_hex: str, batch: Optional[dict] = None) -> bool:
+        """
+        Verify a result signed alone or as part of a batch (``batch`` holds
+        the root, count and proof the signing daemon attaches to batched items).
+        """
+        if batch is None:
+            return EnclaveSimulator.verify_signature(public_key_hex, payload_dict, signature_hex)
+        return EnclaveSimulator.verify_batch_item(
+            public_key_hex, batch["root"], batch["count"], signature_hex, payload_dict, batch["proof"]
+        )
+    
+    @staticmethod
+    def verify_batch(batch: dict) -> List[bool]:
+        """Verify every item of a sign_battle_batch() result (root signature checked once)."""
+        root = bytes.fromhex(batch["root"])
+        if not EnclaveSimulator._verify_batch_root(batch["public_key"], root, batch["count"], batch["signature"]):
+            return [False] * len(batch["items"])
+        return [
+            EnclaveSimulator._verify_inclusion(root, batch["count"], item["payload"], item["proof"])
+            for item in batch["items"]
+        ]
 
 
 # Global enclave instance (singleton)
 _enclave_instance = None
 
 def get_enclave() -> EnclaveSimulator:
-    """Get or create the global enclave instance"""
+    """
+    Get or create the global enclave instance.
+    
+    When ENCLAVE_SOCKET is set, returns a client of the shared signing daemon
+    (signing_daemon.py) so every worker process signs with the same key.
+    """
     global _enclave_instance
     if _enclave_instance is None:
-        _enclave_instance = EnclaveSimulator()
+        socket_path = os.getenv("ENCLAVE_SOCKET")
+        if socket_path:
+            from signing_daemon import RemoteEnclave
+            _enclave_instance = RemoteEnclave(socket_path)
+        else:
+            _enclave_instance = EnclaveSimulator()
     return _enclave_instance
 
 
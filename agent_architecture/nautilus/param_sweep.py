@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+TRADING_CONFIG PARAMETER SWEEP
+==============================
+Runs the dual-setup backtester over a grid (or random samples) of
+TRADING_CONFIG overrides on a process pool and ranks the results by a
+risk-adjusted score.
+
+The candle history is loaded once into a shared memory block; workers map
+it as NumPy views (no per-worker copies) and memoize indicator series by
+period, so e.g. 27 stop/target combinations compute each EMA only once.
+
+Parameters are dotted TRADING_CONFIG paths:
+    setup_a.stop_atr_mult=0.3,0.4,0.5     grid values
+    setup_b.rsi_overbought=65:80          uniform range (random sampling only)
+    indicators.ema_entry=9/21,8/20        list values use "/"
+
+Usage:
+    python3 param_sweep.py candles.csv -p setup_a.stop_atr_mult=0.3,0.4,0.5 \\
+        -p setup_a.tp1_atr_mult=0.8,1.0,1.2 [--samples 200] [--rank-by sharpe]
+"""
+
+import copy
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backtester import COLUMNS, load_ohlcv, run_backtest
+
+# Worker-process state (set by _init_worker)
+_candles: Optional[Dict[str, np.ndarray]] = None
+_shm: Optional[shared_memory.SharedMemory] = None
+_base_config: Optional[Dict[str, Any]] = None
+_cache: Dict[Any, np.ndarray] = {}
+_fee_bps: Optional[float] = None
+
+
+def _parse_value(text: str) -> Any:
+    if "/" in text:
+        return [_parse_value(part) for part in text.split("/")]
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_params(specs: Sequence[str]) -> Dict[str, Any]:
+    """["a.b=1,2", "c=0.1:0.5"] -> {"a.b": [1, 2], "c": (0.1, 0.5)}"""
+    space: Dict[str, Any] = {}
+    for spec in specs:
+        path, _, values = spec.partition("=")
+        if ":" in values:
+            low, high = values.split(":")
+            space[path] = (float(low), float(high))
+        else:
+            space[path] = [_parse_value(v) for v in values.split(",")]
+    return space
+
+
+def apply_overrides(config: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    out = copy.deepcopy(config)
+    for path, value in overrides.items():
+        keys = path.split(".")
+        target = out
+        for key in keys[:-1]:
+            target = target[key]
+        if keys[-1] not in target:
+            raise KeyError(f"unknown TRADING_CONFIG field: {path}")
+        target[keys[-1]] = tuple(value) if isinstance(target[keys[-1]], tuple) else value
+    return out
+
+
+def _is_int_field(config: Optional[Dict[str, Any]], path: str) -> bool:
+    value: Any = config
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return False
+        value = value[key]
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def expand_space(
+    space: Dict[str, Any],
+    samples: Optional[int] = None,
+    seed: int = 0,
+    base_config: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Full grid, or `samples` random points (ranges drawn uniformly, grid values uniformly).
+    Ranges over integer fields of `base_config` (periods, RSI levels) draw integers.
+    """
+    if samples is None:
+        ranges = [path for path, values in space.items() if isinstance(values, tuple)]
+        if ranges:
+            raise ValueError(f"ranges need --samples: {', '.join(ranges)}")
+        paths = list(space)
+        return [dict(zip(paths, combo)) for combo in itertools.product(*(space[p] for p in paths))]
+    int_fields = {path for path in space if _is_int_field(base_config, path)}
+    rng = random.Random(seed)
+    points = []
+    for _ in range(samples):
+        point = {}
+        for path, values in space.items():
+            if not isinstance(values, tuple):
+                point[path] = rng.choice(values)
+            elif path in int_fields:
+                point[path] = rng.randint(math.ceil(values[0]), math.floor(values[1]))
+            else:
+                point[path] = round(rng.uniform(*values), 4)
+        points.append(point)
+    return points
+
+
+def score(report: Dict[str, Any], rank_by: str) -> float:
+    if rank_by == "calmar":
+        return report["return_pct"] / max(report["max_drawdown_pct"], 1e-9)
+    if rank_by == "pnl":
+        return report["pnl"]
+    return report["sharpe"]
+
+
+# === WORKERS ===
+def _init_worker(shm_name: str, length: int, base_config: Dict[str, Any], fee_bps: Optional[float]) -> None:
+    global _candles, _shm, _base_config, _fee_bps
+    # Pool workers share the parent's resource tracker, which unlinks the block once
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    matrix = np.ndarray((len(COLUMNS), length), dtype=np.float64, buffer=_shm.buf)
+    _candles = {name: matrix[i] for i, name in enumerate(COLUMNS)}
+    _base_config = base_config
+    _fee_bps = fee_bps
+
+
+def _run_point(overrides: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    try:
+        report = run_backtest(_candles, apply_overrides(_base_config, overrides), fee_bps=_fee_bps, cache=_cache)
+    except Exception as exc:
+        report = {"error": str(exc)}
+    return overrides, report
+
+
+def sweep(
+    candles: Dict[str, np.ndarray],
+    base_config: Dict[str, Any],
+    points: Sequence[Dict[str, Any]],
+    workers: Optional[int] = None,
+    rank_by: str = "sharpe",
+    min_trades: int = 20,
+    fee_bps: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """Backtest every override point in parallel; returns results sorted best first."""
+    length = len(candles["close"])
+    shm = shared_memory.SharedMemory(create=True, size=max(len(COLUMNS) * length * 8, 1))
+    try:
+        matrix = np.ndarray((len(COLUMNS), length), dtype=np.float64, buffer=shm.buf)
+        for i, name in enumerate(COLUMNS):
+            matrix[i] = candles[name]
+        pool_size = workers or int(os.getenv("SWEEP_WORKERS", str(os.cpu_count() or 2)))
+        with ProcessPoolExecutor(
+            max_workers=pool_size,
+            initializer=_init_worker,
+            initargs=(shm.name, length, base_config, fee_bps)
+        ) as pool:
+            # Points sharing indicator periods go to the same chunk, so worker caches hit
+            ordered = sorted(points, key=lambda p: json.dumps({k: v for k, v in p.items() if k.startswith("indicators.")}, sort_keys=True))
+            chunk = max(1, len(ordered) // (pool_size * 4))
+            outcomes = list(pool.map(_run_point, ordered, chunksize=chunk))
+        del matrix
+    finally:
+        shm.close()
+        shm.unlink()
+
+    results = []
+    for overrides, report in outcomes:
+        if "error" in report:
+            results.append({"params": overrides, "error": report["error"], "score": float("-inf")})
+            continue
+        eligible = report["trades"] >= min_trades
+        results.append({
+            "params": overrides,
+            "score": score(report, rank_by) if eligible else float("-inf"),
+            "report": report,
+        })
+    results.sort(key=lambda r: r["score"], reverse=True)
+    return results
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Parallel TRADING_CONFIG sweep over the backtester")
+    parser.add_argument("path", help="CSV or Parquet file of 5m candles")
+    parser.add_argument("-p", "--param", action="append", default=[], help="dotted.path=v1,v2 or lo:hi")
+    parser.add_argument("--grid-file", help='JSON object {"dotted.path": [values] | {"min": lo, "max": hi}}')
+    parser.add_argument("--samples", type=int, help="random samples instead of the full grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--rank-by", choices=("sharpe", "calmar", "pnl"), default="sharpe")
+    parser.add_argument("--min-trades", type=int, default=20)
+    parser.add_argument("--fee-bps", type=float)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", help="write all ranked results as JSON")
+    args = parser.parse_args()
+
+    space = parse_params(args.param)
+    if args.grid_file:
+        with open(args.grid_file) as fh:
+            for path, values in json.load(fh).items():
+                space[path] = (values["min"], values["max"]) if isinstance(values, dict) else values
+    if not space:
+        parser.error("no parameters to sweep (use -p or --grid-file)")
+
+    from app import TRADING_CONFIG
+
+    candles = load_ohlcv(args.path)
+    points = expand_space(space, args.samples, args.seed, TRADING_CONFIG)
+    started = time.perf_counter()
+    results = sweep(candles, TRADING_CONFIG, points, args.workers, args.rank_by, args.min_trades, args.fee_bps)
+    elapsed = time.perf_counter() - started
+
+    print(f"🔬 {len(points)} backtests on {len(candles['close'])} candles in {elapsed:.1f}s (ranked by {args.rank_by})")
+    for rank, result in enumerate(results[:args.top], 1):
+        if "error" in result:
+            print(f"   {rank:>2}. ❌ {result['params']}: {result['error']}")
+            continue
+        report = result["report"]
+        print(f"   {rank:>2}. score {result['score']:.3f} | PnL ${report['pnl']:.2f} | DD {report['max_drawdown_pct']:.1f}% "
+              f"| hit {report['hit_rate']*100:.0f}% | {report['trades']} trades | {result['params']}")
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2, default=float)
+
+
+if __name__ == "__main__":
+    main()
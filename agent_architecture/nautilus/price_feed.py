@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+HEDGED SUI PRICE FEED
+=====================
+Queries Binance, Coinbase and CoinGecko over pooled sessions. The fastest
+source (by observed latency and error rate) is asked first; if it has not
+answered after PRICE_HEDGE_DELAY_MS the next one is asked too, and so on.
+The first plausible answer wins, after a short PRICE_CROSSCHECK_MS window in
+which answers already in flight are compared: with three answers, a price
+more than PRICE_MAX_DEVIATION_PCT from the median is rejected as an outlier
+(and counted against its source). Two disagreeing answers are arbitrated by
+the last accepted price while it is younger than PRICE_REFERENCE_TTL, and by
+a third source otherwise. Every PRICE_CROSSCHECK_EVERY fetches all sources
+are asked at once, so rankings and cross-checks never go stale.
+"""
+
+import logging
+import os
+import queue
+import statistics
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+SOURCES: List[Dict[str, Any]] = [
+    {
+        "name": "binance",
+        "url": "https://api.binance.com/api/v3/ticker/24hr",
+        "params": {"symbol": "SUIUSDT"},
+        "parser": lambda r: {
+            "price": float(r["lastPrice"]),
+            "change_24h": float(r["priceChangePercent"]),
+            "volume_24h": float(r["quoteVolume"])
+        }
+    },
+    {
+        "name": "coinbase",
+        "url": "https://api.coinbase.com/v2/prices/SUI-USD/spot",
+        "params": {},
+        "parser": lambda r: {
+            "price": float(r["data"]["amount"]),
+            "change_24h": None,  # Coinbase ne donne pas le changement dans cet endpoint
+            "volume_24h": None
+        }
+    },
+    {
+        "name": "coingecko",
+        "url": "https://api.coingecko.com/api/v3/simple/price",
+        "params": {
+            "ids": "sui",
+            "vs_currencies": "usd",
+            "include_24hr_change": "true",
+            "include_24hr_vol": "true"
+        },
+        "parser": lambda r: {
+            "price": float(r["sui"]["usd"]),
+            "change_24h": r["sui"].get("usd_24h_change", 0),
+            "volume_24h": r["sui"].get("usd_24h_vol", 0)
+        }
+    }
+]
+
+
+class SourceStats:
+    """EWMA latency / error rate of one source; lower `cost` is asked first."""
+
+    ALPHA = 0.2
+
+    def __init__(self, name: str, priority: int) -> None:
+        self.name = name
+        self.priority = priority
+        self.latency_ms: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.outliers = 0
+
+    def record(self, latency_ms: float, ok: bool) -> None:
+        self.requests += 1
+        if ok:
+            self.latency_ms = latency_ms if self.latency_ms is None else \
+                self.latency_ms + self.ALPHA * (latency_ms - self.latency_ms)
+        else:
+            self.errors += 1
+        self.error_rate += self.ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+
+    @property
+    def cost(self) -> float:
+        # Unmeasured sources keep their configured order, ahead of slow ones
+        latency = self.latency_ms if self.latency_ms is not None else 100.0 * (self.priority + 1)
+        return latency * (1 + 4 * self.error_rate) + 50.0 * min(self.outliers, 10)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "requests": self.requests,
+            "errors": self.errors,
+            "outliers": self.outliers,
+        }
+
+
+class PriceFeed:
+    def __init__(
+        self,
+        sources: Optional[List[Dict[str, Any]]] = None,
+        hedge_delay_ms: Optional[float] = None,
+        crosscheck_ms: Optional[float] = None,
+        max_deviation_pct: Optional[float] = None,
+        timeout: Optional[float] = None,
+        reference_ttl: Optional[float] = None
+    ) -> None:
+        self.sources = sources or SOURCES
+        self.hedge_delay = (hedge_delay_ms or float(os.getenv("PRICE_HEDGE_DELAY_MS", "300"))) / 1000
+        self.crosscheck = (crosscheck_ms or float(os.getenv("PRICE_CROSSCHECK_MS", "150"))) / 1000
+        self.max_deviation = (max_deviation_pct or float(os.getenv("PRICE_MAX_DEVIATION_PCT", "1.0"))) / 100
+        self.timeout = timeout or float(os.getenv("PRICE_FETCH_TIMEOUT", "8"))
+        self.max_jump = float(os.getenv("PRICE_MAX_JUMP_PCT", "20")) / 100
+        self.crosscheck_every = int(os.getenv("PRICE_CROSSCHECK_EVERY", "5"))
+        # Beyond this age the last price no longer vetoes jumps or arbitrates sources
+        self.reference_ttl = reference_ttl or float(os.getenv("PRICE_REFERENCE_TTL", os.getenv("MARKET_TTL", "30")))
+        self._fetches = 0
+
+        self.stats = {src["name"]: SourceStats(src["name"], i) for i, src in enumerate(self.sources)}
+        self.last_price: Optional[float] = None
+        self.last_price_at = 0.0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=len(self.sources) * 2, thread_name_prefix="price")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.sources), pool_maxsize=4)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": "Chimera-Nautilus-Agent/1.0"})
+
+    def ranked_sources(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return sorted(self.sources, key=lambda src: self.stats[src["name"]].cost)
+
+    def _query(self, source: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        parsed = None
+        try:
+            response = self.session.get(source["url"], params=source["params"], timeout=self.timeout)
+            response.raise_for_status()
+            parsed = source["parser"](response.json())
+            if not self._plausible(parsed["price"]):
+                logger.warning("Prix suspect depuis %s: $%s", source["name"], parsed["price"])
+                parsed = None
+        except Exception as exc:
+            logger.debug("price source %s failed: %s", source["name"], exc)
+        latency_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.stats[source["name"]].record(latency_ms, parsed is not None)
+        if parsed is not None:
+            parsed["source"] = source["name"]
+            parsed["latency_ms"] = latency_ms
+        return parsed
+
+    def _reference(self) -> Optional[float]:
+        """Last accepted price, or None once it is older than the reference TTL."""
+        if self.last_price is None or time.monotonic() - self.last_price_at > self.reference_ttl:
+            return None
+        return self.last_price
+
+    def _plausible(self, price: float) -> bool:
+        if not 0 < price <= 100:
+            return False
+        reference = self._reference()
+        return reference is None or abs(price / reference - 1) <= self.max_jump
+
+    def _disagree(self, a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+        return abs(a["price"] / b["price"] - 1) > self.max_deviation
+
+    def _undecided(self, answers: List[Dict[str, Any]]) -> bool:
+        """Two disagreeing answers and no fresh reference: a third source has to decide."""
+        return len(answers) == 2 and self._disagree(*answers) and self._reference() is None
+
+    def fetch(self) -> Optional[Dict[str, Any]]:
+        """Best current price: {price, change_24h, volume_24h, source, latency_ms, confirmations} or None."""
+        order = self.ranked_sources()
+        full_round = self._fetches % self.crosscheck_every == 0
+        self._fetches += 1
+        crosscheck = self.hedge_delay * len(order) if full_round else self.crosscheck
+        done: "queue.Queue[Future]" = queue.Queue()
+        launched = 0
+        finished = 0
+        answers: List[Dict[str, Any]] = []
+        started = time.monotonic()
+        deadline = started + self.timeout
+        next_hedge = started
+        settle_at: Optional[float] = None
+
+        def launch() -> None:
+            nonlocal launched, next_hedge
+            future = self._pool.submit(self._query, order[launched])
+            future.add_done_callback(done.put)
+            launched += 1
+            next_hedge = time.monotonic() + self.hedge_delay
+
+        while True:
+            now = time.monotonic()
+            tiebreak = self._undecided(answers)
+            while launched < len(order) and (full_round or (tiebreak and finished == launched) or (
+                    not answers and (now >= next_hedge or finished == launched))):
+                launch()
+                if not full_round:
+                    break
+            if settle_at is not None and (now >= settle_at or finished == launched) \
+                    and not (tiebreak and finished < launched):
+                break
+            if now >= deadline or (finished == launched == len(order)):
+                break
+            wake = min(
+                deadline,
+                settle_at if settle_at is not None and not tiebreak else deadline,
+                next_hedge if not answers and launched < len(order) else deadline
+            )
+            try:
+                future = done.get(timeout=max(wake - now, 0.001))
+            except queue.Empty:
+                continue
+            finished += 1
+            result = future.result()
+            if result is not None:
+                answers.append(result)
+                if settle_at is None:
+                    settle_at = time.monotonic() + crosscheck
+
+        if not answers:
+            return None
+        accepted = self._reject_outliers(answers)
+        best = dict(accepted[0])
+        best["confirmations"] = len(accepted)
+        # Sources without 24h stats (Coinbase) borrow them from a confirming source
+        for other in accepted[1:]:
+            for key in ("change_24h", "volume_24h"):
+                if best.get(key) is None and other.get(key) is not None:
+                    best[key] = other[key]
+        best["change_24h"] = best.get("change_24h") or 0
+        best["volume_24h"] = best.get("volume_24h") or 0
+        self.last_price = best["price"]
+        self.last_price_at = time.monotonic()
+        return best
+
+    def _reject_outliers(self, answers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if len(answers) < 3:
+            reference = self._reference()
+            if len(answers) == 2 and self._disagree(*answers):
+                if reference is None:
+                    return answers[:1]  # no third answer and no reference: first answer, unconfirmed
+                # Two disagreeing sources: keep the one consistent with the last price
+                keep = min(answers, key=lambda x: abs(x["price"] - reference))
+                self._mark_outlier(answers[1] if keep is answers[0] else answers[0])
+                return [keep]
+            return answers
+        median = statistics.median(a["price"] for a in answers)
+        kept = []
+        for answer in answers:
+            if abs(answer["price"] / median - 1) > self.max_deviation:
+                self._mark_outlier(answer)
+            else:
+                kept.append(answer)
+        return kept or answers
+
+    def _mark_outlier(self, answer: Dict[str, Any]) -> None:
+        logger.warning("Prix %s rejeté (outlier): $%s", answer["source"], answer["price"])
+        with self._lock:
+            self.stats[answer["source"]].outliers += 1
+
+    def stats_snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self.stats.items()}
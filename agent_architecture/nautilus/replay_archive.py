@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+PACKED REPLAY ARCHIVES
+======================
+Battle logs are appended to a local archive file and uploaded to Walrus as
+one blob per REPLAY_ARCHIVE_SIZE battles (or every REPLAY_ARCHIVE_MAX_AGE
+seconds), instead of one upload per battle.
+
+Archive blob layout:
+    [record 0][record 1]...[index JSON][footer]
+    record = zlib-compressed JSON battle log
+    index  = {"format": "chimera-replay-archive-v1",
+              "replays": {"<key>": [offset, length, battle_log_hash], ...}}
+    footer = b"CHRA" | index offset u64 | index length u32   (big-endian, 16 bytes)
+    key    = BattleRequest request_id, or the battle log hash when there is none
+
+A replay reference is {"archive": <id>, "offset": int, "length": int}. The
+archive id is "pending_archive_<...>" until the blob is stored, then it
+resolves to the Walrus blob id (archives.jsonl in REPLAY_ARCHIVE_DIR).
+Readers slice one record out of a local memory-mapped copy, or fetch just
+that byte range from the aggregator.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMAT = "chimera-replay-archive-v1"
+PENDING_PREFIX = "pending_archive_"
+_FOOTER = struct.Struct(">4sQI")
+_FOOTER_MAGIC = b"CHRA"
+
+DEFAULT_PUBLISHER_URL = "https://publisher.walrus-testnet.walrus.space/v1/store"
+DEFAULT_AGGREGATOR_URL = "https://aggregator.walrus-testnet.walrus.space/v1"
+
+
+def _session() -> requests.Session:
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+    session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+    return session
+
+
+def _load_resolved(path: Path) -> Dict[str, str]:
+    resolved: Dict[str, str] = {}
+    if path.exists():
+        for line in path.read_text().splitlines():
+            try:
+                entry = json.loads(line)
+                resolved[entry["archive"]] = entry["blob_id"]
+            except (ValueError, KeyError):
+                continue
+    return resolved
+
+
+class _OpenArchive:
+    """Archive file being filled: data file + JSONL sidecar index, flocked by its writer."""
+
+    def __init__(self, directory: Path, archive_id: str) -> None:
+        self.archive_id = archive_id
+        self.data_path = directory / f"{archive_id}.open"
+        self.index_path = directory / f"{archive_id}.idx"
+        self.data = self.data_path.open("ab")
+        fcntl.flock(self.data, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.index = self.index_path.open("a")
+        self.size = self.data.tell()
+        with self.index_path.open() as existing:
+            self.count = sum(1 for _ in existing)
+        self.created = time.time()
+
+    def append(self, key: str, record: bytes, log_hash: Optional[str]) -> Dict[str, Any]:
+        offset = self.size
+        self.data.write(record)
+        self.data.flush()
+        self.index.write(json.dumps([key, offset, len(record), log_hash]) + "\n")
+        self.index.flush()
+        self.size += len(record)
+        self.count += 1
+        return {"archive": self.archive_id, "offset": offset, "length": len(record)}
+
+
+def _seal(data_path: Path, index_path: Path) -> Path:
+    """Append index + footer to an open archive; returns the sealed file path."""
+    replays = {}
+    for line in index_path.read_text().splitlines():
+        try:
+            key, offset, length, log_hash = json.loads(line)
+        except ValueError:
+            continue
+        replays[str(key)] = [offset, length, log_hash]
+    index = json.dumps({"format": ARCHIVE_FORMAT, "replays": replays}, sort_keys=True).encode()
+    with data_path.open("r+b") as fh:
+        fh.seek(0, os.SEEK_END)
+        index_offset = fh.tell()
+        fh.write(index + _FOOTER.pack(_FOOTER_MAGIC, index_offset, len(index)))
+    sealed = data_path.with_suffix(".sealed")
+    data_path.replace(sealed)
+    index_path.unlink(missing_ok=True)
+    return sealed
+
+
+class ReplayArchiveWriter:
+    """Appends battle logs to archives and uploads sealed archives in the background."""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        publisher_url: Optional[str] = None,
+        max_replays: Optional[int] = None,
+        max_age: Optional[float] = None,
+        max_backoff: Optional[float] = None
+    ) -> None:
+        self.directory = Path(directory or os.getenv("REPLAY_ARCHIVE_DIR", ".replay_archives"))
+        self.publisher_url = publisher_url or os.getenv("WALRUS_PUBLISHER_URL", DEFAULT_PUBLISHER_URL)
+        self.max_replays = max_replays or int(os.getenv("REPLAY_ARCHIVE_SIZE", "2048"))
+        self.max_age = max_age or float(os.getenv("REPLAY_ARCHIVE_MAX_AGE", "300"))
+        self.max_backoff = max_backoff or float(os.getenv("WALRUS_MAX_BACKOFF", "300"))
+        self.timeout = float(os.getenv("WALRUS_TIMEOUT", "30"))
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.resolved_file = self.directory / "archives.jsonl"
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._seq = 0
+        self._current: Optional[_OpenArchive] = None
+        self.session = _session()
+        self._recover_orphans()
+        self._thread = threading.Thread(target=self._uploader_loop, name="replay-archiver", daemon=True)
+        self._thread.start()
+
+    def append(self, battle_log: List[Any], key: Any = None, battle_log_hash: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Archive one battle log; returns its replay reference right away.
+        Without a key (no on-chain request), the replay is indexed by its log
+        hash, so repeat matchups between the same monsters never collide.
+        """
+        serialized = json.dumps(battle_log, separators=(",", ":")).encode()
+        if key is None:
+            key = battle_log_hash or hashlib.sha256(serialized).hexdigest()
+        record = zlib.compress(serialized, 6)
+        with self._lock:
+            if self._current is None:
+                self._seq += 1
+                archive_id = f"{PENDING_PREFIX}{int(time.time())}_{os.getpid()}_{self._seq}"
+                self._current = _OpenArchive(self.directory, archive_id)
+            ref = self._current.append(str(key), record, battle_log_hash)
+            if self._current.count >= self.max_replays:
+                self._seal_current()
+        return ref
+
+    def flush(self) -> None:
+        """Seal the current archive now (e.g. on shutdown) and let the uploader pick it up."""
+        with self._lock:
+            if self._current is not None and self._current.count:
+                self._seal_current()
+
+    def resolve(self, archive_id: str) -> Optional[str]:
+        if not archive_id.startswith(PENDING_PREFIX):
+            return archive_id
+        return _load_resolved(self.resolved_file).get(archive_id)
+
+    # --- internals ---
+
+    def _seal_current(self) -> None:
+        current, self._current = self._current, None
+        current.index.close()
+        _seal(current.data_path, current.index_path)  # still under our flock
+        current.data.close()
+        self._wake.set()
+
+    def _recover_orphans(self) -> None:
+        """Seal archives left open by writers that died (their flock is gone)."""
+        for data_path in self.directory.glob(f"{PENDING_PREFIX}*.open"):
+            try:
+                fh = data_path.open("r+b")
+            except FileNotFoundError:
+                continue  # sealed by its writer meanwhile
+            with fh:
+                try:
+                    fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # still owned by a live writer process
+                if not data_path.exists():
+                    continue
+                _seal(data_path, data_path.with_suffix(".idx"))
+                logger.info("Replay archive %s recovered and sealed", data_path.stem)
+
+    def _uploader_loop(self) -> None:
+        backoff = 1.0
+        while True:
+            self._wake.wait(min(self.max_age, 30))
+            self._wake.clear()
+            with self._lock:
+                if self._current is not None and time.time() - self._current.created >= self.max_age:
+                    self._seal_current()
+            for sealed in sorted(self.directory.glob(f"{PENDING_PREFIX}*.sealed")):
+                try:
+                    self._upload(sealed)
+                    backoff = 1.0
+                except Exception as exc:
+                    logger.warning("Replay archive upload failed (%s) - retrying in %.0fs", exc, backoff)
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+                    self._wake.set()
+                    break
+
+    def _upload(self, sealed: Path) -> None:
+        from walrus_queue import parse_store_response
+        with sealed.open("rb") as fh:
+            response = self.session.put(
+                self.publisher_url, data=fh, timeout=self.timeout,
+                headers={"Content-Type": "application/octet-stream"}
+            )
+        response.raise_for_status()
+        blob_id = parse_store_response(response.json())
+        if not blob_id:
+            raise RuntimeError(f"unexpected Walrus response: {response.text[:200]}")
+        with self.resolved_file.open("a") as fh:
+            fh.write(json.dumps({"archive": sealed.stem, "blob_id": blob_id}) + "\n")
+        # Keep the sealed file as the local copy, addressed by its blob id
+        sealed.replace(self.directory / f"{blob_id}.archive")
+        logger.info("Replay archive %s stored as %s", sealed.stem, blob_id)
+
+
+class ReplayArchiveReader:
+    """Random-access reads of single replays from local mmaps or aggregator range requests."""
+
+    def __init__(self, directory: Optional[str] = None, aggregator_url: Optional[str] = None) -> None:
+        self.directory = Path(directory or os.getenv("REPLAY_ARCHIVE_DIR", ".replay_archives"))
+        self.aggregator_url = (aggregator_url or os.getenv("WALRUS_AGGREGATOR_URL", DEFAULT_AGGREGATOR_URL)).rstrip("/")
+        self.timeout = float(os.getenv("WALRUS_TIMEOUT", "30"))
+        self.session = _session()
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._lock = threading.Lock()
+
+    def read(self, ref: Dict[str, Any]) -> List[Any]:
+        """Battle log for a replay reference."""
+        return json.loads(zlib.decompress(self.read_range(ref["archive"], ref["offset"], ref["length"])))
+
+    def read_range(self, archive_id: str, offset: int, length: int) -> bytes:
+        local = self._local_map(archive_id)
+        if local is not None:
+            return local[offset:offset + length]
+        blob_id = self._resolve(archive_id)
+        if blob_id is None:
+            raise LookupError(f"replay archive {archive_id} is not uploaded yet")
+        response = self.session.get(
+            f"{self.aggregator_url}/blobs/{blob_id}",
+            headers={"Range": f"bytes={offset}-{offset + length - 1}"},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        # Aggregators without range support answer 200 with the whole blob
+        return response.content if response.status_code == 206 else response.content[offset:offset + length]
+
+    def read_index(self, archive_id: str) -> Dict[str, Any]:
+        """Index of a sealed archive (footer, then index, both as range reads)."""
+        local = self._local_map(archive_id)
+        if local is not None:
+            _, index_offset, index_length = _FOOTER.unpack(local[-_FOOTER.size:])
+            return json.loads(local[index_offset:index_offset + index_length])
+        blob_id = self._resolve(archive_id)
+        if blob_id is None:
+            raise LookupError(f"replay archive {archive_id} is not uploaded yet")
+        response = self.session.get(
+            f"{self.aggregator_url}/blobs/{blob_id}",
+            headers={"Range": f"bytes=-{_FOOTER.size}"},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        magic, index_offset, index_length = _FOOTER.unpack(response.content[-_FOOTER.size:])
+        if magic != _FOOTER_MAGIC:
+            raise ValueError(f"blob {blob_id} is not a replay archive")
+        return json.loads(self.read_range(blob_id, index_offset, index_length))
+
+    def _resolve(self, archive_id: str) -> Optional[str]:
+        if not archive_id.startswith(PENDING_PREFIX):
+            return archive_id
+        return _load_resolved(self.directory / "archives.jsonl").get(archive_id)
+
+    def _local_map(self, archive_id: str) -> Optional[mmap.mmap]:
+        with self._lock:
+            if archive_id in self._maps:
+                return self._maps[archive_id]
+            blob_id = self._resolve(archive_id)
+            candidates = [self.directory / f"{blob_id}.archive"] if blob_id else []
+            candidates += [self.directory / f"{archive_id}.sealed", self.directory / f"{archive_id}.open"]
+            for path in candidates:
+                if path.exists() and path.stat().st_size:
+                    with path.open("rb") as fh:
+                        mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                    if path.suffix != ".open":  # open archives still grow - map per read
+                        self._maps[archive_id] = mapped
+                    return mapped
+        return None
+
+
+_writer_instance: Optional[ReplayArchiveWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_replay_archive() -> ReplayArchiveWriter:
+    """Get or create the process-wide replay archive writer"""
+    global _writer_instance
+    with _writer_lock:
+        if _writer_instance is None:
+            _writer_instance = ReplayArchiveWriter()
+        return _writer_instance
+
+
+def main() -> None:
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Usage: python3 replay_archive.py <archive_id|blob_id> <replay key | --index>")
+        sys.exit(1)
+    reader = ReplayArchiveReader()
+    index = reader.read_index(sys.argv[1])
+    if sys.argv[2] == "--index":
+        print(f"📦 {len(index['replays'])} replays in {sys.argv[1]}")
+        return
+    offset, length, log_hash = index["replays"][sys.argv[2]]
+    battle_log = reader.read({"archive": sys.argv[1], "offset": offset, "length": length})
+    print(f"🎬 Replay {sys.argv[2]}: {len(battle_log)} turns (log hash {log_hash})")
+    print(json.dumps(battle_log, indent=2))
+
+
+if __name__ == "__main__":
+    main()
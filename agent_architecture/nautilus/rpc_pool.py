@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+SHARED SUI RPC POOL
+===================
+One pooled HTTP session for every Sui JSON-RPC caller in the process
+(battle listener, settlement tracker, monster loading, orchestrator), so
+tasks running side by side in the agent runtime reuse keep-alive
+connections instead of opening one per call. SUI_RPC_POOL_SIZE caps the
+connections kept per host.
+"""
+
+import os
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_session: Optional[requests.Session] = None
+_lock = threading.Lock()
+
+
+def get_rpc_session() -> requests.Session:
+    global _session
+    with _lock:
+        if _session is None:
+            size = int(os.getenv("SUI_RPC_POOL_SIZE", "8"))
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
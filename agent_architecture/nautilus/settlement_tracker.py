@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""Background settlement submission with batched on-chain confirmation tracking."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from battle_metrics import get_metrics
+from rpc_pool import get_rpc_session
+
+logger = logging.getLogger(__name__)
+
+# Settlement lifecycle states
+PENDING = "pending"
+SUBMITTED = "submitted"
+CONFIRMED = "confirmed"
+TEE_ONLY = "tee_only"
+FAILED = "failed"
+ESCALATED = "escalated"
+
+FINAL_STATES = {CONFIRMED, TEE_ONLY, ESCALATED}
+
+
+def _normalize_rpc_url(url: Optional[str]) -> str:
+    base = url or "https://fullnode.testnet.sui.io"
+    return base if base.endswith("/") else f"{base}/"
+
+
+def _extract_digest(response: Any) -> Optional[str]:
+    """Find the transaction digest in a Nimbus bridge response, whatever its nesting."""
+    if not isinstance(response, dict):
+        return None
+    for key in ("digest", "txDigest", "transactionDigest"):
+        value = response.get(key)
+        if isinstance(value, str) and value:
+            return value
+    for key in ("result", "transaction", "data"):
+        nested = _extract_digest(response.get(key))
+        if nested:
+            return nested
+    return None
+
+
+class SettlementHandle:
+    """Caller-side view of one background settlement.
+
+    ``future`` resolves with the final settlement record once the transaction is
+    confirmed, recorded as TEE-only, or escalated after exhausting retries.
+    """
+
+    def __init__(self, result: Dict[str, Any]) -> None:
+        self.result = result
+        self.request_id = result.get("request_id")
+        self.future: Future = Future()
+        self.status = PENDING
+        self.digest: Optional[str] = None
+        self.attempts = 0
+        self.submitted_at = 0.0
+        self.first_submitted_at = 0.0
+        self.error: Optional[str] = None
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def wait(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self.future.result(timeout=timeout)
+
+    def record(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "winner_id": self.result.get("winner_id"),
+            "loser_id": self.result.get("loser_id"),
+            "xp_gain": self.result.get("xp_gain"),
+            "replay": self.result.get("replay"),
+            # Enclave proof, re-checked by batch_verifier.py
+            "payload": self.result.get("payload"),
+            "signature": self.result.get("signature"),
+            "enclave_public_key": self.result.get("enclave_public_key"),
+            "enclave_attestation_blob_id": self.result.get("enclave_attestation_blob_id"),
+            "signature_batch": self.result.get("signature_batch"),
+            "status": self.status,
+            "digest": self.digest,
+            "attempts": self.attempts,
+            "error": self.error,
+            "updated_at": int(time.time()),
+        }
+
+
+class SettlementTracker:
+    """Submits settlements on a worker pool and confirms them in RPC batches.
+
+    Submissions return a :class:`SettlementHandle` immediately. A single tracker
+    thread polls ``sui_multiGetTransactionBlocks`` for every outstanding digest,
+    resubmits transactions that fail or stay unseen for ``stuck_after`` seconds,
+    and escalates once ``max_attempts`` is reached. Every status transition is
+    appended to the local results file (JSON lines, last record wins).
+
+    settle_battle is not idempotent on-chain, so before a retry the tracker
+    looks for a ``BattleEvent`` already emitted for the request (a "stuck"
+    transaction may land late) and confirms it instead of settling twice.
+    """
+
+    def __init__(
+        self,
+        rpc_url: Optional[str] = None,
+        max_workers: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        stuck_after: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        results_path: Optional[str] = None,
+        battle_event_type: Optional[str] = None
+    ) -> None:
+        self.rpc_url = _normalize_rpc_url(rpc_url or os.getenv("SUI_RPC_URL"))
+        self.max_workers = max_workers or int(os.getenv("SETTLEMENT_WORKERS", "4"))
+        self.poll_interval = poll_interval or float(os.getenv("SETTLEMENT_POLL_INTERVAL", "3"))
+        self.batch_size = batch_size or int(os.getenv("SETTLEMENT_BATCH_SIZE", "50"))
+        self.stuck_after = stuck_after or float(os.getenv("SETTLEMENT_STUCK_AFTER", "60"))
+        self.max_attempts = max_attempts or int(os.getenv("SETTLEMENT_MAX_ATTEMPTS", "3"))
+        results_default = os.getenv("SETTLEMENT_RESULTS_FILE", ".battle_results.jsonl")
+        self.results_file = Path(results_path or results_default)
+        package_id = os.getenv("BATTLE_PACKAGE_ID")
+        self.battle_event_type = battle_event_type or os.getenv("BATTLE_EVENT_TYPE") or (
+            f"{package_id}::monster_battle::BattleEvent" if package_id else None
+        )
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="settle")
+        self._lock = threading.Lock()
+        self._tracked: Dict[str, SettlementHandle] = {}
+        self._settle_fns: Dict[int, Callable[[], Any]] = {}
+        self._open: Dict[int, SettlementHandle] = {}
+        # Held while appending to the results file; hold it to rewrite the file safely
+        self.results_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- submission ---
+
+    def submit(self, result: Dict[str, Any], settle_fn: Callable[[], Any]) -> SettlementHandle:
+        """Queue ``settle_fn`` in the background and return a handle right away."""
+        handle = SettlementHandle(result)
+        with self._lock:
+            self._settle_fns[id(handle)] = settle_fn
+            self._open[id(handle)] = handle
+        self._ensure_thread()
+        self._executor.submit(self._attempt, handle)
+        return handle
+
+    def _attempt(self, handle: SettlementHandle) -> None:
+        settle_fn = self._settle_fns.get(id(handle))
+        if handle.attempts:
+            # A previous attempt may have landed after all: never settle a request twice
+            try:
+                settled_digest = self._settled_on_chain(handle)
+            except Exception as exc:
+                handle.attempts += 1
+                self._retry_or_escalate(handle, f"could not check on-chain settlement ({exc})")
+                return
+            if settled_digest:
+                logger.info("Request %s already settled on-chain (%s)", handle.request_id, settled_digest)
+                handle.digest, handle.error = settled_digest, None
+                self._finish(handle, CONFIRMED)
+                return
+
+        handle.attempts += 1
+        handle.submitted_at = time.time()
+        handle.error = None
+        handle.first_submitted_at = handle.first_submitted_at or handle.submitted_at
+        try:
+            with get_metrics().timed("settle"):
+                response = settle_fn() if settle_fn else None
+        except Exception as exc:
+            response = None
+            handle.error = str(exc)
+
+        if response is None:
+            if handle.error is None:
+                # timed() already counted the failure when settle_fn raised
+                get_metrics().inc("battle_failures_total", stage="settle")
+            self._retry_or_escalate(handle, handle.error or "settlement call returned no result")
+            return
+
+        digest = _extract_digest(response)
+        if not digest:
+            if isinstance(response, dict) and response.get("status") == "success_tee_only":
+                # Deliberately no transaction (NIMBUS_BRIDGE_URL unset): the TEE proof is the result
+                self._finish(handle, TEE_ONLY)
+            else:
+                self._retry_or_escalate(handle, "bridge response carried no transaction digest")
+            return
+
+        handle.digest = digest
+        handle.status = SUBMITTED
+        with self._lock:
+            self._tracked[digest] = handle
+        self._write_record(handle)
+
+    def _retry_or_escalate(self, handle: SettlementHandle, reason: str) -> None:
+        handle.error = reason
+        if handle.attempts < self.max_attempts:
+            logger.warning(
+                "Settlement for request %s failed (attempt %s/%s): %s - retrying",
+                handle.request_id, handle.attempts, self.max_attempts, reason
+            )
+            handle.status = FAILED
+            self._write_record(handle)
+            backoff = min(2 ** handle.attempts, 30)
+            timer = threading.Timer(backoff, lambda: self._executor.submit(self._attempt, handle))
+            timer.daemon = True
+            timer.start()
+            return
+        logger.error(
+            "🚨 Settlement for request %s escalated after %s attempts: %s",
+            handle.request_id, handle.attempts, reason
+        )
+        self._finish(handle, ESCALATED)
+
+    def _finish(self, handle: SettlementHandle, status: str) -> None:
+        handle.status = status
+        get_metrics().inc("battle_settlements_total", status=status)
+        with self._lock:
+            self._settle_fns.pop(id(handle), None)
+            self._open.pop(id(handle), None)
+            if handle.digest:
+                self._tracked.pop(handle.digest, None)
+        handle.result["settlement_status"] = status
+        handle.result["settlement_digest"] = handle.digest
+        record = self._write_record(handle)
+        if not handle.future.done():
+            handle.future.set_result(record)
+
+    # --- confirmation tracking ---
+
+    def _ensure_thread(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._track_loop, name="settlement-tracker", daemon=True)
+        self._thread.start()
+
+    def _track_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as exc:
+                logger.exception("Settlement tracker iteration failed (%s)", exc)
+            self._stop.wait(self.poll_interval)
+
+    def _rpc_call(self, method: str, params: list[Any]) -> Any:
+        payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        response = get_rpc_session().post(self.rpc_url, json=payload, timeout=20)
+        response.raise_for_status()
+        data = response.json()
+        if "error" in data:
+            raise RuntimeError(data["error"])
+        return data.get("result", [])
+
+    def _settled_on_chain(self, handle: SettlementHandle) -> Optional[str]:
+        """Digest of a BattleEvent emitted for ``handle.request_id`` since its first submission."""
+        if handle.request_id is None or not self.battle_event_type or not handle.first_submitted_at:
+            return None
+        since_ms = int(handle.first_submitted_at * 1000) - 60_000  # fullnode / local clock skew
+        cursor = None
+        while True:
+            page = self._rpc_call("suix_queryEvents", [{"MoveEventType": self.battle_event_type}, cursor, 50, True])
+            for entry in page.get("data", []):
+                if int(entry.get("timestampMs") or 0) < since_ms:
+                    return None
+                parsed = entry.get("parsedJson") or {}
+                if str(parsed.get("request_id")) == str(handle.request_id):
+                    return (entry.get("id") or {}).get("txDigest") or "unknown"
+            cursor = page.get("nextCursor")
+            if not page.get("hasNextPage") or cursor is None:
+                return None
+
+    def poll_once(self) -> None:
+        """Check every outstanding digest, one RPC call per ``batch_size`` digests."""
+        with self._lock:
+            digests = list(self._tracked.keys())
+        for start in range(0, len(digests), self.batch_size):
+            batch = digests[start:start + self.batch_size]
+            blocks = self._rpc_call("sui_multiGetTransactionBlocks", [batch, {"showEffects": True}])
+            seen = {}
+            for block in blocks or []:
+                if isinstance(block, dict) and block.get("digest"):
+                    seen[block["digest"]] = block
+            for digest in batch:
+                with self._lock:
+                    handle = self._tracked.get(digest)
+                if handle:
+                    self._apply_status(handle, seen.get(digest))
+
+    def _apply_status(self, handle: SettlementHandle, block: Optional[Dict[str, Any]]) -> None:
+        if block is None:
+            if time.time() - handle.submitted_at > self.stuck_after:
+                with self._lock:
+                    self._tracked.pop(handle.digest, None)
+                self._retry_or_escalate(handle, f"transaction {handle.digest} not seen after {self.stuck_after:.0f}s")
+            return
+        status = ((block.get("effects") or {}).get("status") or {}).get("status")
+        if status == "success":
+            logger.info("✅ Settlement confirmed for request %s (%s)", handle.request_id, handle.digest)
+            self._finish(handle, CONFIRMED)
+        elif status == "failure":
+            with self._lock:
+                self._tracked.pop(handle.digest, None)
+            error = ((block.get("effects") or {}).get("status") or {}).get("error", "execution failure")
+            self._retry_or_escalate(handle, error)
+
+    # --- persistence / lifecycle ---
+
+    def _write_record(self, handle: SettlementHandle) -> Dict[str, Any]:
+        record = handle.record()
+        try:
+            with self.results_lock, self.results_file.open("a") as fh:
+                fh.write(json.dumps(record) + "\n")
+        except Exception as exc:
+            logger.warning("Could not persist settlement record %s (%s)", self.results_file, exc)
+        return record
+
+    def pending(self) -> List[SettlementHandle]:
+        with self._lock:
+            return list(self._tracked.values())
+
+    def wait_all(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Block until every submitted settlement reached a final state."""
+        with self._lock:
+            handles = list(self._open.values())
+        return [handle.wait(timeout) for handle in handles]
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._stop.set()
+        self._executor.shutdown(wait=wait)
+        if self._thread and wait:
+            self._thread.join(timeout=self.poll_interval + 1)
+
+
+# Global tracker instance (singleton)
+_tracker_instance = None
+
+def get_settlement_tracker() -> SettlementTracker:
+    """Get or create the global settlement tracker"""
+    global _tracker_instance
+    if _tracker_instance is None:
+        _tracker_instance = SettlementTracker()
+    return _tracker_instance
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Deterministic request sharding and lock-file shard ownership for battle listeners."""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def shard_for_request(request_id: Any, shard_count: int) -> int:
+    """Map a request id to its owning shard (stable across processes and hosts)."""
+    if shard_count <= 1:
+        return 0
+    digest = hashlib.blake2b(str(request_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+class ShardCoordinator:
+    """Hands out shard slots to listener processes through ``flock`` lock files.
+
+    Each slot is a file ``shard-<index>-of-<count>.lock`` in ``lock_dir``. A
+    process owns a shard for as long as it holds the exclusive lock on that file;
+    the OS drops the lock when the process dies, so a standby instance waiting in
+    :meth:`acquire` picks the shard (and its checkpoint) up on its next attempt.
+    Lock files only coordinate processes that share a filesystem; listeners on
+    separate hosts should be given explicit shard indexes instead.
+    """
+
+    def __init__(self, shard_count: int, lock_dir: Optional[str] = None) -> None:
+        if shard_count < 1:
+            raise ValueError("shard_count must be >= 1")
+        self.shard_count = shard_count
+        lock_default = os.getenv("BATTLE_LISTENER_LOCK_DIR", ".battle_listener_locks")
+        self.lock_dir = Path(lock_dir or lock_default)
+        self.index: Optional[int] = None
+        self._fd: Optional[int] = None
+
+    def _lock_path(self, index: int) -> Path:
+        return self.lock_dir / f"shard-{index}-of-{self.shard_count}.lock"
+
+    def _try_lock(self, index: int) -> bool:
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self._lock_path(index), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        self.index = index
+        return True
+
+    def acquire(self, preferred: Optional[int] = None) -> Optional[int]:
+        """Claim ``preferred`` (or the first free slot). Returns the index, or None if all are taken."""
+        if self.index is not None:
+            return self.index
+        candidates = [preferred] if preferred is not None else range(self.shard_count)
+        for index in candidates:
+            if not 0 <= index < self.shard_count:
+                raise ValueError(f"shard index {index} out of range for {self.shard_count} shards")
+            if self._try_lock(index):
+                logger.info("Acquired listener shard %s/%s", index, self.shard_count)
+                return index
+        return None
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+            self.index = None
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+NAUTILUS SIGNING DAEMON
+=======================
+Owns the single enclave key and signs battle results for any number of local
+worker processes over a Unix socket, so CPU-parallel simulation keeps one
+enclave identity and one attestation.
+
+Protocol: each frame is a 4-byte big-endian length followed by a JSON object.
+    {"op": "sign", "winner_id", "loser_id", "xp_gain", "battle_log_hash" | "battle_log"}
+    {"op": "sign_batch", "results": [...]}      -> EnclaveSimulator.sign_battle_batch
+    {"op": "identity"}                          -> public key, PCRs, attestation and its Walrus blob id
+Concurrent "sign" requests are drained by one signer thread in batches of up
+to SIGNING_MAX_BATCH. A batch of several is signed once, over a Merkle root
+(EnclaveSimulator.sign_payload_batch): each response carries that root
+signature plus, under "batch", the root, count and its inclusion proof
+(verify with EnclaveSimulator.verify_signed_result). Results reference the
+daemon's attestation by digest.
+
+Usage:
+    python3 signing_daemon.py [socket_path]
+    ENCLAVE_SOCKET=/tmp/chimera_enclave.sock python3 battle_request_listener.py
+"""
+
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from nautilus_enclave import EnclaveSimulator, attestation_digest
+from walrus_queue import store_json
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/tmp/chimera_enclave.sock"
+_FRAME_HEADER = struct.Struct(">I")
+
+
+def _send_frame(sock: socket.socket, message: Dict[str, Any]) -> None:
+    body = json.dumps(message).encode()
+    sock.sendall(_FRAME_HEADER.pack(len(body)) + body)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv_frame(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    header = _recv_exact(sock, _FRAME_HEADER.size)
+    if header is None:
+        return None
+    body = _recv_exact(sock, _FRAME_HEADER.unpack(header)[0])
+    return json.loads(body) if body is not None else None
+
+
+class _PendingSignature:
+    __slots__ = ("request", "response", "done")
+
+    def __init__(self, request: Dict[str, Any]) -> None:
+        self.request = request
+        self.response: Optional[Dict[str, Any]] = None
+        self.done = threading.Event()
+
+
+class SigningDaemon:
+    """Unix-socket signing service around one EnclaveSimulator."""
+
+    def __init__(
+        self,
+        socket_path: Optional[str] = None,
+        max_batch: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+        enclave: Optional[EnclaveSimulator] = None
+    ) -> None:
+        self.socket_path = socket_path or os.getenv("ENCLAVE_SOCKET", DEFAULT_SOCKET)
+        self.max_batch = max_batch or int(os.getenv("SIGNING_MAX_BATCH", "64"))
+        self.max_wait = (max_wait_ms or float(os.getenv("SIGNING_MAX_WAIT_MS", "2"))) / 1000
+        self.enclave = enclave or EnclaveSimulator()
+        self._queue: "queue.Queue[_PendingSignature]" = queue.Queue()
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+
+    # --- signer ---
+
+    def _signer_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._sign_batch(batch)
+
+    def _sign_batch(self, batch: List[_PendingSignature]) -> None:
+        timestamp = int(time.time())
+        valid: List[_PendingSignature] = []
+        payloads = []
+        for pending in batch:
+            request = pending.request
+            try:
+                payload = {
+                    "winner_id": request["winner_id"],
+                    "loser_id": request["loser_id"],
+                    "xp_gain": request["xp_gain"],
+                    "battle_log_hash": request.get("battle_log_hash")
+                        or self.enclave._hash_battle_log(request.get("battle_log", [])),
+                    "timestamp": timestamp
+                }
+                self.enclave._payload_bytes(payload)  # reject malformed items before signing the batch
+            except Exception as exc:
+                pending.response = {"error": str(exc)}
+                pending.done.set()
+                continue
+            valid.append(pending)
+            payloads.append(payload)
+
+        try:
+            if len(valid) == 1:
+                valid[0].response = self.enclave.sign_payload(payloads[0])
+            elif valid:
+                signed = self.enclave.sign_payload_batch(payloads)
+                for pending, item in zip(valid, signed["items"]):
+                    pending.response = {
+                        "signature": signed["signature"],
+                        "public_key": signed["public_key"],
+                        "payload": item["payload"],
+                        "pcr0": signed["pcr0"],
+                        "attestation_digest": signed["attestation_digest"],
+                        "batch": {"root": signed["root"], "count": signed["count"], "proof": item["proof"]},
+                    }
+        except Exception as exc:
+            for pending in valid:
+                pending.response = {"error": str(exc)}
+        for pending in valid:
+            pending.done.set()
+
+    # --- server ---
+
+    def _handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get("op")
+        if op == "sign":
+            pending = _PendingSignature(request)
+            self._queue.put(pending)
+            pending.done.wait()
+            return pending.response
+        if op == "sign_batch":
+            return self.enclave.sign_battle_batch(request["results"])
+        if op == "identity":
+            return {
+                "public_key": self.enclave.get_public_key_hex(),
+                "pcrs": self.enclave.pcrs,
+                "attestation": self.enclave.get_attestation(),
+                "attestation_blob_id": self.enclave.attestation_blob_id
+            }
+        return {"error": f"unknown op {op!r}"}
+
+    def serve_forever(self) -> None:
+        daemon = self
+
+        class _Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                while True:
+                    try:
+                        request = _recv_frame(self.request)
+                    except (OSError, ValueError):
+                        return
+                    if request is None:
+                        return
+                    try:
+                        response = daemon._handle(request)
+                    except Exception as exc:
+                        response = {"error": str(exc)}
+                    _send_frame(self.request, response)
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, _Handler)
+        self._server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)
+        # Workers reference the daemon key's attestation by blob id (see identity)
+        publisher = os.getenv("WALRUS_PUBLISHER_URL", "https://publisher.walrus-testnet.walrus.space/v1/store")
+        self.enclave.publish_attestation(lambda attestation: store_json(publisher, attestation))
+        threading.Thread(target=self._signer_loop, name="enclave-signer", daemon=True).start()
+        logger.info("Signing daemon listening on %s", self.socket_path)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self) -> None:
+        if self._server:
+            self._server.shutdown()
+
+
+class RemoteEnclave:
+    """
+    Drop-in replacement for EnclaveSimulator in worker processes: same
+    signing methods, but every signature comes from the daemon's key.
+    One persistent connection per thread and process (a connection
+    inherited through fork() is never shared with the parent).
+    """
+
+    verify_signature = staticmethod(EnclaveSimulator.verify_signature)
+    verify_signed_result = staticmethod(EnclaveSimulator.verify_signed_result)
+    verify_batch = staticmethod(EnclaveSimulator.verify_batch)
+
+    def __init__(self, socket_path: Optional[str] = None) -> None:
+        self.socket_path = socket_path or os.getenv("ENCLAVE_SOCKET", DEFAULT_SOCKET)
+        self._local = threading.local()
+        identity = self._call({"op": "identity"})
+        self._public_key_hex = identity["public_key"]
+        self.pcrs = identity["pcrs"]
+        self._attestation = identity["attestation"]
+        self.attestation_blob_id = identity.get("attestation_blob_id")
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None and getattr(self._local, "pid", None) != os.getpid():
+            # Forked child: the parent keeps using this socket, open our own
+            sock.close()
+            sock = None
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+            self._local.pid = os.getpid()
+        return sock
+
+    def _call(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        for attempt in (1, 2):
+            try:
+                sock = self._connection()
+                _send_frame(sock, request)
+                response = _recv_frame(sock)
+                if response is None:
+                    raise ConnectionError("signing daemon closed the connection")
+                break
+            except OSError:
+                # Reconnect once (daemon restarted)
+                stale = getattr(self._local, "sock", None)
+                if stale is not None:
+                    stale.close()
+                self._local.sock = None
+                if attempt == 2:
+                    raise
+        if "error" in response:
+            raise RuntimeError(f"signing daemon: {response['error']}")
+        return response
+
+    def get_public_key_hex(self) -> str:
+        return self._public_key_hex
+
+    def get_public_key_bytes(self) -> bytes:
+        return bytes.fromhex(self._public_key_hex)
+
+    def get_attestation(self) -> dict:
+        return self._attestation
+
+    def get_attestation_digest(self) -> str:
+        return attestation_digest(self._attestation)
+
+    def sign_battle_result(
+        self,
+        winner_id: str,
+        loser_id: str,
+        xp_gain: int,
+        battle_log: list,
+        battle_log_hash: Optional[str] = None
+    ) -> dict:
+        request: Dict[str, Any] = {"op": "sign", "winner_id": winner_id, "loser_id": loser_id, "xp_gain": xp_gain}
+        if battle_log_hash:
+            request["battle_log_hash"] = battle_log_hash
+        else:
+            request["battle_log"] = battle_log
+        return self._call(request)
+
+    def sign_battle_batch(self, results: list) -> dict:
+        return self._call({"op": "sign_batch", "results": results})
+
+
+def main() -> None:
+    import sys
+    logging.basicConfig(level=os.getenv("SIGNING_DAEMON_LOG", "INFO"))
+    SigningDaemon(sys.argv[1] if len(sys.argv) > 1 else None).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
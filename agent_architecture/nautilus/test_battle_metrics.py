@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""Metrics registry exporters (python3 -m pytest test_battle_metrics.py)"""
+
+import battle_metrics
+from battle_metrics import MetricsRegistry
+
+
+def test_exporters_keep_their_own_rate_window(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(battle_metrics.time, "time", lambda: clock[0])
+    registry = MetricsRegistry()
+    registry.render_prometheus()
+    registry.snapshot()
+    registry.inc("battle_battles_total", 20)
+    clock[0] += 10
+    assert registry.snapshot()["battle_battles_per_second"] == 2.0
+    # The file export above must not have consumed the HTTP exporter's window
+    assert "battle_battles_per_second 2.0" in registry.render_prometheus()
+
+
+def test_function_gauge_is_evaluated_at_export():
+    registry = MetricsRegistry()
+    age = [5.0]
+    registry.set_function("battle_listener_oldest_pending_age_seconds", lambda: age[0])
+    assert registry.snapshot()["battle_listener_oldest_pending_age_seconds"] == {"_": 5.0}
+    age[0] = 65.0
+    assert "battle_listener_oldest_pending_age_seconds 65.0" in registry.render_prometheus()
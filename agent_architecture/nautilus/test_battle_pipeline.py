@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""Staged BattlePipeline error handling (python3 -m pytest test_battle_pipeline.py)"""
+
+import pytest
+
+import battle_orchestrator
+from battle_engine import Monster
+from battle_orchestrator import BattlePipeline
+
+
+@pytest.fixture
+def offline_monsters(monkeypatch):
+    # "0xBROKEN" loads as None, so the simulate stage raises in its worker process
+    def fetch(monster_id):
+        return None if monster_id == "0xBROKEN" else Monster(monster_id, monster_id, 30, 30, 30, 1)
+
+    monkeypatch.setattr(battle_orchestrator, "fetch_monster_from_chain", fetch)
+
+
+def test_failing_stage_is_reported_and_pipeline_drains(offline_monsters):
+    pipeline = BattlePipeline(fetch_workers=1, simulate_workers=1, sign_workers=1, settle=False)
+    battles = [
+        {"monster1_id": "0xBROKEN", "monster2_id": "0xB", "request_id": 1},
+        {"monster1_id": "0xA", "monster2_id": "0xB", "request_id": 2},
+    ]
+    results = {item["request_id"]: item for item in pipeline.run(battles)}
+
+    failed, ok = results[1], results[2]
+    assert failed["error"].startswith("simulate: ")
+    assert set(failed["timings"]) == {"fetch", "simulate", "total"}
+    assert failed["result"] is None
+    assert ok["error"] is None
+    assert set(ok["timings"]) == {"fetch", "simulate", "sign", "total"}
+    assert ok["result"]["signature"]
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Golden vectors for the BCS battle result payload (python3 -m pytest test_bcs_payload.py)"""
+
+import hashlib
+
+import pytest
+from nacl.signing import SigningKey
+
+from bcs_payload import encode_address, encode_battle_result, encode_u64, encode_uleb128
+from nautilus_enclave import EnclaveSimulator
+
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+GOLDEN_PAYLOAD = {
+    "winner_id": "0x1",
+    "loser_id": "0x2",
+    "xp_gain": 30,
+    "battle_log_hash": EMPTY_SHA256,
+    "timestamp": 1700000000,
+}
+
+# bcs::to_bytes(BattleResultPayload { @0x1, @0x2, 30, sha256(""), 1700000000 })
+GOLDEN_BYTES = bytes.fromhex(
+    "00" * 31 + "01"              # winner_id: address
+    + "00" * 31 + "02"            # loser_id: address
+    + "1e00000000000000"          # xp_gain: u64
+    + "20" + EMPTY_SHA256         # battle_log_hash: vector<u8> (ULEB128 len 32)
+    + "00f1536500000000"          # timestamp: u64
+)
+
+# Ed25519 signature of GOLDEN_BYTES with seed 00 01 .. 1f
+GOLDEN_SIGNATURE = (
+    "a6911cfb4e049870df243f1b6a23ff4d797aa15959fba202a0964cf30380448d"
+    "69a32912a75a0ab0062319fa94a24e758b8598d044e5425683d54e0a66c9a60c"
+)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0, "00"), (1, "01"), (127, "7f"), (128, "8001"), (300, "ac02"), (16384, "808001"),
+])
+def test_uleb128(value, expected):
+    assert encode_uleb128(value).hex() == expected
+
+
+def test_u64_little_endian_and_bounds():
+    assert encode_u64(1).hex() == "0100000000000000"
+    assert encode_u64(2**64 - 1).hex() == "ff" * 8
+    with pytest.raises(ValueError):
+        encode_u64(2**64)
+    with pytest.raises(ValueError):
+        encode_u64(-1)
+
+
+def test_address_padding():
+    assert encode_address("0x2") == b"\x00" * 31 + b"\x02"
+    full = "0x" + "ab" * 32
+    assert encode_address(full) == bytes.fromhex("ab" * 32)
+    assert encode_address("0xAB") == encode_address("0xab")
+
+
+def test_non_hex_identifier_maps_to_blake2b():
+    assert encode_address("nft_1_1") == hashlib.blake2b(b"nft_1_1", digest_size=32).digest()
+
+
+def test_battle_result_golden_vector():
+    encoded = encode_battle_result(GOLDEN_PAYLOAD)
+    assert encoded == GOLDEN_BYTES
+    assert len(encoded) == 113
+
+
+def test_battle_log_hash_length_is_checked():
+    with pytest.raises(ValueError):
+        encode_battle_result(dict(GOLDEN_PAYLOAD, battle_log_hash="abcd"))
+
+
+def test_golden_signature_verifies():
+    signing_key = SigningKey(bytes(range(32)))
+    assert signing_key.sign(GOLDEN_BYTES).signature.hex() == GOLDEN_SIGNATURE
+    public_key = signing_key.verify_key.encode().hex()
+    assert EnclaveSimulator.verify_signature(public_key, GOLDEN_PAYLOAD, GOLDEN_SIGNATURE)
+    assert not EnclaveSimulator.verify_signature(public_key, dict(GOLDEN_PAYLOAD, xp_gain=999), GOLDEN_SIGNATURE)
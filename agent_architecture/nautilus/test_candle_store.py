@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Candle store upsert / range and tick aggregation (python3 -m pytest test_candle_store.py)"""
+
+import pytest
+
+from candle_store import MAX_TICK_GAP, CandleAggregator, CandleStore
+from indicators import VWAP, Candle
+
+
+def candle(ts, close=1.0, volume=1.0):
+    return Candle(float(ts), close, close + 0.1, close - 0.1, close, volume)
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = CandleStore(str(tmp_path / "SUIUSDT-5m.ohlcv"), "5m")
+    yield s
+    s.close()
+
+
+def test_upsert_appends_overwrites_and_skips_gaps(store):
+    assert store.extend(candle(ts) for ts in (0, 300, 600, 900)) == 4
+    assert store.upsert(candle(300, close=2.0))  # same open time: overwritten
+    assert store.upsert(candle(900, close=3.0))  # last row: overwritten
+    assert not store.upsert(candle(450))  # older bucket missing from the file
+    assert len(store) == 4
+    assert [c.close for c in store.range()] == [1.0, 2.0, 1.0, 3.0]
+
+
+def test_range_is_half_open(store):
+    store.extend(candle(ts) for ts in range(0, 3000, 300))
+    assert [c.timestamp for c in store.range(600, 1500)] == [600, 900, 1200]
+    assert [c.timestamp for c in store.range(601)] == list(range(900, 3000, 300))
+    assert store.range(5000) == []
+    assert store.index_of(601) == 3
+
+
+def test_reader_sees_writer_appends(store, tmp_path):
+    reader = CandleStore(str(tmp_path / "SUIUSDT-5m.ohlcv"))
+    assert len(reader) == 0
+    store.upsert(candle(0))
+    store.upsert(candle(300))
+    assert reader.last() == candle(300)
+    arrays = reader.as_arrays()
+    assert list(arrays["timestamp"]) == [0.0, 300.0]
+    del arrays  # the views pin the map
+    reader.close()
+
+
+def test_ticks_close_candles_and_kline_replaces_them(tmp_path):
+    closed = []
+    agg = CandleAggregator(["5m"], store_dir=str(tmp_path), on_close=lambda tf, c: closed.append(c))
+    for ts, price in ((10, 1.0), (100, 1.5), (200, 0.8), (310, 1.2)):
+        agg.on_tick(price, timestamp=ts)
+    assert closed == [Candle(0.0, 1.0, 1.5, 0.8, 0.8, 0.0)]
+    assert agg.current("5m").timestamp == 300
+    agg.ingest("5m", Candle(0.0, 1.0, 1.6, 0.7, 0.9, 1234.0))
+    assert agg.stores["5m"].get(0).volume == 1234.0
+
+
+def test_tick_volume_proxy_makes_vwap_ready(tmp_path):
+    agg = CandleAggregator(["5m"], store_dir=str(tmp_path))
+    volume_24h = 86400.0 * 2  # $2/s at price 2.0 -> 1 SUI/s
+    agg.on_tick(2.0, timestamp=0, volume_24h=volume_24h)
+    agg.on_tick(2.0, timestamp=10, volume_24h=volume_24h)
+    agg.on_tick(2.0, timestamp=10 + 3600, volume_24h=volume_24h)  # gap is capped
+    assert agg.current("5m").volume == pytest.approx(MAX_TICK_GAP)
+    closed = agg.stores["5m"].get(0)
+    assert closed.volume == pytest.approx(10.0)
+    agg.on_tick(2.2, timestamp=3620, volume_24h=volume_24h)
+    assert agg.current("5m").volume == pytest.approx(MAX_TICK_GAP + 10 * 2 / 2.2)
+    vwap = VWAP()
+    vwap.update(closed)
+    assert vwap.ready
+
+
+def test_late_tick_does_not_replace_the_forming_candle(tmp_path):
+    agg = CandleAggregator(["5m"], store_dir=str(tmp_path))
+    agg.on_tick(1.0, timestamp=290)
+    agg.on_tick(1.2, timestamp=310)
+    agg.on_tick(1.5, timestamp=320)
+    agg.on_tick(9.9, timestamp=299)  # delayed quote from the previous bucket
+    assert agg.current("5m") == Candle(300.0, 1.2, 1.5, 1.2, 1.5, 0.0)
+    agg.on_tick(1.1, timestamp=610)
+    assert [c.close for c in agg.stores["5m"].range()] == [1.0, 1.5]
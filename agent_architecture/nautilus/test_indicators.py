@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Streaming indicators match the vectorized backtester (python3 -m pytest test_indicators.py)"""
+
+import numpy as np
+import pytest
+
+import backtester
+from indicators import ATR, EMA, VWAP, Candle, VolumeSMA, WilderRSI
+
+
+@pytest.fixture(scope="module")
+def candles():
+    rng = np.random.default_rng(7)
+    n = 600
+    close = 60000 + np.cumsum(rng.normal(0, 40, n))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 25, n))
+    return {
+        "timestamp": 1_700_000_000.0 + 300.0 * np.arange(n),  # crosses a UTC day boundary
+        "open": open_,
+        "high": np.maximum(open_, close) + spread,
+        "low": np.minimum(open_, close) - spread,
+        "close": close,
+        "volume": rng.uniform(1, 50, n),
+    }
+
+
+def _stream(indicator, inputs):
+    """Update values, plus the `peek` of each input taken just before it is applied."""
+    peeked, updated = [], []
+    for value in inputs:
+        peeked.append(indicator.peek(value))
+        updated.append(indicator.update(value))
+    as_array = lambda xs: np.array([np.nan if x is None else x for x in xs])
+    return as_array(peeked), as_array(updated)
+
+
+def _rows(candles):
+    keys = ("timestamp", "open", "high", "low", "close", "volume")
+    return [Candle(*(float(candles[k][i]) for k in keys)) for i in range(len(candles["close"]))]
+
+
+@pytest.mark.parametrize("period", [9, 50])
+def test_ema(candles, period):
+    peeked, updated = _stream(EMA(period), candles["close"])
+    expected = backtester.ema(candles["close"], period)
+    np.testing.assert_allclose(updated, expected, rtol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(peeked, expected, rtol=1e-9, equal_nan=True)
+
+
+def test_rsi(candles):
+    peeked, updated = _stream(WilderRSI(14), candles["close"])
+    expected = backtester.rsi(candles["close"], 14)
+    np.testing.assert_allclose(updated, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(peeked, expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def test_atr(candles):
+    peeked, updated = _stream(ATR(14), _rows(candles))
+    expected = backtester.atr(candles["high"], candles["low"], candles["close"], 14)
+    np.testing.assert_allclose(updated, expected, rtol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(peeked, expected, rtol=1e-9, equal_nan=True)
+
+
+def test_session_vwap(candles):
+    peeked, updated = _stream(VWAP(), _rows(candles))
+    expected = backtester.session_vwap(candles)
+    np.testing.assert_allclose(updated, expected, rtol=1e-9)
+    np.testing.assert_allclose(peeked, expected, rtol=1e-9)
+
+
+def test_volume_sma(candles):
+    peeked, updated = _stream(VolumeSMA(20), candles["volume"])
+    expected = backtester.sma(candles["volume"], 20)
+    warm = ~np.isnan(expected)  # the streaming SMA averages a partial window while warming up
+    np.testing.assert_allclose(updated[warm], expected[warm], rtol=1e-9)
+    np.testing.assert_allclose(peeked[warm], expected[warm], rtol=1e-9)
+
+
+def test_snapshot_round_trip_resumes_warm(candles):
+    rows = _rows(candles)
+    live, resumed = ATR(14), ATR(14)
+    volume_live, volume_resumed = VolumeSMA(20), VolumeSMA(20)
+    for row in rows[:100]:
+        live.update(row)
+        volume_live.update(row.volume)
+    resumed.restore(live.snapshot())
+    volume_resumed.restore(volume_live.snapshot())
+    for row in rows[100:]:
+        assert resumed.update(row) == live.update(row)
+        assert volume_resumed.update(row.volume) == pytest.approx(volume_live.update(row.volume))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Battle log hash chain (python3 -m pytest test_log_chain.py)"""
+
+import pytest
+
+from battle_engine import BattleEngine, Monster, log_chain_genesis, verify_log_chain
+
+
+@pytest.fixture(scope="module")
+def battle():
+    engine = BattleEngine(
+        Monster("0xDRAGON", "Dragon", 60, 40, 30, 3),
+        Monster("0xGOLEM", "Golem", 45, 35, 50, 2),
+    )
+    return engine.simulate_battle()
+
+
+def test_last_commitment_is_the_log_hash(battle):
+    assert len(battle["turn_commitments"]) == battle["total_turns"]
+    assert battle["turn_commitments"][-1] == battle["battle_log_hash"]
+
+
+def test_full_log_verifies_from_genesis(battle):
+    genesis = log_chain_genesis("0xDRAGON", "0xGOLEM")
+    assert verify_log_chain(battle["battle_log"], "Dragon", "Golem", battle["turn_commitments"], genesis)
+
+
+def test_partial_replay_verifies_from_previous_commitment(battle):
+    if battle["total_turns"] < 3:
+        pytest.skip("battle too short for a partial replay")
+    commitments = battle["turn_commitments"]
+    previous = bytes.fromhex(commitments[0])
+    assert verify_log_chain(battle["battle_log"][1:], "Dragon", "Golem", commitments[1:], previous)
+
+
+def test_tampered_turn_is_detected(battle):
+    genesis = log_chain_genesis("0xDRAGON", "0xGOLEM")
+    tampered = [dict(turn) for turn in battle["battle_log"]]
+    tampered[0]["m1_damage_dealt"] += 1
+    assert not verify_log_chain(tampered, "Dragon", "Golem", battle["turn_commitments"], genesis)
+
+
+def test_genesis_is_bound_to_the_monsters(battle):
+    swapped = log_chain_genesis("0xGOLEM", "0xDRAGON")
+    assert not verify_log_chain(battle["battle_log"], "Dragon", "Golem", battle["turn_commitments"], swapped)
+
+
+def test_commitment_count_must_match(battle):
+    genesis = log_chain_genesis("0xDRAGON", "0xGOLEM")
+    assert not verify_log_chain(battle["battle_log"], "Dragon", "Golem", battle["turn_commitments"][:-1], genesis)
+
+
+def test_monsters_sharing_a_name_verify():
+    engine = BattleEngine(
+        Monster("0xA", "Unknown", 60, 40, 30, 3),
+        Monster("0xB", "Unknown", 45, 35, 50, 2),
+    )
+    result = engine.simulate_battle()
+    genesis = log_chain_genesis("0xA", "0xB")
+    assert verify_log_chain(result["battle_log"], "Unknown", "Unknown", result["turn_commitments"], genesis)
+    assert verify_log_chain(result["battle_log"], None, None, result["turn_commitments"], genesis)
+
+
+def test_legacy_name_keyed_log_verifies(battle):
+    legacy = [{k: v for k, v in turn.items() if not k.startswith(("m1_", "m2_"))} for turn in battle["battle_log"]]
+    genesis = log_chain_genesis("0xDRAGON", "0xGOLEM")
+    assert verify_log_chain(legacy, "Dragon", "Golem", battle["turn_commitments"], genesis)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Memory pack encoding round trips (python3 -m pytest test_memory_codec.py)"""
+
+import hashlib
+import json
+import zlib
+
+import pytest
+
+import memory_codec
+from memory_codec import decode_blob, encode_pack, expand, pack_item
+
+
+def _monster(i, slot):
+    return {"agility": 50 + i, "hp": 20, "id": f"nft_{i}_{slot}", "intelligence": 60, "level": 4,
+            "name": "Spectre Noir" if slot == 2 else "Titan de Glace", "strength": 70 + i}
+
+
+def _battle(i, monster1):
+    return {
+        "agent_id": "chimera-battle-agent-01", "attestation_blob_id": "blob" + "a" * 39,
+        "attestation_digest": hashlib.sha256(b"att").hexdigest()[:32], "battle_id": i,
+        "combattants": {"monster1": monster1, "monster2": _monster(i, 2)},
+        "pcr0": "e2e96abc1347c200", "public_key": "ab" * 32,
+        "result": {"loser_id": f"nft_{i}_2", "total_turns": 4, "winner_final_hp": 20, "winner_id": f"nft_{i}_1", "xp_gain": 40},
+        "signature": hashlib.sha512(str(i).encode()).hexdigest(), "timestamp": f"2026-10-19T12:00:{i:02d}",
+    }
+
+
+def _trade(i):
+    return {
+        "agent_id": "chimera-nautilus-01",
+        "decision": {
+            "action": "HOLD", "confidence": 0.5, "setup": None, "market_bias": "RANGE", "timestamp": 1792400000 + i,
+            "reasoning": f"Pas de setup: Biais=RANGE, EMA15=3.{i:04d}, EMA50=3.2000, VWAP=3.1990, RSI=51.{i}",
+            "indicators": {"atr_5m": 0.009 + i * 1e-5, "atr_pct": 0.28, "ema15_15m": 3.21, "ema21_5m": 3.2,
+                           "ema50_15m": 3.19, "ema9_5m": 3.205, "price": 3.2 + i / 1000, "rsi": 51.0, "vwap": 3.199},
+            "risk_management": {"position_size_usd": 0, "risk_usd": 30.0, "stop_loss": 0, "take_profit_1": 0, "take_profit_2": 0},
+        },
+        "execution": None, "pcr0": "e2e96abc1347c200", "public_key": "ab" * 32,
+        "signature": hashlib.sha512(b"t%d" % i).hexdigest(),
+    }
+
+
+@pytest.fixture
+def items():
+    shared_monster = _monster(0, 1)  # the same NFT fights several battles
+    memories = [_battle(i, shared_monster) for i in range(1, 5)] + [_trade(i) for i in range(4)]
+    return {hashlib.sha256(json.dumps(m, sort_keys=True).encode()).hexdigest(): m for m in memories}
+
+
+def _round_trip(items):
+    blob = encode_pack(items)
+    pack = decode_blob(blob)
+    assert {digest: pack_item(pack, digest) for digest in items} == items
+    assert [expand(pack["items"][digest], pack["shared"]) for digest in items] == list(items.values())
+    return blob, pack
+
+
+def test_zlib_round_trip(items, monkeypatch):
+    monkeypatch.setattr(memory_codec, "ZSTD_AVAILABLE", False)
+    blob, pack = _round_trip(items)
+    assert blob[:6] == memory_codec._HEADER.pack(b"CHMP", memory_codec.VERSION, memory_codec.CODEC_ZLIB)
+    # monster1 is shared by the 4 battles, each monster2 is distinct
+    assert len(pack["shared"]) == 5
+
+
+def test_zstd_round_trip(items, monkeypatch):
+    pytest.importorskip("zstandard")
+    monkeypatch.setattr(memory_codec, "ZSTD_AVAILABLE", True)
+    blob, _ = _round_trip(items)
+    assert blob[5] == memory_codec.CODEC_ZSTD
+
+
+def test_dictionary_matches_the_encoded_body(items, monkeypatch):
+    monkeypatch.setattr(memory_codec, "ZSTD_AVAILABLE", False)
+    blob = encode_pack(dict(list(items.items())[:2]))
+    body = zlib.decompressobj(zlib.MAX_WBITS, memory_codec.ZLIB_DICTIONARY).decompress(blob[6:])
+    plain = zlib.compress(body, 9)
+    assert len(blob) - 6 < 0.7 * len(plain)
+
+
+def test_version_2_packs_still_decode(items):
+    body = json.dumps({"format": memory_codec.PACK_FORMAT, "shared": {}, "items": items}).encode()
+    compressor = zlib.compressobj(9, zlib.DEFLATED, zlib.MAX_WBITS, 9, zlib.Z_DEFAULT_STRATEGY, memory_codec._ZLIB_DICTIONARY_V2)
+    blob = memory_codec._HEADER.pack(b"CHMP", 2, memory_codec.CODEC_ZLIB) + compressor.compress(body) + compressor.flush()
+    pack = decode_blob(blob)
+    assert all(pack_item(pack, digest) == memory for digest, memory in items.items())
+
+
+def test_plain_json_and_unknown_versions():
+    assert decode_blob(b'{"format": "chimera-memory-pack-v1", "items": {}}')["items"] == {}
+    with pytest.raises(ValueError):
+        decode_blob(memory_codec._HEADER.pack(b"CHMP", 99, memory_codec.CODEC_ZLIB) + b"x")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Merkle-batched signing of battle results (python3 -m pytest test_merkle_batch.py)"""
+
+import hashlib
+
+import pytest
+
+from nautilus_enclave import EnclaveSimulator
+
+
+def _results(count):
+    return [
+        {"winner_id": f"0x{i + 1:x}", "loser_id": "0xff", "xp_gain": 10 + i,
+         "battle_log_hash": hashlib.sha256(str(i).encode()).hexdigest()}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(scope="module")
+def enclave():
+    return EnclaveSimulator()
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 5, 8, 13])
+def test_every_item_verifies(enclave, count):
+    batch = enclave.sign_battle_batch(_results(count))
+    assert batch["count"] == count
+    assert EnclaveSimulator.verify_batch(batch) == [True] * count
+
+
+def test_tampered_item_fails_alone(enclave):
+    batch = enclave.sign_battle_batch(_results(5))
+    batch["items"][2]["payload"] = dict(batch["items"][2]["payload"], xp_gain=999)
+    assert EnclaveSimulator.verify_batch(batch) == [True, True, False, True, True]
+
+
+def test_proof_for_another_index_fails(enclave):
+    batch = enclave.sign_battle_batch(_results(4))
+    item = batch["items"][1]
+    proof = dict(item["proof"], index=0)
+    assert not EnclaveSimulator.verify_batch_item(
+        batch["public_key"], batch["root"], batch["count"], batch["signature"], item["payload"], proof
+    )
+
+
+def test_root_signed_by_another_key_fails(enclave):
+    batch = enclave.sign_battle_batch(_results(3))
+    batch["public_key"] = EnclaveSimulator().get_public_key_hex()
+    assert EnclaveSimulator.verify_batch(batch) == [False, False, False]
+
+
+def test_leaf_count_is_bound_to_the_signature(enclave):
+    batch = enclave.sign_battle_batch(_results(3))
+    batch["count"] = 4
+    assert EnclaveSimulator.verify_batch(batch) == [False, False, False]
+
+
+def test_empty_batch_is_rejected(enclave):
+    with pytest.raises(ValueError):
+        enclave.sign_battle_batch([])
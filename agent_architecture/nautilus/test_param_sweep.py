@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Sweep space parsing and sampling (python3 -m pytest test_param_sweep.py)"""
+
+import pytest
+
+from param_sweep import apply_overrides, expand_space, parse_params
+
+BASE = {
+    "indicators": {"rsi_period": 14, "ema_entry": [9, 21]},
+    "setup_b": {"rsi_overbought": 70, "distance_atr_mult": 1.0},
+}
+
+
+def test_parse_params():
+    space = parse_params(["setup_b.rsi_overbought=65:80", "indicators.ema_entry=9/21,8/20", "indicators.rsi_period=7,14"])
+    assert space == {
+        "setup_b.rsi_overbought": (65.0, 80.0),
+        "indicators.ema_entry": [[9, 21], [8, 20]],
+        "indicators.rsi_period": [7, 14],
+    }
+
+
+def test_grid_is_full_product_and_rejects_ranges():
+    points = expand_space({"indicators.rsi_period": [7, 14], "setup_b.distance_atr_mult": [0.8, 1.0, 1.2]})
+    assert len(points) == 6
+    with pytest.raises(ValueError):
+        expand_space({"setup_b.rsi_overbought": (65.0, 80.0)})
+
+
+def test_ranges_over_int_fields_draw_integers():
+    space = {"setup_b.rsi_overbought": (65.0, 80.0), "setup_b.distance_atr_mult": (0.5, 1.5)}
+    points = expand_space(space, samples=200, seed=3, base_config=BASE)
+    overbought = [p["setup_b.rsi_overbought"] for p in points]
+    assert all(type(v) is int and 65 <= v <= 80 for v in overbought)
+    assert {65, 80} <= set(overbought)  # bounds are inclusive
+    assert any(v != round(v) for v in (p["setup_b.distance_atr_mult"] for p in points))
+    config = apply_overrides(BASE, points[0])
+    assert type(config["setup_b"]["rsi_overbought"]) is int
+
+
+def test_sampling_is_seeded():
+    space = {"indicators.rsi_period": (7, 21), "setup_b.distance_atr_mult": [0.8, 1.0]}
+    assert expand_space(space, 20, seed=1, base_config=BASE) == expand_space(space, 20, seed=1, base_config=BASE)
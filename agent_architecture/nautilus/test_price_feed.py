@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Hedged price feed arbitration (python3 -m pytest test_price_feed.py)"""
+
+import time
+
+import pytest
+
+from price_feed import PriceFeed
+
+
+class FakeResponse:
+    def __init__(self, price):
+        self.price = price
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"price": self.price}
+
+
+def make_feed(prices, delays, **kwargs):
+    """One fake source per price; `delays` (seconds) keeps the answer order deterministic."""
+    sources = [
+        {"name": f"src{i}", "url": f"fake://{i}", "params": {},
+         "parser": lambda r: {"price": r["price"], "change_24h": None, "volume_24h": None}}
+        for i in range(len(prices))
+    ]
+    feed = PriceFeed(sources, hedge_delay_ms=20, crosscheck_ms=50, max_deviation_pct=1.0, timeout=2, **kwargs)
+    feed.crosscheck_every = 1000
+    feed._fetches = 1  # skip the initial full round
+
+    def get(url, params=None, timeout=None):
+        i = int(url.rsplit("/", 1)[1])
+        time.sleep(delays[i])
+        return FakeResponse(prices[i])
+
+    feed.session.get = get
+    return feed
+
+
+def test_disagreement_without_reference_waits_for_third_source():
+    # src0 is slower than the hedge delay, so src1 is asked too; both answer and disagree
+    feed = make_feed([2.00, 2.50, 2.49], [0.04, 0.0, 0.1])
+    quote = feed.fetch()
+    assert quote["price"] == pytest.approx(2.50)
+    assert quote["confirmations"] == 2
+    assert feed.stats["src0"].outliers == 1
+
+
+def test_fresh_reference_arbitrates_two_sources():
+    feed = make_feed([2.00, 2.50, 2.49], [0.04, 0.0, 0.1])
+    feed.last_price, feed.last_price_at = 2.01, time.monotonic()
+    quote = feed.fetch()
+    assert quote["price"] == pytest.approx(2.00)
+    assert feed.stats["src2"].requests == 0  # no third source needed
+
+
+def test_stale_reference_does_not_veto_jumps():
+    feed = make_feed([3.0], [0.0], reference_ttl=30)
+    feed.last_price = 2.0  # +50% jump
+    feed.last_price_at = time.monotonic()
+    assert feed.fetch() is None
+    feed.last_price_at = time.monotonic() - 31
+    assert feed.fetch()["price"] == pytest.approx(3.0)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Packed replay archive write/read (python3 -m pytest test_replay_archive.py)"""
+
+import pytest
+
+from replay_archive import ReplayArchiveReader, ReplayArchiveWriter, _OpenArchive
+
+UNREACHABLE = "http://127.0.0.1:9/v1/store"  # uploads fail, archives stay local
+
+
+def _log(turns, damage=10):
+    return [{"turn": turn, "damage": damage + turn} for turn in range(1, turns + 1)]
+
+
+@pytest.fixture
+def archive_dir(tmp_path):
+    return str(tmp_path)
+
+
+def test_replays_read_back_from_open_and_sealed_archives(archive_dir):
+    writer = ReplayArchiveWriter(archive_dir, publisher_url=UNREACHABLE, max_replays=3, max_age=3600)
+    logs = {request_id: _log(request_id + 1) for request_id in range(5)}
+    refs = {request_id: writer.append(log, key=request_id) for request_id, log in logs.items()}
+
+    reader = ReplayArchiveReader(archive_dir, aggregator_url=UNREACHABLE)
+    assert refs[0]["archive"] == refs[2]["archive"] != refs[3]["archive"]
+    for request_id, log in logs.items():
+        assert reader.read(refs[request_id]) == log  # first archive sealed, second still open
+
+    writer.flush()
+    index = reader.read_index(refs[0]["archive"])
+    assert set(index["replays"]) == {"0", "1", "2"}
+    offset, length, _ = index["replays"]["1"]
+    assert reader.read({"archive": refs[0]["archive"], "offset": offset, "length": length}) == logs[1]
+
+
+def test_battles_without_request_are_keyed_by_log_hash(archive_dir):
+    writer = ReplayArchiveWriter(archive_dir, publisher_url=UNREACHABLE, max_age=3600)
+    first = writer.append(_log(3), battle_log_hash="aa" * 32)
+    rematch = writer.append(_log(3, damage=20))  # same monsters, no hash given
+    writer.flush()
+
+    replays = ReplayArchiveReader(archive_dir, aggregator_url=UNREACHABLE).read_index(first["archive"])["replays"]
+    assert len(replays) == 2
+    assert replays["aa" * 32][0] == first["offset"]
+    assert any(offset == rematch["offset"] for offset, _, _ in replays.values())
+
+
+def test_reopened_archive_counts_existing_replays(tmp_path):
+    archive = _OpenArchive(tmp_path, "pending_archive_test")
+    archive.append("1", b"abc", None)
+    archive.append("2", b"de", None)
+    archive.data.close()
+    archive.index.close()
+
+    reopened = _OpenArchive(tmp_path, "pending_archive_test")
+    assert (reopened.count, reopened.size) == (2, 5)
+    reopened.data.close()
+    reopened.index.close()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Shard assignment and lock-file takeover (python3 -m pytest test_shard_coordinator.py)"""
+
+from collections import Counter
+
+import pytest
+
+from shard_coordinator import ShardCoordinator, shard_for_request
+
+
+def test_single_shard_owns_everything():
+    assert {shard_for_request(request_id, 1) for request_id in range(100)} == {0}
+
+
+def test_assignment_is_stable_and_spread():
+    shards = [shard_for_request(request_id, 4) for request_id in range(2000)]
+    assert shards == [shard_for_request(str(request_id), 4) for request_id in range(2000)]
+    counts = Counter(shards)
+    assert set(counts) == {0, 1, 2, 3}
+    assert min(counts.values()) > 400
+
+
+def test_each_slot_is_claimed_once(tmp_path):
+    first, second, third = (ShardCoordinator(2, str(tmp_path)) for _ in range(3))
+    assert first.acquire() == 0
+    assert second.acquire() == 1
+    assert third.acquire() is None
+    assert first.acquire() == 0  # already holding a slot
+
+
+def test_standby_takes_over_released_shard(tmp_path):
+    owner, standby = ShardCoordinator(2, str(tmp_path)), ShardCoordinator(2, str(tmp_path))
+    assert owner.acquire(preferred=1) == 1
+    assert standby.acquire(preferred=1) is None
+    owner.release()
+    assert standby.acquire(preferred=1) == 1
+
+
+def test_preferred_index_out_of_range(tmp_path):
+    with pytest.raises(ValueError):
+        ShardCoordinator(2, str(tmp_path)).acquire(preferred=2)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Event trigger debounce, rate caps and hysteresis (python3 -m pytest test_trading_triggers.py)"""
+
+import pytest
+
+from trading_triggers import SignalTrigger
+
+CONFIG = {
+    "atr_normal_range": (0.0015, 0.0035),
+    "timeframes": {"bias": "15m", "entry": "5m"},
+    "indicators": {"ema_bias": [15, 50], "ema_entry": [9, 21], "rsi_period": 14, "atr_period": 14, "volume_sma": 20},
+    "setup_b": {"distance_atr_mult": 1.0, "rsi_oversold": 30, "rsi_overbought": 70},
+}
+PRICE = 2.0
+ATR = 0.01  # 0.5% of price: trend setup active
+
+
+def values(**overrides):
+    base = {
+        "ema15_15m": 2.01, "ema50_15m": 2.0,
+        "ema9_5m": 2.005, "ema21_5m": 2.0,
+        "rsi_5m": 55.0, "atr_5m": ATR, "vwap_15m": PRICE,
+    }
+    base.update(overrides)
+    return base
+
+
+def trigger(debounce=30, min_interval=60, max_per_hour=12):
+    t = SignalTrigger(CONFIG, atr_move=1.0, debounce=debounce, min_interval=min_interval, max_per_hour=max_per_hour)
+    t.commit(PRICE, values())
+    return t
+
+
+def test_nothing_fires_before_a_first_decision():
+    t = SignalTrigger(CONFIG, debounce=0, min_interval=0)
+    assert t.observe(PRICE + 5 * ATR, values(), now=0) is None
+
+
+def test_unchanged_state_does_not_fire():
+    t = trigger(debounce=0)
+    assert t.observe(PRICE + 0.5 * ATR, values(), now=0) is None
+
+
+def test_change_must_persist_for_the_debounce_window():
+    t = trigger()
+    moved = PRICE + 1.5 * ATR
+    assert t.observe(moved, values(), now=0) is None
+    assert t.observe(moved, values(), now=29) is None
+    reasons = t.observe(moved, values(), now=30)
+    assert reasons == ["move 1.50 ATR"]
+    assert t.stats["debounced"] == 2
+
+
+def test_reverting_quote_resets_the_debounce():
+    t = trigger()
+    moved = PRICE + 1.5 * ATR
+    assert t.observe(moved, values(), now=0) is None
+    assert t.observe(PRICE, values(), now=10) is None  # noisy quote: back to the anchor
+    assert t.observe(moved, values(), now=20) is None
+    assert t.observe(moved, values(), now=45) is None  # only 25s since it came back
+    assert t.observe(moved, values(), now=50) is not None
+
+
+def test_min_interval_keeps_the_change_pending():
+    t = trigger(debounce=0, min_interval=60)
+    crossed = values(ema9_5m=1.995)
+    assert t.observe(PRICE, crossed, now=0) == ["ema_entry +1->-1"]
+    assert t.observe(PRICE, crossed, now=30) is None
+    assert t.stats["rate_limited"] == 1
+    assert t.observe(PRICE, crossed, now=60) is not None  # still holds: fires once allowed
+
+
+def test_hourly_cap_is_a_sliding_window():
+    t = trigger(debounce=0, min_interval=0, max_per_hour=3)
+    moved = PRICE + 2 * ATR
+    assert all(t.observe(moved, values(), now=ts) for ts in (0, 1, 2))
+    assert t.observe(moved, values(), now=3) is None
+    assert t.observe(moved, values(), now=3600) is None
+    assert t.observe(moved, values(), now=3601) is not None  # the t=0 firing left the window
+    assert t.stats["fired"] == 4
+
+
+def test_commit_moves_the_anchor():
+    t = trigger(debounce=0, min_interval=0)
+    moved = PRICE + 1.5 * ATR
+    assert t.observe(moved, values(), now=0) is not None
+    t.commit(moved, values())
+    assert t.observe(moved, values(), now=1) is None
+
+
+@pytest.mark.parametrize("gap, fires", [(-0.0005, False), (-0.002, True)])
+def test_ema_cross_needs_the_margin(gap, fires):
+    t = trigger(debounce=0, min_interval=0)
+    reasons = t.observe(PRICE, values(ema9_5m=2.0 + gap), now=0)
+    assert (reasons is not None) == fires
+
+
+def test_quiet_market_only_counts_fade_triggers():
+    quiet_atr = 0.002  # 0.1% of price, below atr_normal_range
+    t = SignalTrigger(CONFIG, atr_move=1.0, debounce=0, min_interval=0)
+    t.commit(PRICE, values(atr_5m=quiet_atr))
+    assert t.observe(PRICE + 2 * quiet_atr, values(atr_5m=quiet_atr, ema9_5m=1.99), now=0) is None
+    reasons = t.observe(PRICE, values(atr_5m=quiet_atr, rsi_5m=75.0), now=1)
+    assert reasons == ["rsi_band +1->+2"]
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+TRADING LOOP TRACING
+====================
+Per-phase timing spans for the trading cycle (analyze_market, make_decision,
+execute_action, save_to_memory, and nested spans such as
+make_decision/update_indicators). Each phase keeps its last
+TRADING_TRACE_WINDOW durations for exact p50/p95/p99; durations are also
+observed as `trading_phase_seconds{phase=...}` in the shared metrics registry.
+The summary is written to TRADING_TRACE_FILE at most every
+TRADING_TRACE_INTERVAL seconds, at the end of a cycle.
+
+Optional sampling profiler: while enabled, a thread samples the trading
+thread's stack every TRADING_PROFILE_INTERVAL_MS during a cycle and counts
+collapsed stacks ("phase;file:function;..." - flamegraph.pl input) in
+TRADING_PROFILE_FILE. It is on when TRADING_PROFILE=1, or while the file
+named by TRADING_PROFILE_FLAG exists - checked every cycle, so
+`touch .trading_profile.on` / `rm .trading_profile.on` toggles it on a
+running agent.
+
+Usage:
+    python3 trading_trace.py [.trading_trace.json] [--profile] [--top 15]
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from battle_metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _PhaseSamples:
+    __slots__ = ("window", "count", "total", "max", "last")
+
+    def __init__(self, size: int) -> None:
+        self.window: Deque[float] = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.window.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.window)
+
+        def pct(q: float) -> float:
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else 0.0
+
+        return {
+            "count": self.count,
+            "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": self.max * 1000,
+            "last_ms": self.last * 1000,
+        }
+
+
+class TradingTracer:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        interval: Optional[float] = None,
+        window: Optional[int] = None
+    ) -> None:
+        self.path = Path(path or os.getenv("TRADING_TRACE_FILE", ".trading_trace.json"))
+        self.interval = interval or float(os.getenv("TRADING_TRACE_INTERVAL", "60"))
+        self.window = window or int(os.getenv("TRADING_TRACE_WINDOW", "1000"))
+        self.profile_flag = Path(os.getenv("TRADING_PROFILE_FLAG", ".trading_profile.on"))
+        self.profile_path = Path(os.getenv("TRADING_PROFILE_FILE", ".trading_profile.folded"))
+        self.sample_interval = float(os.getenv("TRADING_PROFILE_INTERVAL_MS", "10")) / 1000
+
+        self.phases: Dict[str, _PhaseSamples] = {}
+        self._lock = threading.Lock()
+        self._stack: List[str] = []
+        self._thread_id: Optional[int] = None
+        self._last_dump = time.time()
+
+        self._stacks: Counter = Counter()
+        self._profiler: Optional[threading.Thread] = None
+        self._profiler_stop = threading.Event()
+
+    # --- spans ---
+
+    def _record(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            samples = self.phases.get(phase)
+            if samples is None:
+                samples = self.phases[phase] = _PhaseSamples(self.window)
+            samples.add(seconds)
+        get_metrics().observe("trading_phase_seconds", seconds, phase=phase)
+
+    @contextmanager
+    def span(self, phase: str) -> Iterator[None]:
+        """Time a phase; nested spans are recorded as "outer/inner"."""
+        name = "/".join(self._stack + [phase])
+        self._stack.append(phase)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            self._record(name, time.perf_counter() - started)
+
+    @contextmanager
+    def cycle(self) -> Iterator[None]:
+        """One trading iteration: total time as phase "cycle", then maybe dump and toggle profiling."""
+        self._sync_profiler()
+        self._thread_id = threading.get_ident()
+        self._stack = []
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._thread_id = None
+            self._record("cycle", time.perf_counter() - started)
+            if time.time() - self._last_dump >= self.interval:
+                self.dump()
+
+    # --- export ---
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            phases = {name: samples.summary() for name, samples in self.phases.items()}
+        return {
+            "timestamp": int(time.time()),
+            "window": self.window,
+            "phases": phases,
+            "profile": {
+                "enabled": self._profiler is not None,
+                "samples": sum(self._stacks.values()),
+                "file": str(self.profile_path),
+            },
+        }
+
+    def dump(self) -> None:
+        self._last_dump = time.time()
+        try:
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps(self.summary(), indent=2))
+            tmp.replace(self.path)
+            if self._stacks:
+                with self._lock:
+                    lines = [f"{stack} {count}" for stack, count in self._stacks.most_common()]
+                tmp = self.profile_path.with_name(self.profile_path.name + ".tmp")
+                tmp.write_text("\n".join(lines) + "\n")
+                tmp.replace(self.profile_path)
+        except OSError as exc:
+            logger.warning("Could not write trading trace %s (%s)", self.path, exc)
+
+    # --- sampling profiler ---
+
+    def _profile_wanted(self) -> bool:
+        return os.getenv("TRADING_PROFILE", "0").lower() in ("1", "true") or self.profile_flag.exists()
+
+    def _sync_profiler(self) -> None:
+        wanted = self._profile_wanted()
+        if wanted and self._profiler is None:
+            self._profiler_stop.clear()
+            self._profiler = threading.Thread(target=self._sample_loop, name="trading-profiler", daemon=True)
+            self._profiler.start()
+            logger.info("Trading profiler on (%.0f ms samples -> %s)", self.sample_interval * 1000, self.profile_path)
+        elif not wanted and self._profiler is not None:
+            self._profiler_stop.set()
+            self._profiler = None
+            self.dump()
+            logger.info("Trading profiler off")
+
+    def _sample_loop(self) -> None:
+        stop = self._profiler_stop
+        while not stop.wait(self.sample_interval):
+            thread_id = self._thread_id
+            if thread_id is None:
+                continue
+            frame = sys._current_frames().get(thread_id)
+            frames = []
+            while frame is not None and len(frames) < 64:
+                code = frame.f_code
+                frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            phase = "/".join(self._stack) or "cycle"
+            with self._lock:
+                self._stacks[";".join([phase] + frames[::-1])] += 1
+
+
+# Global tracer (singleton)
+_tracer_instance: Optional[TradingTracer] = None
+
+def get_tracer() -> TradingTracer:
+    global _tracer_instance
+    if _tracer_instance is None:
+        _tracer_instance = TradingTracer()
+    return _tracer_instance
+
+
+# === CLI ===
+def format_summary(data: Dict[str, Any]) -> str:
+    lines = [
+        f"Trading loop phases ({time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(data['timestamp']))}, "
+        f"quantiles over the last {data['window']} samples)",
+        f"{'phase':<40} {'count':>6} {'avg':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)",
+    ]
+    phases = data["phases"]
+    for name in sorted(phases, key=lambda n: (n != "cycle", n)):
+        p = phases[name]
+        label = "  " * name.count("/") + name.rsplit("/", 1)[-1] if name != "cycle" else "cycle (total)"
+        lines.append(
+            f"{label:<40} {p['count']:>6} {p['avg_ms']:>9.1f} {p['p50_ms']:>9.1f} "
+            f"{p['p95_ms']:>9.1f} {p['p99_ms']:>9.1f} {p['max_ms']:>9.1f}"
+        )
+    profile = data.get("profile", {})
+    lines.append(f"profiler: {'on' if profile.get('enabled') else 'off'}, {profile.get('samples', 0)} samples")
+    return "\n".join(lines)
+
+
+def format_profile(path: Path, top: int) -> str:
+    """Self time (leaf frame) and inclusive time per frame from a collapsed-stack file."""
+    self_time: Counter = Counter()
+    inclusive: Counter = Counter()
+    total = 0
+    for line in path.read_text().splitlines():
+        stack, _, count = line.rpartition(" ")
+        frames = stack.split(";")[1:]
+        n = int(count)
+        total += n
+        if frames:
+            self_time[frames[-1]] += n
+        for frame in set(frames):
+            inclusive[frame] += n
+    lines = [f"Profile {path} ({total} samples)", f"{'self %':>7} {'incl %':>7}  frame"]
+    for frame, n in self_time.most_common(top):
+        lines.append(f"{100 * n / total:>6.1f}% {100 * inclusive[frame] / total:>6.1f}%  {frame}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Trading loop phase latency summary")
+    parser.add_argument("path", nargs="?", default=os.getenv("TRADING_TRACE_FILE", ".trading_trace.json"))
+    parser.add_argument("--profile", action="store_true", help="also show the hottest sampled frames")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    data = json.loads(Path(args.path).read_text())
+    print(format_summary(data))
+    if args.profile:
+        profile_path = Path(data.get("profile", {}).get("file") or os.getenv("TRADING_PROFILE_FILE", ".trading_profile.folded"))
+        if profile_path.exists():
+            print()
+            print(format_profile(profile_path, args.top))
+        else:
+            print(f"no profile samples yet ({profile_path})")
+
+
+if __name__ == "__main__":
+    main()
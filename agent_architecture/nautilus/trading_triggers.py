@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+EVENT-DRIVEN TRADING TRIGGERS
+=============================
+Decides when a trading decision is worth making instead of re-analyzing on a
+fixed timer. The state at the last decision (anchor price and the discrete
+states the dual-setup rules depend on) is compared with the live streaming
+indicators; a decision fires when
+
+- price moved TRIGGER_ATR_MOVE entry-frame ATRs from the anchor price,
+- the entry or bias EMA pair crossed,
+- RSI entered or left the oversold / overbought bands,
+- a VWAP fade setup appeared or vanished (price setup_b.distance_atr_mult ATRs
+  from VWAP with RSI in the matching extreme band).
+
+States have hysteresis (an EMA cross needs a TRIGGER_EMA_MARGIN ATR gap,
+the VWAP zone is left at half its distance, RSI bands 3 points inside), so
+a range does not flip them back and forth. Below atr_normal_range the trend
+setup cannot trade: only the RSI / VWAP fade triggers remain.
+
+A change must persist for TRIGGER_DEBOUNCE_S seconds (so a single noisy
+quote does not fire), and fired decisions are capped at one per
+TRIGGER_MIN_INTERVAL_S and TRIGGER_MAX_PER_HOUR. A capped change stays
+pending and fires as soon as the cap allows, if it still holds.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+def _sign(value: float) -> int:
+    return (value > 0) - (value < 0)
+
+
+class SignalTrigger:
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        atr_move: Optional[float] = None,
+        debounce: Optional[float] = None,
+        min_interval: Optional[float] = None,
+        max_per_hour: Optional[int] = None
+    ) -> None:
+        params = config["indicators"]
+        bias_tf, entry_tf = config["timeframes"]["bias"], config["timeframes"]["entry"]
+        self.ema_bias = tuple(f"ema{period}_{bias_tf}" for period in params["ema_bias"])
+        self.ema_entry = tuple(f"ema{period}_{entry_tf}" for period in params["ema_entry"])
+        self.rsi_key = f"rsi_{entry_tf}"
+        self.atr_key = f"atr_{entry_tf}"
+        self.vwap_key = f"vwap_{bias_tf}"
+        self.rsi_bands = (config["setup_b"]["rsi_oversold"], config["setup_b"]["rsi_overbought"])
+        self.vwap_distance = config["setup_b"]["distance_atr_mult"]
+        self.min_atr_pct = config["atr_normal_range"][0]
+        self.ema_margin = float(os.getenv("TRIGGER_EMA_MARGIN", "0.1"))
+
+        self.atr_move = atr_move or float(os.getenv("TRIGGER_ATR_MOVE", "1.0"))
+        self.debounce = debounce if debounce is not None else float(os.getenv("TRIGGER_DEBOUNCE_S", "30"))
+        self.min_interval = min_interval if min_interval is not None else float(os.getenv("TRIGGER_MIN_INTERVAL_S", "60"))
+        self.max_per_hour = max_per_hour or int(os.getenv("TRIGGER_MAX_PER_HOUR", "12"))
+
+        self._lock = threading.Lock()
+        self._anchor: Optional[float] = None
+        self._committed: Optional[Dict[str, int]] = None
+        self._pending_since: Optional[float] = None
+        self._fired: Deque[float] = deque()
+        self.stats = {"evaluations": 0, "fired": 0, "debounced": 0, "rate_limited": 0}
+
+    def states(
+        self,
+        price: float,
+        values: Dict[str, Optional[float]],
+        previous: Optional[Dict[str, int]] = None
+    ) -> Optional[Dict[str, int]]:
+        """Discrete market state the strategy reacts to (None while indicators warm up)."""
+        needed = self.ema_bias + self.ema_entry + (self.rsi_key, self.atr_key, self.vwap_key)
+        if any(values.get(key) is None for key in needed):
+            return None
+        previous = previous or {}
+        atr = max(values[self.atr_key], 1e-12)
+
+        def ema_side(name: str, pair: tuple) -> int:
+            gap = (values[pair[0]] - values[pair[1]]) / atr
+            return _sign(gap) if abs(gap) >= self.ema_margin else previous.get(name, _sign(gap))
+
+        rsi = values[self.rsi_key]
+        low, high = self.rsi_bands
+        band = 0 if rsi < low else 2 if rsi > high else 1
+        if previous.get("rsi_band") == 0 and rsi < low + 3 or previous.get("rsi_band") == 2 and rsi > high - 3:
+            band = previous["rsi_band"]
+
+        stretch = (price - values[self.vwap_key]) / atr
+        zone = _sign(stretch) if abs(stretch) >= self.vwap_distance else 0
+        if zone == 0 and previous.get("vwap_fade", 0) == _sign(stretch) and abs(stretch) >= self.vwap_distance / 2:
+            zone = previous["vwap_fade"]
+        fade = zone if (zone, band) in ((1, 2), (-1, 0)) else 0
+
+        return {
+            "ema_entry": ema_side("ema_entry", self.ema_entry),
+            "ema_bias": ema_side("ema_bias", self.ema_bias),
+            "rsi_band": band,
+            "vwap_fade": fade,
+        }
+
+    def commit(self, price: float, values: Dict[str, Optional[float]]) -> None:
+        """Record the state a decision was taken on; later changes are measured from it."""
+        with self._lock:
+            self._anchor = price
+            self._committed = self.states(price, values, self._committed)
+            self._pending_since = None
+
+    def observe(self, price: float, values: Dict[str, Optional[float]], now: Optional[float] = None) -> Optional[List[str]]:
+        """Reasons to decide now, or None. A non-None result counts against the rate cap."""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.stats["evaluations"] += 1
+            if self._committed is None or self._anchor is None:
+                return None
+            current = self.states(price, values, self._committed)
+            if current is None:
+                return None
+
+            # Too quiet for the trend setup: only the fade (RSI / VWAP) triggers count
+            quiet = values[self.atr_key] / price < self.min_atr_pct
+            reasons = []
+            move = abs(price - self._anchor) / max(values[self.atr_key], 1e-12)
+            if move >= self.atr_move and not quiet:
+                reasons.append(f"move {move:.2f} ATR")
+            for name, state in current.items():
+                if quiet and name.startswith("ema_"):
+                    continue
+                if state != self._committed[name]:
+                    reasons.append(f"{name} {self._committed[name]:+d}->{state:+d}")
+            if not reasons:
+                self._pending_since = None
+                return None
+
+            if self._pending_since is None:
+                self._pending_since = now
+            if now - self._pending_since < self.debounce:
+                self.stats["debounced"] += 1
+                return None
+
+            while self._fired and now - self._fired[0] > 3600:
+                self._fired.popleft()
+            if (self._fired and now - self._fired[-1] < self.min_interval) or len(self._fired) >= self.max_per_hour:
+                self.stats["rate_limited"] += 1
+                return None
+
+            self._fired.append(now)
+            self._pending_since = None
+            self.stats["fired"] += 1
+            return reasons
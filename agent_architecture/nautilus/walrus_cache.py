@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+WALRUS BLOB CACHE
+=================
+Read path for Walrus blobs (memories, replays, attestations). Blob ids are
+content-derived, so a fetched blob never changes and can be cached forever:
+
+    hot tier   - in-memory LRU of small blobs (WALRUS_HOT_CACHE_MB)
+    disk tier  - <cache_dir>/<id[:2]>/<id>, LRU by mtime, capped at WALRUS_CACHE_MAX_MB
+    aggregator - GET {aggregator_url}/blobs/<id>, streamed to disk
+
+Concurrent requests for the same missing blob share a single download.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+_CHUNK = 1 << 16
+
+
+class WalrusBlobCache:
+    """Two-tier content-addressed cache in front of a Walrus aggregator."""
+
+    def __init__(
+        self,
+        aggregator_url: str,
+        cache_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        hot_bytes: Optional[int] = None,
+        hot_max_blob: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> None:
+        self.aggregator_url = aggregator_url.rstrip("/")
+        self.cache_dir = Path(cache_dir or os.getenv("WALRUS_CACHE_DIR", ".walrus_cache"))
+        self.max_bytes = max_bytes or int(os.getenv("WALRUS_CACHE_MAX_MB", "512")) * 1024 * 1024
+        self.hot_bytes = hot_bytes or int(os.getenv("WALRUS_HOT_CACHE_MB", "32")) * 1024 * 1024
+        self.hot_max_blob = hot_max_blob or int(os.getenv("WALRUS_HOT_MAX_BLOB_KB", "256")) * 1024
+        self.timeout = timeout or float(os.getenv("WALRUS_TIMEOUT", "30"))
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._hot: "OrderedDict[str, bytes]" = OrderedDict()
+        self._hot_size = 0
+        self._inflight: Dict[str, Future] = {}
+        self._disk_size = sum(p.stat().st_size for p in self.cache_dir.glob("*/*") if p.is_file())
+        self.stats = {"hot_hits": 0, "disk_hits": 0, "fetches": 0, "evictions": 0}
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=8))
+        self.session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=8))
+
+    # --- public API ---
+
+    def path_for(self, blob_id: str) -> Path:
+        return self.cache_dir / blob_id[:2] / blob_id
+
+    def get_path(self, blob_id: str) -> Path:
+        """Local file holding the blob (downloaded on first use) - for mmap / streaming readers."""
+        path = self.path_for(blob_id)
+        if path.exists():
+            self._touch(path)
+            with self._lock:
+                self.stats["disk_hits"] += 1
+            return path
+        return self._fetch_coalesced(blob_id)
+
+    def get_bytes(self, blob_id: str) -> bytes:
+        with self._lock:
+            data = self._hot.get(blob_id)
+            if data is not None:
+                self._hot.move_to_end(blob_id)
+                self.stats["hot_hits"] += 1
+                return data
+        data = self.get_path(blob_id).read_bytes()
+        self._remember(blob_id, data)
+        return data
+
+    def get_json(self, blob_id: str) -> Any:
+        return json.loads(self.get_bytes(blob_id))
+
+    def put(self, blob_id: str, data: bytes) -> None:
+        """Write-through for blobs we just uploaded (avoids re-downloading our own memories)."""
+        path = self.path_for(blob_id)
+        if not path.exists():
+            self._store(path, [data])
+        self._remember(blob_id, data)
+
+    # --- internals ---
+
+    def _fetch_coalesced(self, blob_id: str) -> Path:
+        with self._lock:
+            future = self._inflight.get(blob_id)
+            leader = future is None
+            if leader:
+                future = self._inflight[blob_id] = Future()
+        if not leader:
+            return future.result()
+        try:
+            path = self._download(blob_id)
+            future.set_result(path)
+            return path
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(blob_id, None)
+
+    def _download(self, blob_id: str) -> Path:
+        with self._lock:
+            self.stats["fetches"] += 1
+        url = f"{self.aggregator_url}/blobs/{blob_id}"
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            path = self.path_for(blob_id)
+            self._store(path, response.iter_content(_CHUNK))
+        logger.info("Walrus blob %s cached (%s bytes)", blob_id, path.stat().st_size)
+        return path
+
+    def _store(self, path: Path, chunks) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{threading.get_ident()}.part")
+        size = 0
+        with tmp.open("wb") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+                size += len(chunk)
+        with self._lock:
+            # Re-storing a blob already on disk replaces it: count only the difference
+            previous = path.stat().st_size if path.exists() else 0
+            tmp.replace(path)
+            self._disk_size += size - previous
+            if self._disk_size > self.max_bytes:
+                self._evict_disk(keep=path)
+
+    def _evict_disk(self, keep: Path) -> None:
+        """Drop least recently used files down to 90% of the cap (caller holds _lock)."""
+        files = []
+        for p in self.cache_dir.glob("*/*"):
+            if p.is_file() and not p.name.startswith(".") and p != keep:
+                try:
+                    stat = p.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, p))
+        for _, size, path in sorted(files):
+            if self._disk_size <= self.max_bytes * 0.9:
+                break
+            path.unlink(missing_ok=True)
+            self._disk_size -= size
+            self.stats["evictions"] += 1
+
+    def _remember(self, blob_id: str, data: bytes) -> None:
+        if len(data) > self.hot_max_blob:
+            return
+        with self._lock:
+            if blob_id in self._hot:
+                self._hot.move_to_end(blob_id)
+                return
+            self._hot[blob_id] = data
+            self._hot_size += len(data)
+            while self._hot_size > self.hot_bytes and self._hot:
+                _, evicted = self._hot.popitem(last=False)
+                self._hot_size -= len(evicted)
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+WALRUS UPLOAD QUEUE
+===================
+Background writer for Walrus memories. `enqueue` spools the memory to disk
+and returns its content hash immediately; a writer thread packs spooled
+memories into one blob per upload, PUTs it over a pooled HTTP session with
+exponential backoff, and records content hash -> blob_id once stored.
+Unsent memories are reloaded from the spool directory after a restart.
+
+Pack blobs are encoded by memory_codec (compressed, shared sub-objects
+deduplicated); each memory is addressed inside its pack by content hash.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from memory_codec import encode_pack
+
+logger = logging.getLogger(__name__)
+
+PENDING_PREFIX = "pending_"
+
+
+def content_hash(data: dict) -> str:
+    """Stable identity of a memory (same canonical JSON that gets uploaded)."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def parse_store_response(result: Dict[str, Any]) -> Optional[str]:
+    """
+    Format réponse Walrus:
+    {"newlyCreated": {"blobObject": {"blobId": "..."}}}
+    OU {"alreadyCertified": {"blobId": "..."}}
+    """
+    if "newlyCreated" in result:
+        return result["newlyCreated"]["blobObject"]["blobId"]
+    if "alreadyCertified" in result:
+        return result["alreadyCertified"]["blobId"]
+    return None
+
+
+def store_json(publisher_url: str, data: dict, timeout: float = 10.0) -> Optional[str]:
+    """Blocking upload of one document as its own blob; blob_id, or None on failure."""
+    try:
+        response = requests.put(
+            publisher_url,
+            data=json.dumps(data, sort_keys=True).encode(),
+            headers={"Content-Type": "application/json"},
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return parse_store_response(response.json())
+    except (requests.RequestException, ValueError, KeyError) as exc:
+        logger.warning("Walrus upload to %s failed (%s)", publisher_url, exc)
+        return None
+
+
+class WalrusUploadQueue:
+    """Disk-backed, batched, retrying uploader for Walrus memories."""
+
+    def __init__(
+        self,
+        publisher_url: str,
+        spool_dir: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        batch_wait: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+        timeout: Optional[float] = None,
+        on_stored: Optional[Callable[[str, bytes], None]] = None
+    ) -> None:
+        self.publisher_url = publisher_url
+        self.on_stored = on_stored
+        self.spool_dir = Path(spool_dir or os.getenv("WALRUS_SPOOL_DIR", ".walrus_spool"))
+        self.batch_size = batch_size or int(os.getenv("WALRUS_BATCH_SIZE", "32"))
+        self.batch_wait = batch_wait or float(os.getenv("WALRUS_BATCH_WAIT", "5"))
+        self.max_backoff = max_backoff or float(os.getenv("WALRUS_MAX_BACKOFF", "300"))
+        self.timeout = timeout or float(os.getenv("WALRUS_TIMEOUT", "30"))
+
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._resolved_file = self.spool_dir / "resolved.jsonl"
+        self._resolved: Dict[str, str] = self._load_resolved()
+        self._pending: List[str] = sorted(
+            (p.stem for p in self.spool_dir.glob("*.json")),
+            key=lambda stem: (self.spool_dir / f"{stem}.json").stat().st_mtime
+        )
+        self._cond = threading.Condition()
+        self._resolved_event = threading.Condition()
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+        self.session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+        self.session.headers.update({"Content-Type": "application/octet-stream"})
+
+        if self._pending:
+            logger.info("Walrus queue: %s unsent memories recovered from %s", len(self._pending), self.spool_dir)
+        self._thread = threading.Thread(target=self._writer_loop, name="walrus-writer", daemon=True)
+        self._thread.start()
+
+    # --- public API ---
+
+    def enqueue(self, data: dict) -> str:
+        """Spool a memory for upload; returns its placeholder ``pending_<hash>`` right away."""
+        digest = content_hash(data)
+        if digest not in self._resolved:
+            path = self.spool_dir / f"{digest}.json"
+            if not path.exists():
+                tmp = path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(data, sort_keys=True))
+                tmp.replace(path)
+                with self._cond:
+                    self._pending.append(digest)
+                    if len(self._pending) >= self.batch_size:
+                        self._cond.notify()
+        return PENDING_PREFIX + digest
+
+    def resolve(self, placeholder: str) -> Optional[str]:
+        """blob_id of the pack holding this memory, or None while it is unsent."""
+        return self._resolved.get(placeholder[len(PENDING_PREFIX):] if placeholder.startswith(PENDING_PREFIX) else placeholder)
+
+    def wait(self, placeholder: str, timeout: Optional[float] = None) -> Optional[str]:
+        """Block until ``placeholder`` is uploaded (or ``timeout`` expires)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._resolved_event:
+            while True:
+                blob_id = self.resolve(placeholder)
+                if blob_id is not None:
+                    return blob_id
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._resolved_event.wait(remaining)
+
+    def flush(self) -> None:
+        """Ask the writer to upload whatever is spooled now."""
+        with self._cond:
+            self._cond.notify()
+
+    def spooled(self, placeholder: str) -> Optional[dict]:
+        """The memory itself while it still waits in the spool, else None."""
+        path = self.spool_dir / f"{placeholder[len(PENDING_PREFIX):]}.json"
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    # --- writer ---
+
+    def _load_resolved(self) -> Dict[str, str]:
+        resolved: Dict[str, str] = {}
+        if self._resolved_file.exists():
+            for line in self._resolved_file.read_text().splitlines():
+                try:
+                    entry = json.loads(line)
+                    resolved[entry["hash"]] = entry["blob_id"]
+                except (ValueError, KeyError):
+                    continue
+        return resolved
+
+    def _writer_loop(self) -> None:
+        backoff = 1.0
+        while True:
+            with self._cond:
+                if len(self._pending) < self.batch_size:
+                    self._cond.wait(self.batch_wait)
+                batch = self._pending[:self.batch_size]
+            if not batch:
+                continue
+            try:
+                self._upload(batch)
+                backoff = 1.0
+            except Exception as exc:
+                logger.warning("Walrus pack upload failed (%s) - retrying in %.0fs", exc, backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def _upload(self, batch: List[str]) -> None:
+        items = {}
+        for digest in batch:
+            path = self.spool_dir / f"{digest}.json"
+            if path.exists():
+                items[digest] = json.loads(path.read_text())
+        blob_id = None
+        if items:
+            body = encode_pack(items)
+            raw_size = sum(len(json.dumps(item, sort_keys=True)) for item in items.values())
+            response = self.session.put(self.publisher_url, data=body, timeout=self.timeout)
+            response.raise_for_status()
+            blob_id = parse_store_response(response.json())
+            if not blob_id:
+                raise RuntimeError(f"unexpected Walrus response: {response.text[:200]}")
+            with self._resolved_file.open("a") as fh:
+                for digest in items:
+                    fh.write(json.dumps({"hash": digest, "blob_id": blob_id}) + "\n")
+            logger.info("Walrus pack %s stored (%s memories, %s -> %s bytes)",
+                        blob_id, len(items), raw_size, len(body))
+            if self.on_stored:
+                self.on_stored(blob_id, body)
+
+        for digest in batch:
+            (self.spool_dir / f"{digest}.json").unlink(missing_ok=True)
+        with self._cond:
+            done = set(batch)
+            self._pending = [d for d in self._pending if d not in done]
+        with self._resolved_event:
+            for digest in items:
+                self._resolved[digest] = blob_id
+            self._resolved_event.notify_all()